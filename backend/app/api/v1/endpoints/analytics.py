@@ -1,45 +1,53 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
-from app.models import models
+from app.services.owner_stats import owner_stats
 
 # NEW: Import the Bouncer
-from app.core.security import get_current_user
-from app.models.models import User
+from app.core.security import get_current_user, CurrentUser
 
 router = APIRouter()
 
 @router.get("/summary")
-def get_analytics_summary(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user) # <-- Added the Bouncer!
+async def get_analytics_summary(
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user) # <-- Added the Bouncer!
 ):
     """Fetches pipeline stats strictly for the logged-in user."""
     
-    # 1. Count ONLY the prospects owned by this user
-    total_prospects = db.query(models.Prospect).filter(
-        models.Prospect.owner_id == current_user.id
-    ).count()
-
-    # 2. Count ONLY the emails linked to this user's prospects
-    # We use .join() to connect the Email table to the Prospect table so we can check the owner_id
-    sent_emails = db.query(models.EmailLog).join(models.Prospect).filter(
-        models.Prospect.owner_id == current_user.id,
-        models.EmailLog.status == "sent"
-    ).count()
-
-    draft_emails = db.query(models.EmailLog).join(models.Prospect).filter(
-        models.Prospect.owner_id == current_user.id,
-        models.EmailLog.status == "draft"
-    ).count()
+    # One primary-key read: the counters are kept up to date on every write (see services/owner_stats.py)
+    stats = await owner_stats.get_async(db, current_user.id)
 
     return {
         "status": "success",
         "data": {
-            "total_prospects": total_prospects,
+            "total_prospects": stats.prospects,
             "pipeline_stats": {
-                "sent": sent_emails,
-                "drafts": draft_emails
+                "sent": stats.sent,
+                "drafts": stats.drafts
             }
         }
-    }
\ No newline at end of file
+    }
+
+@router.get("/daily")
+async def get_daily_activity(
+    days: int = Query(30, ge=1, le=365),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Per-day activity (prospects added, drafts created, emails sent) for trend charts."""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    rows = await owner_stats.daily_async(db, current_user.id, since)
+
+    return {
+        "status": "success",
+        "data": [
+            {
+                "day": row.day.isoformat(),
+                "prospects_added": row.prospects_added,
+                "drafts_created": row.drafts_created,
+                "emails_sent": row.emails_sent
+            } for row in rows
+        ]
+    }
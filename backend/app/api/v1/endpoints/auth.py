@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from app.core.security import get_current_user
+from app.core.security import get_current_user, CurrentUser, user_cache
 from app.core.database import get_db
-from app.core.security import get_password_hash, verify_password, create_access_token
+from app.core.security import create_access_token, password_hasher
 from app.models.models import User
 
 router = APIRouter()
@@ -15,26 +16,25 @@ class UserCreate(BaseModel):
     password: str
 
 @router.post("/signup")
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """Registers a new user into the database."""
     
     # 1. Check if email is already taken
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = await _get_user_by_email(db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    # 2. Hash the password and save the user
-    hashed_password = get_password_hash(user.password)
+    # 2. Hash the password (in the hashing process pool) and save the user
+    hashed_password = await password_hasher.hash(user.password)
     new_user = User(email=user.email, hashed_password=hashed_password)
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     
     return {"status": "success", "message": "User created successfully. You can now log in."}
 
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """
     Authenticates a user and returns a JWT token.
     Note: OAuth2 expects the fields to be named 'username' and 'password'.
@@ -42,21 +42,30 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     """
     
     # 1. Find the user by email
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = await _get_user_by_email(db, form_data.username)
     
     # 2. Verify user exists AND password matches
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    user_id, email = user.id, user.email
+
+    # 3. The hash was made with an older cost factor: upgrade it while we have the plain password
+    if password_hasher.needs_rehash(user.hashed_password):
+        user.hashed_password = await password_hasher.hash(form_data.password)
+        await db.commit()
     
-    # 3. Generate the JWT token passkey
-    access_token = create_access_token(data={"sub": user.email})
+    # 4. Generate the JWT token passkey
+    access_token = create_access_token(data={"sub": email})
     
     # This specific dictionary format is required by FastAPI's OAuth2 system
-    return {"access_token": access_token, "token_type": "bearer", "user_id": user.id}
+    return {"access_token": access_token, "token_type": "bearer", "user_id": user_id}
+
+async def _get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(User).where(User.email == email).limit(1))
 
 
 
@@ -66,22 +75,26 @@ class SMTPSettings(BaseModel):
 
 
 @router.get("/settings/smtp")
-def get_smtp_settings(current_user: User = Depends(get_current_user)):
+async def get_smtp_settings(current_user: CurrentUser = Depends(get_current_user)):
     return {
         "smtp_email": current_user.smtp_email or "",
-        "is_configured": bool(current_user.smtp_password)
+        "is_configured": current_user.smtp_configured
     }
 
 
 @router.put("/settings/smtp")
-def update_smtp_settings(
+async def update_smtp_settings(
     settings: SMTPSettings, 
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db), 
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Saves the user's personal Gmail App Password to their profile."""
-    current_user.smtp_email = settings.smtp_email
+    # current_user is a cached snapshot, so the row itself is loaded to change it
+    user = await db.get(User, current_user.id)
+    user.smtp_email = settings.smtp_email
     if settings.smtp_password:
-        current_user.smtp_password = settings.smtp_password
-    db.commit()
+        user.smtp_password = settings.smtp_password
+    await db.commit()
+    # Profile changed: make the next request resolve the user again
+    user_cache.invalidate(user.email)
     return {"status": "success", "message": "SMTP settings saved!"}
\ No newline at end of file
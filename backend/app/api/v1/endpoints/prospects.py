@@ -1,17 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+import base64
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Optional
 from pydantic import BaseModel
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, SessionLocal, AsyncSessionLocal
 from app.schemas import prospect as prospect_schema
 from app import crud
 from app.models import models
+from app.services.prospect_import import prospect_importer
 
 router = APIRouter()
 
 
-from app.core.security import get_current_user 
-from app.models.models import User
+from app.core.security import get_current_user, CurrentUser
 
 router = APIRouter()
 
@@ -25,18 +31,18 @@ class ProspectCreate(BaseModel):
 
 
 @router.post("/")
-def create_prospect(
+async def create_prospect(
     prospect: ProspectCreate, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user) # <-- THE BOUNCER
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user) # <-- THE BOUNCER
 ):
     """Creates a new prospect linked specifically to the logged-in user."""
     
     # Check if this specific user already added this email
-    existing = db.query(models.Prospect).filter(
+    existing = await db.scalar(select(models.Prospect.id).where(
         models.Prospect.email == prospect.email,
         models.Prospect.owner_id == current_user.id
-    ).first()
+    ).limit(1))
     
     if existing:
         raise HTTPException(status_code=400, detail="You already added a prospect with this email.")
@@ -47,35 +53,98 @@ def create_prospect(
         owner_id=current_user.id 
     )
     db.add(new_prospect)
-    db.commit()
-    db.refresh(new_prospect)
+    await db.commit()
+    await db.refresh(new_prospect)
     return new_prospect
 
+@router.post("/import")
+def import_prospects(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Bulk-creates prospects from a CSV (header row required) or NDJSON upload.
+    The format comes from ?format= or the file extension. Emails you already have are
+    skipped as duplicates, and invalid rows are reported by line number without stopping the import.
+    """
+    fmt = format or prospect_importer.detect_format(file.filename)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Upload a .csv or .ndjson file, or pass ?format=csv|ndjson.")
+
+    # Deliberately a sync endpoint on a sync session: parsing and validating the upload is CPU work
+    # that would stall the event loop, so the whole import runs on a threadpool thread instead
+    with SessionLocal() as db:
+        report = prospect_importer.run(db, current_user.id, file.file, fmt)
+    return {"status": "success", "data": report}
+
+def _encode_cursor(sort: str, row) -> str:
+    field = sort.lstrip("-")
+    value = row.id if field == "id" else (getattr(row, field) or "")
+    return base64.urlsafe_b64encode(json.dumps([value, row.id]).encode()).decode()
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return value, int(last_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/")
-def get_prospects(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user) # <-- THE BOUNCER
+async def get_prospects(
+    limit: int = Query(settings.PROSPECTS_PAGE_SIZE, ge=1, le=settings.PROSPECTS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = Query("id", pattern="^-?(" + "|".join(crud.PROSPECT_SORT_FIELDS) + ")$"),
+    q: Optional[str] = None,
+    company: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user) # <-- THE BOUNCER
 ):
-    """Fetches ONLY the prospects owned by the logged-in user."""
-    
-    # The magical Multi-Tenancy filter!
-    prospects = db.query(models.Prospect).filter(
-        models.Prospect.owner_id == current_user.id
-    ).all()
-    
-    return prospects
+    """
+    Fetches ONLY the prospects owned by the logged-in user, one page at a time.
+
+    Pages are keyset-paginated: pass the returned `next_cursor` back as `?cursor=` for the
+    next page (it is null on the last one). `q` searches names, email and company,
+    `company` filters on an exact company name, and `sort` orders by a field ("-" for descending).
+    ?format=ndjson instead streams every matching row as one JSON object per line.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+
+    if format == "ndjson":
+        return StreamingResponse(_stream_prospects(current_user.id, sort, after, q, company), media_type="application/x-ndjson")
+
+    # The magical Multi-Tenancy filter! (fetching one extra row tells us if there is a next page)
+    query = crud.query_prospects(current_user.id, sort=sort, after=after, search=q, company=company)
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        "items": [row._asdict() for row in rows],
+        "next_cursor": _encode_cursor(sort, rows[-1]) if has_more else None,
+    }
+
+async def _stream_prospects(owner_id: int, sort: str, after: tuple, search: str, company: str):
+    # The request's session is closed once the response starts, so the stream opens its own.
+    # yield_per reads through a server-side cursor in batches instead of loading every row.
+    async with AsyncSessionLocal() as db:
+        query = crud.query_prospects(owner_id, sort=sort, after=after, search=search, company=company)
+        result = await db.stream(query.execution_options(yield_per=settings.PROSPECTS_STREAM_BATCH_SIZE))
+        async for row in result:
+            yield json.dumps(row._asdict()) + "\n"
 
 
 @router.post("/", response_model=prospect_schema.Prospect)
-def create_prospect(prospect: prospect_schema.ProspectCreate, db: Session = Depends(get_db)):
-    db_prospect = crud.get_prospect_by_email(db, email=prospect.email)
+async def create_prospect(prospect: prospect_schema.ProspectCreate, db: AsyncSession = Depends(get_db)):
+    db_prospect = await crud.get_prospect_by_email(db, email=prospect.email)
     if db_prospect:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_prospect(db=db, prospect=prospect)
+    return await crud.create_prospect(db=db, prospect=prospect)
 
 @router.get("/", response_model=List[prospect_schema.Prospect])
-def read_prospects(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    prospects = crud.get_prospects(db, skip=skip, limit=limit)
+async def read_prospects(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
+    prospects = await crud.get_prospects(db, skip=skip, limit=limit)
     return prospects
 
 
@@ -86,20 +155,24 @@ def read_prospects(skip: int = 0, limit: int = 100, db: Session = Depends(get_db
 # ... your existing GET and POST routes ...
 
 @router.delete("/{prospect_id}")
-def delete_prospect(prospect_id: int, db: Session = Depends(get_db)):
+async def delete_prospect(prospect_id: int, db: AsyncSession = Depends(get_db)):
     """Deletes a prospect and their associated email logs."""
     
-    # 1. Find the prospect
-    prospect = db.query(models.Prospect).filter(models.Prospect.id == prospect_id).first()
+    # 1. Find the prospect (with its emails loaded up front: AsyncSession can't lazy-load them)
+    prospect = await db.scalar(
+        select(models.Prospect).options(selectinload(models.Prospect.emails)).where(models.Prospect.id == prospect_id)
+    )
     if not prospect:
         raise HTTPException(status_code=404, detail="Prospect not found")
 
     # 2. Delete their email history first (to prevent orphaned data)
-    db.query(models.EmailLog).filter(models.EmailLog.prospect_id == prospect_id).delete()
+    # Row by row through the ORM (not a bulk delete) so the owner's analytics counters see it
+    for email_log in prospect.emails:
+        await db.delete(email_log)
 
     # 3. Delete the prospect
-    db.delete(prospect)
-    db.commit()
+    await db.delete(prospect)
+    await db.commit()
     
     return {"status": "success", "message": "Prospect deleted"}
 
@@ -115,11 +188,11 @@ class ProspectUpdate(BaseModel):
 
 # 2. Add the PUT endpoint
 @router.put("/{prospect_id}")
-def update_prospect(prospect_id: int, prospect_data: ProspectUpdate, db: Session = Depends(get_db)):
+async def update_prospect(prospect_id: int, prospect_data: ProspectUpdate, db: AsyncSession = Depends(get_db)):
     """Updates an existing prospect's details."""
     
     # Find the prospect
-    prospect = db.query(models.Prospect).filter(models.Prospect.id == prospect_id).first()
+    prospect = await db.get(models.Prospect, prospect_id)
     if not prospect:
         raise HTTPException(status_code=404, detail="Prospect not found")
 
@@ -131,7 +204,7 @@ def update_prospect(prospect_id: int, prospect_data: ProspectUpdate, db: Session
     prospect.company_website = prospect_data.company_website
 
     # Save to database
-    db.commit()
-    db.refresh(prospect)
+    await db.commit()
+    await db.refresh(prospect)
     
     return prospect
\ No newline at end of file
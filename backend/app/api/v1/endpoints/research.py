@@ -1,104 +1,202 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+import json
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db, AsyncSessionLocal
 from app import crud
-from app.services.scraper import scraper
-from app.services.llm_service import llm 
-from app.services.vector_db import vector_db
-from app.services.email_sender import email_sender
+from app.services.research_pipeline import pipeline, ResearchError
+from app.services.job_runner import job_runner
+from app.services.email_queue import email_queue
 from app.models import models
 from pydantic import BaseModel
-from app.core.security import get_current_user
-from app.models.models import User
-import urllib.parse
+from app.core.security import get_current_user, CurrentUser
 class EmailSendRequest(BaseModel):
     subject: str
     edited_body: str
 
 router = APIRouter()
 
-@router.post("/{prospect_id}/generate")
-def generate_email_line(prospect_id: int, db: Session = Depends(get_db)):
-    # 1. Get Prospect
-    prospect = crud.get_prospect(db, prospect_id)
-    if not prospect:
-        raise HTTPException(status_code=404, detail="Prospect not found")
+class BatchGenerateRequest(BaseModel):
+    prospect_ids: List[int] = []
+    all_without_draft: bool = False # Queue every prospect of yours that has no email yet
 
-    if not prospect.company_website:
-        raise HTTPException(status_code=400, detail="No company website to scrape")
-
-    url = prospect.company_website
-    if not url.startswith("http"):
-        url = "https://" + url
+def _job_to_dict(job: models.ResearchJob, items: list = None) -> dict:
+    data = {
+        "job_id": job.id,
+        "status": job.status,
+        "total": job.total,
+        "completed": job.completed,
+        "failed": job.failed,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+    if items is not None:
+        data["items"] = [
+            {
+                "prospect_id": item.prospect_id,
+                "status": item.status,
+                "email_log_id": item.email_log_id,
+                "error": item.error,
+                "duration_ms": item.duration_ms,
+            } for item in items
+        ]
+    return data
 
-    # 2. Scrape Company Context
-    print(f"Scraping {url}...")
-    scraped_data = scraper.scrape_website(url)
-    if not scraped_data:
-        raise HTTPException(status_code=500, detail="Failed to scrape website.")
+async def _select_batch_prospect_ids(db: AsyncSession, owner_id: int, request: BatchGenerateRequest) -> List[int]:
+    query = select(models.Prospect.id).where(models.Prospect.owner_id == owner_id)
 
-    # 3. Scrape LinkedIn Context via Google Dorking (NEW)
-    print("Fetching LinkedIn context via Google...")
-    query = f'site:linkedin.com/in/ "{prospect.first_name} {prospect.last_name}" "{prospect.company_name}"'
-    google_search_url = f"https://www.google.com/search?q={urllib.parse.quote(query)}"
-    
-    # Reusing your existing scraper setup to grab the Google text
-    linkedin_raw_data = scraper.scrape_website(google_search_url) 
-    if linkedin_raw_data and "No LinkedIn data found" not in linkedin_raw_data and "Google" not in linkedin_raw_data[:50]:
-        linkedin_context = linkedin_raw_data[:500]
+    if request.all_without_draft:
+        has_email = select(models.EmailLog.id).where(
+            models.EmailLog.prospect_id == models.Prospect.id
+        ).exists()
+        query = query.where(~has_email)
     else:
-        linkedin_context = "No specific personal background found. Focus entirely on the company context."
-    
+        query = query.where(models.Prospect.id.in_(request.prospect_ids))
 
-    # 4. RAG INGESTION
-    vector_db.store_company_data(
-        prospect_id=prospect.id, 
-        company_name=prospect.company_name, 
-        scraped_text=scraped_data
-    )
+    return list(await db.scalars(query.order_by(models.Prospect.id)))
 
-    # 5. RAG RETRIEVAL
-    search_query = "What is a recent company news, product launch, or key achievement?"
-    retrieved_context = vector_db.search_company_data(
-        query=search_query,
-        company_name=prospect.company_name 
-    )
+@router.post("/batch", status_code=202)
+async def queue_batch_generation(
+    request: BatchGenerateRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Queues background generation for many prospects and returns a job id to poll."""
+    if not request.all_without_draft and not request.prospect_ids:
+        raise HTTPException(status_code=400, detail="Pass prospect_ids or set all_without_draft.")
 
-    # 6. AI Generation (Combined Contexts)
-    print("Generating personalized line with AI...")
-    
-    # Combine everything for Gemini
-    combined_prompt_context = f"Company Context: {retrieved_context or scraped_data}\n\nLinkedIn Context: {linkedin_context}"
+    prospect_ids = await _select_batch_prospect_ids(db, current_user.id, request)
+    if not prospect_ids:
+        raise HTTPException(status_code=404, detail="No matching prospects to generate for.")
 
-    personalized_line = llm.generate_opening_line(
-        prospect_name=prospect.first_name,
-        company_name=prospect.company_name,
-        scraped_context=combined_prompt_context 
-    )
+    job = await job_runner.create_job(db, current_user.id, prospect_ids)
+    job_runner.enqueue(job.id)
+
+    return {"status": "accepted", **_job_to_dict(job)}
+
+@router.get("/jobs/{job_id}")
+async def get_batch_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Progress, per-prospect errors and timings for a background generation job."""
+    job = await db.scalar(select(models.ResearchJob).where(
+        models.ResearchJob.id == job_id,
+        models.ResearchJob.owner_id == current_user.id
+    ))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    items = (await db.scalars(select(models.ResearchJobItem).where(
+        models.ResearchJobItem.job_id == job.id
+    ).order_by(models.ResearchJobItem.id))).all()
+
+    return {"status": "success", "data": _job_to_dict(job, items)}
+
+@router.post("/{prospect_id}/generate")
+async def generate_email_line(prospect_id: int, background: bool = False, fresh: bool = False,
+                              db: AsyncSession = Depends(get_db),
+                              current_user: CurrentUser = Depends(get_current_user)):
+    """
+    Runs the research pipeline for one of your prospects and saves the draft.
+    ?fresh=true skips the LLM response cache (e.g. the user wants a different variant).
+    """
+    # 1. Get Prospect (someone else's is reported as missing)
+    prospect = await crud.get_prospect(db, prospect_id)
+    if not prospect or prospect.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Prospect not found")
+
+    # ?background=true runs through the batch job path and returns 202 with a job to poll
+    if background:
+        job = await job_runner.create_job(db, current_user.id, [prospect.id])
+        job_runner.enqueue(job.id)
+        return JSONResponse(status_code=202, content=jsonable_encoder({"status": "accepted", **_job_to_dict(job)}))
+
+    # 2-6. Scrape, RAG and AI generation, with independent stages running concurrently
+    try:
+        result = await pipeline.run(prospect, fresh=fresh)
+    except ResearchError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
     # 7. Save to Database
-    saved_email = crud.create_email_log(
+    saved_email = await crud.create_email_log(
         db=db, 
         prospect_id=prospect.id, 
-        personalized_opening=personalized_line
+        personalized_opening=result["generated_line"]
     )
 
     return {
         "status": "success",
         "email_log_id": saved_email.id,
         "prospect": prospect.email,
-        "rag_context_used": retrieved_context[:200] + "...",
+        "rag_context_used": result["retrieved_context"][:200] + "...",
         "generated_line": saved_email.personalized_opening
     }
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+@router.post("/{prospect_id}/generate/stream")
+async def stream_email_line(prospect_id: int, fresh: bool = False, db: AsyncSession = Depends(get_db),
+                            current_user: CurrentUser = Depends(get_current_user)):
+    """
+    Streaming version of `/generate` (Server-Sent Events). Emits a "stage" event as each pipeline
+    stage finishes, then "token" events as the opening line is written, then "done" once the draft
+    is saved. Failures arrive as an "error" event, since the 200 status has already been sent; one that
+    comes after some "token" events means the line was cut off, nothing is saved and the tokens should be dropped.
+    """
+    prospect = await crud.get_prospect(db, prospect_id)
+    if not prospect or prospect.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Prospect not found")
+
+    async def events():
+        # Sent straight away so the client sees the response start before any slow stage
+        yield _sse("stage", {"stage": "started", "elapsed_ms": 0})
+        try:
+            async for event in pipeline.stream(prospect, fresh=fresh):
+                if event["event"] == "result":
+                    result = event["data"]
+                else:
+                    yield _sse(event["event"], event["data"])
+        except ResearchError as e:
+            yield _sse("error", {"status_code": e.status_code, "detail": e.detail})
+            return
+        except Exception as e:
+            print(f"Streaming generation failed for prospect {prospect_id}: {e}")
+            yield _sse("error", {"status_code": 500, "detail": "Generation failed."})
+            return
+
+        # The request's session is already closed by the time the stream runs, so the save gets its own
+        async with AsyncSessionLocal() as session:
+            saved_email = await crud.create_email_log(session, prospect_id=prospect.id, personalized_opening=result["generated_line"])
+
+        yield _sse("done", {
+            "email_log_id": saved_email.id,
+            "prospect": prospect.email,
+            "rag_context_used": result["retrieved_context"][:200] + "...",
+            "generated_line": saved_email.personalized_opening,
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Stop proxies (e.g. nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/{prospect_id}/drafts")
-def get_prospect_drafts(prospect_id: int, db: Session = Depends(get_db)):
+async def get_prospect_drafts(prospect_id: int, db: AsyncSession = Depends(get_db)):
     """Fetches the most recent AI generated email for a prospect."""
     
     # Search the database for the newest email log linked to this prospect
-    email_log = db.query(models.EmailLog).filter(
+    email_log = await db.scalar(select(models.EmailLog).where(
         models.EmailLog.prospect_id == prospect_id
-    ).order_by(models.EmailLog.id.desc()).first()
+    ).order_by(models.EmailLog.id.desc()).limit(1))
 
     if not email_log:
         return {"has_draft": False}
@@ -112,26 +210,73 @@ def get_prospect_drafts(prospect_id: int, db: Session = Depends(get_db)):
     }
 
   
+def _check_can_deliver(prospect: models.Prospect, current_user: CurrentUser):
+    if not prospect or prospect.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Prospect not found")
+    if not current_user.smtp_configured:
+        raise HTTPException(status_code=400, detail="Add your SMTP settings before sending emails.")
+
 @router.post("/send/{email_log_id}")
-def send_approved_email(
+async def send_approved_email(
     email_log_id: int, 
     request: dict, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    deliver: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    email_log = db.query(models.EmailLog).filter(models.EmailLog.id == email_log_id).first()
+    """
+    Logs an approved draft as sent. With ?deliver=true it is instead queued for delivery from
+    the user's own SMTP account, and its status goes queued -> sent (or failed) in the background.
+    """
+    email_log = await db.get(models.EmailLog, email_log_id)
     if not email_log:
         raise HTTPException(status_code=404, detail="Draft not found")
         
     edited_body = request.get("edited_body", "")
+    email_log.full_body = edited_body
+
+    if deliver:
+        prospect = await db.get(models.Prospect, email_log.prospect_id)
+        _check_can_deliver(prospect, current_user)
+        await email_queue.enqueue(db, email_log, current_user.id, prospect.email, request.get("subject", ""), edited_body)
+        return {"status": "queued", "email_log_id": email_log.id, "message": "Email queued for delivery!"}
 
-    # ONLY update the database. Do not use email_sender!
+    # Without ?deliver the email is only logged (the UI sends it through Gmail's compose window)
     email_log.status = "sent"
-    email_log.full_body = edited_body
-    db.commit()
+    await db.commit()
     
     return {"status": "success", "message": "Email logged to history!"}
 
+@router.get("/outbox")
+async def get_outbox(
+    status: Optional[str] = Query(None, pattern="^(queued|sending|sent|failed)$"),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Your emails queued for delivery (newest first), with attempts and the last error of each."""
+    query = select(models.OutboundEmail).where(models.OutboundEmail.owner_id == current_user.id)
+    if status:
+        query = query.where(models.OutboundEmail.status == status)
+    rows = (await db.scalars(query.order_by(models.OutboundEmail.id.desc()).limit(limit))).all()
+
+    return {
+        "status": "success",
+        "data": [
+            {
+                "id": row.id,
+                "email_log_id": row.email_log_id,
+                "to_email": row.to_email,
+                "subject": row.subject,
+                "status": row.status,
+                "attempts": row.attempts,
+                "next_attempt_at": row.next_attempt_at,
+                "last_error": row.last_error,
+                "sent_at": row.sent_at,
+            } for row in rows
+        ]
+    }
+
 # 1. New Request Model for Manual Emails
 class ManualEmailRequest(BaseModel):
     subject: str
@@ -139,11 +284,11 @@ class ManualEmailRequest(BaseModel):
 
 # 2. New Route: Fetch complete email history for the chat window
 @router.get("/{prospect_id}/history")
-def get_prospect_history(prospect_id: int, db: Session = Depends(get_db)):
+async def get_prospect_history(prospect_id: int, db: AsyncSession = Depends(get_db)):
     """Fetches all past emails (drafts and sent) for a prospect."""
-    logs = db.query(models.EmailLog).filter(
+    logs = (await db.scalars(select(models.EmailLog).where(
         models.EmailLog.prospect_id == prospect_id
-    ).order_by(models.EmailLog.id.asc()).all()
+    ).order_by(models.EmailLog.id.asc()))).all()
     
     return [
         {
@@ -156,17 +301,32 @@ def get_prospect_history(prospect_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/{prospect_id}/send-manual")
-def send_manual_email(
+async def send_manual_email(
     prospect_id: int, 
     request: ManualEmailRequest, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    deliver: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    prospect = db.query(models.Prospect).filter(models.Prospect.id == prospect_id).first()
+    """Logs a hand-written email as sent, or with ?deliver=true queues it for delivery (see /send/{id})."""
+    prospect = await db.get(models.Prospect, prospect_id)
     if not prospect:
         raise HTTPException(status_code=404, detail="Prospect not found")
 
-    # ONLY save to database. Do not use email_sender!
+    if deliver:
+        _check_can_deliver(prospect, current_user)
+        new_log = models.EmailLog(
+            prospect_id=prospect.id,
+            personalized_opening="Manual Follow-up",
+            full_body=request.body,
+            status="queued"
+        )
+        db.add(new_log)
+        await db.flush()
+        await email_queue.enqueue(db, new_log, current_user.id, prospect.email, request.subject, request.body)
+        return {"status": "queued", "email_log_id": new_log.id, "message": "Manual email queued for delivery!"}
+
+    # Without ?deliver it is only logged (the UI sends it through Gmail's compose window)
     new_log = models.EmailLog(
         prospect_id=prospect.id,
         personalized_opening="Manual Follow-up",
@@ -174,6 +334,6 @@ def send_manual_email(
         status="sent"
     )
     db.add(new_log)
-    db.commit()
+    await db.commit()
     
     return {"status": "success", "message": "Manual email logged!"}
\ No newline at end of file
@@ -0,0 +1,85 @@
+from fastapi import APIRouter, Depends
+from app.services.browser_pool import browser_pool
+from app.services.scrape_cache import scrape_cache
+from app.services.fetch_strategy import fetch_strategy
+from app.services.host_limiter import host_limiter
+from app.services.embedding_cache import embedding_cache
+from app.services.vector_db import vector_db
+from app.services.company_ingest import company_ingest
+from app.services.llm_cache import llm_cache
+from app.services.gemini_client import gemini
+from app.core.security import get_admin_user, user_cache
+from app.core.database import pool_metrics, async_pool_metrics
+from app.services.email_queue import email_queue
+
+# Internal counters and operations for operators only (see ADMIN_EMAILS)
+router = APIRouter(dependencies=[Depends(get_admin_user)])
+
+@router.get("/browser-pool")
+def get_browser_pool_stats():
+    """Live counters for the headless browser pool, used to tune its size against memory."""
+    return {"status": "success", "data": browser_pool.stats()}
+
+@router.post("/browser-pool/check")
+def check_browser_pool():
+    """Health-checks the browsers (dead ones get relaunched), then returns the pool's counters."""
+    health = browser_pool.health_check()
+    return {"status": "success", "data": {**browser_pool.stats(), "health": health}}
+
+@router.get("/scrape-cache")
+def get_scrape_cache_stats():
+    """Hit / miss / revalidation counters for the persistent scrape cache."""
+    return {"status": "success", "data": scrape_cache.stats()}
+
+@router.get("/scraper")
+def get_scraper_stats():
+    """
+    Per-tier latency (plain HTTP vs headless browser), why pages escalated and how often,
+    plus the per-host politeness limiter (time spent waiting, throttled hosts).
+    """
+    return {"status": "success", "data": {**fetch_strategy.stats(), "politeness": host_limiter.stats()}}
+
+@router.get("/embedding-cache")
+def get_embedding_cache_stats():
+    """Memory / disk hit counters for the embedding cache."""
+    return {"status": "success", "data": embedding_cache.stats()}
+
+@router.get("/vector-index")
+def get_vector_index_stats():
+    """Which vector backend is active, plus its own counters (row counts for the local index)."""
+    if not vector_db.backend_ready:
+        return {"status": "success", "data": {"backend": vector_db.backend_name, "connected": False}}
+    return {"status": "success", "data": {"backend": vector_db.backend_name, "connected": True, **vector_db.backend.stats()}}
+
+@router.get("/company-ingest")
+def get_company_ingest_stats():
+    """Chunks embedded vs reused across company ingestions, company knowledge reuse, plus Gemini embedding and upsert call counts."""
+    return {"status": "success", "data": company_ingest.stats()}
+
+@router.get("/llm-cache")
+def get_llm_cache_stats():
+    """Hit rate and latency saved by the LLM response cache."""
+    return {"status": "success", "data": llm_cache.stats()}
+
+@router.get("/gemini")
+def get_gemini_scheduler_stats():
+    """Per-model request, retry, error and queueing counters for the Gemini scheduler."""
+    return {"status": "success", "data": gemini.stats()}
+
+@router.get("/auth-cache")
+def get_auth_cache_stats():
+    """Hit/miss counters for the token -> user cache used by get_current_user."""
+    return {"status": "success", "data": user_cache.stats()}
+
+@router.get("/db-pool")
+def get_db_pool_stats():
+    """
+    Connection pool occupancy plus how long checkouts waited (and how many timed out), for the
+    async engine behind the endpoints and the sync one used by background workers.
+    """
+    return {"status": "success", "data": {"async": async_pool_metrics.stats(), "sync": pool_metrics.stats()}}
+
+@router.get("/email-queue")
+def get_email_queue_stats():
+    """Delivery outcomes for the outbound email queue, plus SMTP connection reuse (opened vs reused)."""
+    return {"status": "success", "data": email_queue.stats()}
@@ -8,13 +8,137 @@ class Settings(BaseSettings):
     GEMINI_API_KEY: str = "GEMINI_API_KEY_PLACEHOLDER" 
     PINECONE_API_KEY: str = "PINECONE_API_KEY_PLACEHOLDER"
     DATABASE_URL: str = "sqlite:///./cold_email.db"
+
+    # Database connection pool (see core/database.py)
+    DB_POOL_SIZE: int = 10 # Connections kept open
+    DB_MAX_OVERFLOW: int = 20 # Extra connections opened under load, closed when returned
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0 # How long a request waits for a free connection before erroring
+    DB_POOL_RECYCLE_SECONDS: int = 1800 # Reopen connections older than this (cloud proxies drop idle ones)
+    DB_POOL_PRE_PING: bool = True # Test each connection on checkout and replace dead ones
+
+    # SQLite only: WAL lets readers run while one writer commits
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL" # Safe with WAL; only the last commits can be lost on power failure
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000 # Wait this long for a write lock instead of failing with "database is locked"
+    SQLITE_MMAP_SIZE_BYTES: int = 256 * 1024 * 1024
+
+    # SMTP server (each user sends from their own account, see /auth/settings/smtp)
     SMTP_HOST: str = "smtp.gmail.com"
-    SMTP_PORT: int = 587
+    SMTP_PORT: int = 587 # Used when SMTP_USE_SSL is off (the server must offer STARTTLS)
     SMTP_USER: str = "placeholder_user"
     SMTP_PASSWORD: str = "placeholder_pass"
+    SMTP_USE_SSL: bool = True # Implicit TLS on SMTP_SSL_PORT; turn off for STARTTLS or a local test server
+    SMTP_SSL_PORT: int = 465
+    SMTP_ALLOW_PLAINTEXT: bool = False # Log in without STARTTLS when the server doesn't offer it. Only for scripts/smtp_stand_in.py
+    SMTP_TIMEOUT_SECONDS: float = 15.0
+    SMTP_CONNECTION_IDLE_SECONDS: float = 60.0 # Close an account's pooled connection after this long unused
+
+    # Outbound email queue (?deliver=true on the send endpoints), worked by background senders
+    EMAIL_SENDER_CONCURRENCY: int = 4 # Messages being delivered at once, across all accounts
+    EMAIL_SEND_RATE_PER_MINUTE: int = 20 # Per sender account, to stay under the provider's limits
+    EMAIL_SEND_MAX_ATTEMPTS: int = 5
+    EMAIL_SEND_BACKOFF_BASE_SECONDS: float = 30.0
+    EMAIL_SEND_BACKOFF_MAX_SECONDS: float = 1800.0
+    EMAIL_QUEUE_POLL_SECONDS: float = 5.0 # How often the queue is checked for retries that came due
+    EMAIL_SEND_LEASE_SECONDS: float = 300.0 # A message "sending" for longer than this is assumed orphaned (its worker died) and re-queued
+
     SECRET_KEY: str = "super_secret_temporary_key_for_portfolio"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7
-    
+    AUTH_USER_CACHE_TTL_SECONDS: float = 30.0 # How long a resolved token -> user is reused (0 disables)
+    AUTH_USER_CACHE_MAX_ENTRIES: int = 10000
+    ADMIN_EMAILS: list[str] = [] # Accounts allowed to read the operator endpoints (/stats/*)
+
+    # Password hashing (bcrypt). Changing the rounds rehashes each user's password at their next login
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2 # Processes in the hashing pool (0 = a thread in the API process)
+
+    # Headless browser pool used by the scraper
+    BROWSER_POOL_SIZE: int = 2
+    BROWSER_CONTEXTS_PER_BROWSER: int = 2
+    BROWSER_CONTEXT_MAX_PAGES: int = 25 # Recycle a context after this many pages
+    BROWSER_LEASE_TIMEOUT_SECONDS: float = 30.0
+    BROWSER_BLOCKED_RESOURCES: list[str] = ["image", "font", "media", "stylesheet"]
+
+    # Gemini request scheduler: per-model budgets, in-flight cap and retry/backoff on 429/5xx
+    GEMINI_BASE_URL: str = "" # Point at a fake Gemini server for load tests
+    GEMINI_RATE_LIMITS: dict[str, dict[str, int]] = {
+        "default": {"rpm": 500, "tpm": 500_000},
+        "gemini-2.5-flash": {"rpm": 1000, "tpm": 1_000_000},
+        "gemini-embedding-001": {"rpm": 3000, "tpm": 1_000_000},
+    }
+    GEMINI_MAX_CONCURRENCY: int = 16
+    GEMINI_MAX_RETRIES: int = 5
+    GEMINI_BACKOFF_BASE_SECONDS: float = 0.5
+    GEMINI_BACKOFF_MAX_SECONDS: float = 20.0
+
+    # Persistent cache of scraped pages
+    SCRAPE_CACHE_TTL_SECONDS: int = 60 * 60 * 24 # Older entries get revalidated before reuse
+
+    # Page text extraction: "lxml" (streaming, stops at the budget) or "bs4" (the old full-tree parse)
+    SCRAPE_TEXT_ENGINE: str = "lxml"
+    SCRAPE_TEXT_MAX_CHARS: int = 8000 # Visible text kept per page (company pages are chunked for retrieval)
+
+    # Tiered fetch: plain HTTP first, the headless browser only for client-rendered or blocked pages
+    SCRAPE_MIN_TEXT_CHARS: int = 300 # Less text than this from plain HTTP means the page needs a browser
+    SCRAPE_HTTP_TIMEOUT_SECONDS: float = 10.0
+    SCRAPE_HTTP_MAX_CONNECTIONS: int = 50
+    SCRAPE_TIER_MEMORY_SECONDS: int = 60 * 60 * 6 # How long the tier that worked for a domain is reused before re-probing
+    SCRAPE_TIER_MEMORY_MAX_DOMAINS: int = 10000
+
+    # Per-host politeness: every fetch to a host (either tier) waits its turn
+    SCRAPE_PER_HOST_CONCURRENCY: int = 2
+    SCRAPE_HOST_MIN_DELAY_SECONDS: dict[str, float] = { # Between request starts to the same host
+        "default": 1.0,
+        "www.google.com": 3.0, # Every LinkedIn lookup is a Google search
+    }
+    SCRAPE_RESPECT_CRAWL_DELAY: bool = True # Use robots.txt Crawl-delay / Request-rate when it's longer
+    SCRAPE_MAX_CRAWL_DELAY_SECONDS: float = 30.0
+    SCRAPE_ROBOTS_TTL_SECONDS: int = 60 * 60 * 24
+    SCRAPE_THROTTLE_PENALTY_MAX_SECONDS: float = 60.0 # Cap on the extra spacing a 403/429/503 host earns
+
+    # Embedding cache (in-process LRU in front of a SQLite file)
+    EMBEDDING_CACHE_PATH: str = "./embedding_cache.db"
+    EMBEDDING_CACHE_MEMORY_ENTRIES: int = 2048
+
+    # LLM response cache (regenerating with the same inputs reuses the previous line)
+    LLM_CACHE_PATH: str = "./llm_cache.db"
+    LLM_CACHE_MAX_ENTRIES: int = 20000
+    LLM_CACHE_TTL_SECONDS: int = 60 * 60 * 24 * 7
+
+    # Company ingestion: pages crawled per company, chunked and embedded incrementally
+    COMPANY_INGEST_PATHS: list[str] = ["/about", "/news", "/blog", "/careers"] # Crawled besides the homepage
+    COMPANY_CHUNK_CHARS: int = 1000
+    COMPANY_CHUNK_OVERLAP_CHARS: int = 200
+    COMPANY_RETRIEVAL_TOP_K: int = 3 # Chunks handed to the LLM as company context
+    COMPANY_KNOWLEDGE_TTL_SECONDS: int = 60 * 60 * 24 * 7 # After this a company is re-crawled in the background
+    EMBEDDING_BATCH_SIZE: int = 100 # Texts per Gemini embedding call (the API's batch limit)
+    VECTOR_UPSERT_BATCH_SIZE: int = 100 # Vectors per upsert/delete request
+
+    # Vector index backend: "pinecone" (hosted) or "local" (in-process NumPy/mmap)
+    VECTOR_BACKEND: str = "pinecone"
+    LOCAL_VECTOR_INDEX_DIR: str = "./vector_index"
+
+    # Background research jobs (POST /research/batch)
+    RESEARCH_JOB_CONCURRENCY: int = 4 # Prospects generated at once across all jobs
+    RESEARCH_JOB_HEARTBEAT_SECONDS: float = 30.0 # How often a worker marks its running items alive (and looks for abandoned ones)
+    RESEARCH_JOB_LEASE_SECONDS: float = 180.0 # A running item without a heartbeat for this long is handed to another worker
+
+    # Prospect listing (GET /prospects)
+    PROSPECTS_PAGE_SIZE: int = 100
+    PROSPECTS_MAX_PAGE_SIZE: int = 1000
+    PROSPECTS_STREAM_BATCH_SIZE: int = 1000 # Rows fetched per round trip in ?format=ndjson mode
+
+    # Bulk prospect import (POST /prospects/import)
+    PROSPECT_IMPORT_CHUNK_SIZE: int = 1000 # Rows per dedupe query + executemany insert
+    PROSPECT_IMPORT_MAX_ERRORS: int = 1000 # Per-row errors listed in the response (the rest are only counted)
+
+    # Metrics and tracing (see core/metrics.py): Prometheus histograms on /metrics, Server-Timing on responses
+    METRICS_ENABLED: bool = True
+    SERVER_TIMING_ENABLED: bool = True # Per-stage totals in each response's Server-Timing header
+    TRACE_HEADER: str = "X-Trace" # "X-Trace: 1" (or ?trace=1) lists every span of that request and prints a waterfall
+    TRACE_ALL_REQUESTS: bool = False
+    TRACE_MAX_SPANS: int = 200 # Spans kept per traced request
+
     class Config:
         env_file = ".env"
 
@@ -1,34 +1,204 @@
-from sqlalchemy import create_engine
+import statistics
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import os
 from dotenv import load_dotenv
 
+from app.core.config import settings
+from app.core.metrics import instrument_engine
+
 load_dotenv()
 
-# 1. Fetch the URL from .env. If it doesn't exist, fall back to local SQLite for safety!
+
+# ==========================================
+# 1. THE DATABASE URL
+# ==========================================
+
+# Fetch the URL from .env. If it doesn't exist, fall back to local SQLite for safety!
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./cold_email.db")
 
 # Fix an old cloud provider quirk: SQLAlchemy requires "postgresql://" but some hosts give "postgres://"
 if SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
     SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-# 2. SQLite needs a special threading rule, but Postgres DOES NOT.
+# The same database through an asyncio driver (aiosqlite / asyncpg), used by the API endpoints
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    parsed = parsed.set(drivername=ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername))
+    # asyncpg calls libpq's ?sslmode= option ?ssl=
+    if parsed.drivername == "postgresql+asyncpg" and "sslmode" in parsed.query:
+        query = dict(parsed.query)
+        query["ssl"] = query.pop("sslmode")
+        parsed = parsed.set(query=query)
+    return parsed.render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = to_async_url(SQLALCHEMY_DATABASE_URL)
+
+
+# ==========================================
+# 2. POOL METRICS
+# ==========================================
+
+class PoolMetrics:
+    """
+    How long requests wait to get a connection and how full the pool is.
+    A rising wait time with checked_out pinned at size + overflow means the pool is too small
+    (or something holds connections too long); timeouts are requests that gave up waiting.
+    """
+
+    def __init__(self, samples: int = 2000):
+        self._lock = threading.Lock()
+        self._waits_ms = deque(maxlen=samples) # Most recent checkout waits, for percentiles
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.peak_checked_out = 0
+        self.pool = None
+
+    def record(self, wait_ms: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self._waits_ms.append(wait_ms)
+            if self.pool is not None:
+                self.peak_checked_out = max(self.peak_checked_out, self.pool.checkedout())
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits_ms)
+            data = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "p50_wait_ms": round(statistics.median(waits), 3) if waits else 0.0,
+                "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+                "peak_checked_out": self.peak_checked_out,
+            }
+        pool = self.pool
+        if isinstance(pool, QueuePool):
+            data.update({
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+            })
+        return data
+
+# One per engine: the sync one (background workers, scripts, migrations) and the async one (endpoints)
+pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+
+
+class _TimedPool:
+    """Reports every checkout's wait (including opening a new connection) to the class's `metrics`."""
+    metrics: PoolMetrics
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics.pool = self # engine.dispose() swaps in a fresh pool, so always track the newest one
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.metrics.record((time.perf_counter() - started) * 1000, timed_out=True)
+            raise
+        self.metrics.record((time.perf_counter() - started) * 1000)
+        return connection
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    metrics = pool_metrics
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    metrics = async_pool_metrics
+
+
+# ==========================================
+# 3. THE ENGINES (sync + async, same database)
+# ==========================================
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    # Runs once per new connection. journal_mode sticks to the file; the rest are per connection.
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE_BYTES)}")
+    cursor.close()
+
+pool_options = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+    "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
+
+# SQLite needs a special threading rule, but Postgres DOES NOT.
 if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+    # An in-memory database only exists inside its one connection (and so is separate per engine),
+    # so keep SQLAlchemy's default pools there
+    in_memory = SQLALCHEMY_DATABASE_URL in ("sqlite://", "sqlite:///:memory:")
+    timeout = settings.SQLITE_BUSY_TIMEOUT_MS / 1000
     engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": timeout},
+        **({} if in_memory else {"poolclass": TimedQueuePool, **pool_options}),
     )
-    print("💽 Running on Local SQLite Database")
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        connect_args={"timeout": timeout},
+        **({} if in_memory else {"poolclass": TimedAsyncQueuePool, **pool_options}),
+    )
+    if not in_memory:
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    print(f"💽 Running on Local SQLite Database (journal_mode={settings.SQLITE_JOURNAL_MODE})")
 else:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=TimedQueuePool, **pool_options)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=TimedAsyncQueuePool, **pool_options)
     print("☁️ Running on Cloud PostgreSQL Database")
 
-# 3. Standard setup
+# SQL timings (db_write / db_read spans) and pool gauges on /metrics
+instrument_engine(engine, "sync", pool_metrics)
+instrument_engine(async_engine.sync_engine, "async", async_pool_metrics)
+
+# Standard setup
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: reading an expired attribute would need a (sync) reload, which AsyncSession can't do
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+def dialect_insert(table):
+    """
+    An INSERT that supports on_conflict_do_update / on_conflict_do_nothing, built for whichever
+    database both engines point at (SQLite or Postgres): single-statement upserts with no race.
+    """
+    if engine.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(table)
+
+async def get_db():
+    """The endpoints' session. Background workers and scripts use the sync `SessionLocal` instead."""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -0,0 +1,274 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+from urllib.parse import parse_qs
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from prometheus_client.core import REGISTRY, CounterMetricFamily, GaugeMetricFamily
+
+from app.core.config import settings
+
+# Hot-path stages run from ~1ms (a SQLite write) to tens of seconds (a browser fetch, a slow LLM)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+# ==========================================
+# 1. THE METRICS (exported on /metrics)
+# ==========================================
+
+STAGE_SECONDS = Histogram(
+    "coldemail_stage_duration_seconds",
+    "Time spent in one hot-path stage (fetch, parse, linkedin, embed, upsert, query, llm, db_write, db_read)",
+    ["stage", "variant"],
+    buckets=STAGE_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "coldemail_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=STAGE_BUCKETS,
+)
+EXTERNAL_ERRORS = Counter(
+    "coldemail_external_call_errors_total",
+    "Failed calls to services outside the app (websites, the browser, Gemini, the vector index, SMTP)",
+    ["service", "reason"],
+)
+
+# Resolving a labelled child takes a lock in prometheus_client, so each one is looked up only once
+_stage_children: dict[tuple[str, str], Histogram] = {}
+_request_children: dict[tuple[str, str, str], Histogram] = {}
+
+
+def external_error(service: str, reason: str):
+    """Counts one failed external call. `reason` should be low-cardinality: a status code or an exception class."""
+    if settings.METRICS_ENABLED:
+        EXTERNAL_ERRORS.labels(service, reason).inc()
+
+
+def render() -> tuple[bytes, str]:
+    """The Prometheus text exposition of every metric, and its content type."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+# ==========================================
+# 2. SPANS (one timed stage of the current request)
+# ==========================================
+
+class RequestTrace:
+    """
+    The spans of one HTTP request: per-stage totals for its Server-Timing header, plus (when the
+    request asked to be traced) every individual span with its start offset, for a waterfall.
+    """
+    __slots__ = ("started", "detailed", "totals", "spans", "dropped")
+
+    def __init__(self, detailed: bool):
+        self.started = time.perf_counter()
+        self.detailed = detailed
+        self.totals: dict[str, list] = {} # stage -> [seconds, count]
+        self.spans: list[tuple] = []
+        self.dropped = 0
+
+    def add(self, stage: str, variant: str, started: float, seconds: float):
+        total = self.totals.get(stage)
+        if total is None:
+            self.totals[stage] = [seconds, 1]
+        else:
+            total[0] += seconds
+            total[1] += 1
+        if self.detailed:
+            if len(self.spans) < settings.TRACE_MAX_SPANS:
+                self.spans.append((stage, variant, started - self.started, seconds))
+            else:
+                self.dropped += 1
+
+    def server_timing(self) -> str:
+        """A Server-Timing value the browser devtools draw as a breakdown (concurrent stages overlap)."""
+        entries = [f"app;dur={(time.perf_counter() - self.started) * 1000:.1f}"]
+        entries += [f'{stage};desc="{stage} x{count}";dur={seconds * 1000:.1f}' for stage, (seconds, count) in self.totals.items()]
+        for number, (stage, variant, offset, seconds) in enumerate(self.spans):
+            label = f"{stage} {variant}".strip()
+            entries.append(f'span{number};desc="{label} @{offset * 1000:.0f}ms";dur={seconds * 1000:.1f}')
+        return ", ".join(entries)
+
+    def print_waterfall(self, title: str):
+        print(f"🔍 Trace {title} in {(time.perf_counter() - self.started) * 1000:.0f} ms")
+        for stage, variant, offset, seconds in sorted(self.spans, key=lambda span: span[2]):
+            print(f"   {offset * 1000:8.1f} ms +{seconds * 1000:8.1f} ms  {stage}{f' ({variant})' if variant else ''}")
+        if self.dropped:
+            print(f"   ... {self.dropped} more span(s) not kept (TRACE_MAX_SPANS)")
+
+
+# Set by the middleware for the duration of a request. Copied into asyncio tasks, to_thread calls and
+# the browser pool's loop, so spans anywhere below the endpoint land on the right request.
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+class span:
+    """
+    Times one stage into the stage histogram and the current request's Server-Timing:
+
+        with span("fetch", "http"):
+            response = await client.get(url)
+
+    `variant` splits a stage further (the fetch tier, the vector backend...). With `service` set,
+    an exception leaving the block also counts as a failed external call to that service.
+    A plain class rather than @contextmanager: it runs on every stage, so it should cost ~1µs.
+    """
+    __slots__ = ("stage", "variant", "service", "started")
+
+    def __init__(self, stage: str, variant: str = "", service: Optional[str] = None):
+        self.stage = stage
+        self.variant = variant
+        self.service = service
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.service is not None and issubclass(exc_type, Exception):
+            external_error(self.service, exc_type.__name__)
+        record(self.stage, self.variant, self.started, time.perf_counter() - self.started)
+        return False
+
+
+def record(stage: str, variant: str, started: float, seconds: float):
+    """Records an already-measured span (for timings that don't fit a `with` block, e.g. SQL events)."""
+    if not settings.METRICS_ENABLED:
+        return
+    key = (stage, variant)
+    child = _stage_children.get(key)
+    if child is None:
+        child = _stage_children[key] = STAGE_SECONDS.labels(stage, variant)
+    child.observe(seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, variant, started, seconds)
+
+
+# ==========================================
+# 3. THE MIDDLEWARE (request latency, Server-Timing, per-request tracing)
+# ==========================================
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (BaseHTTPMiddleware adds a task and a memory stream to every request):
+    times every request into the route histogram, starts the request's trace and adds the
+    Server-Timing header. A streamed response (SSE) gets its header when streaming starts, so
+    it only covers the stages before that; its stage events carry their own elapsed_ms.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Optional[dict] = None # endpoint -> route template, built on the first request
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(detailed=settings.TRACE_ALL_REQUESTS or self._wants_trace(scope))
+        token = _current_trace.set(trace)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.SERVER_TIMING_ENABLED:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            route = self._route(scope)
+            key = (scope["method"], route, str(status))
+            child = _request_children.get(key)
+            if child is None:
+                child = _request_children[key] = REQUEST_SECONDS.labels(*key)
+            child.observe(time.perf_counter() - trace.started)
+            if trace.detailed:
+                trace.print_waterfall(f"{scope['method']} {scope['path']} ({status})")
+
+    def _wants_trace(self, scope) -> bool:
+        header = settings.TRACE_HEADER.lower().encode("latin-1")
+        for name, value in scope["headers"]:
+            if name == header:
+                return value not in (b"", b"0", b"false")
+        query = scope.get("query_string", b"")
+        return b"trace=" in query and parse_qs(query.decode("latin-1")).get("trace", ["0"])[0] not in ("", "0", "false")
+
+    def _route(self, scope) -> str:
+        # The router leaves the matched endpoint in the scope; its template keeps the label set small
+        # (/prospects/{prospect_id}, not one series per id)
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._routes is None:
+            self._routes = {getattr(route, "endpoint", None): route.path for route in scope["app"].routes}
+        return self._routes.get(endpoint, "unmatched")
+
+
+# ==========================================
+# 4. DATABASE (statement timings + pool gauges)
+# ==========================================
+
+WRITE_VERBS = {"insert", "update", "delete"}
+
+
+def instrument_engine(engine, name: str, pool_metrics):
+    """
+    Times every SQL statement on `engine` (pass async_engine.sync_engine for the async one) as a
+    db_write or db_read span, and exports its connection pool's PoolMetrics on /metrics.
+    """
+    from sqlalchemy import event
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is None:
+            return
+        verb = statement.lstrip()[:6].lower()
+        if verb in WRITE_VERBS:
+            record("db_write", verb, started, time.perf_counter() - started)
+        elif verb == "select":
+            record("db_read", verb, started, time.perf_counter() - started)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    _pool_collector.pools[name] = pool_metrics
+
+
+class _PoolCollector:
+    """Reads each engine's PoolMetrics when Prometheus scrapes, so checkouts cost nothing extra."""
+
+    def __init__(self):
+        self.pools: dict = {}
+
+    def collect(self):
+        connections = GaugeMetricFamily("coldemail_db_pool_connections", "Connections in the pool by state", labels=["engine", "state"])
+        size = GaugeMetricFamily("coldemail_db_pool_size", "Configured pool size (before overflow)", labels=["engine"])
+        checkouts = CounterMetricFamily("coldemail_db_pool_checkouts", "Connections handed out", labels=["engine"])
+        timeouts = CounterMetricFamily("coldemail_db_pool_timeouts", "Checkouts that gave up waiting for a connection", labels=["engine"])
+        wait = CounterMetricFamily("coldemail_db_pool_wait_seconds", "Total time spent waiting for a connection", labels=["engine"])
+        for name, pool_metrics in self.pools.items():
+            stats = pool_metrics.stats()
+            checkouts.add_metric([name], stats["checkouts"])
+            timeouts.add_metric([name], stats["timeouts"])
+            wait.add_metric([name], pool_metrics.total_wait_ms / 1000)
+            if "size" in stats:
+                size.add_metric([name], stats["size"])
+                for state in ("checked_out", "checked_in", "overflow"):
+                    connections.add_metric([name, state], stats[state])
+        return [connections, size, checkouts, timeouts, wait]
+
+
+_pool_collector = _PoolCollector()
+REGISTRY.register(_pool_collector)
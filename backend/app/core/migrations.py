@@ -0,0 +1,189 @@
+"""
+Versioned schema migrations.
+
+`create_all` only ever creates missing tables, so it can't add a column, an index or change a
+constraint on a database that already exists. Each migration below runs once, in order, inside
+its own transaction, and is recorded in the `schema_migrations` table.
+
+Migration 1 creates any missing table straight from the current models, so a brand new database
+is complete after it and every later step checks the live schema first (making it a no-op there).
+Add new steps at the end of MIGRATIONS; never edit or reorder one that has shipped.
+
+Every worker runs `upgrade` on startup, so the whole run holds a database-wide lock and each
+version is re-checked inside it: whoever waited finds the work done and skips it.
+"""
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+from app.core.database import Base
+from app.models import models # noqa: F401 (registers every table on Base.metadata)
+
+# pg_advisory_lock key for the migration run (any constant no other code uses)
+ADVISORY_LOCK_KEY = 0x636F6C64 # "cold"
+LOCK_TIMEOUT_SECONDS = 600 # How long a worker waits for another one's migrations before giving up
+
+schema_migrations = Table(
+    "schema_migrations", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+# ==========================================
+# 1. IDEMPOTENT SCHEMA HELPERS
+# ==========================================
+
+def create_table(conn: Connection, table_name: str):
+    """Creates a table (and its indexes) exactly as declared on the model, unless it is already there."""
+    Base.metadata.tables[table_name].create(conn, checkfirst=True)
+
+def add_column(conn: Connection, table_name: str, column_name: str):
+    """Adds a column exactly as declared on the model, unless it is already there."""
+    if column_name in {column["name"] for column in inspect(conn).get_columns(table_name)}:
+        return
+    column = Base.metadata.tables[table_name].c[column_name]
+    conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column.type.compile(dialect=conn.dialect)}"))
+
+def create_index(conn: Connection, table_name: str, index_name: str):
+    """Creates an index exactly as declared on the model, unless it is already there."""
+    index = next(index for index in Base.metadata.tables[table_name].indexes if index.name == index_name)
+    index.create(conn, checkfirst=True)
+
+def drop_index(conn: Connection, table_name: str, index_name: str):
+    if index_name in {index["name"] for index in inspect(conn).get_indexes(table_name)}:
+        conn.execute(text(f"DROP INDEX {index_name}"))
+
+
+# ==========================================
+# 2. THE MIGRATIONS
+# ==========================================
+
+def _create_missing_tables(conn: Connection):
+    Base.metadata.create_all(bind=conn)
+
+def _add_timestamps(conn: Connection):
+    now = datetime.utcnow()
+    for table_name in ("users", "prospects", "email_logs"):
+        for column_name in ("created_at", "updated_at"):
+            add_column(conn, table_name, column_name)
+            # Rows that predate the column get the migration time rather than NULL
+            conn.execute(text(f"UPDATE {table_name} SET {column_name} = :now WHERE {column_name} IS NULL"), {"now": now})
+
+def _add_hot_query_indexes(conn: Connection):
+    create_index(conn, "prospects", "ix_prospects_owner_id_id")
+    create_index(conn, "email_logs", "ix_email_logs_prospect_id_id")
+    create_index(conn, "email_logs", "ix_email_logs_prospect_id_status")
+
+def _email_unique_per_owner(conn: Connection):
+    # Emails were unique across all accounts (ix_prospects_email), which blocked two users adding the same lead
+    drop_index(conn, "prospects", "ix_prospects_email")
+    create_index(conn, "prospects", "ix_prospects_owner_email")
+
+def _add_outbound_email_queue(conn: Connection):
+    create_table(conn, "outbound_emails")
+
+def _add_company_chunks(conn: Connection):
+    create_table(conn, "company_chunks")
+
+def _add_company_knowledge(conn: Connection):
+    create_table(conn, "company_knowledge")
+
+def _add_scrape_cache_extraction(conn: Connection):
+    add_column(conn, "scrape_cache", "extraction")
+
+def _add_outbound_email_lease(conn: Connection):
+    add_column(conn, "outbound_emails", "claimed_at")
+
+def _add_research_job_item_leases(conn: Connection):
+    add_column(conn, "research_job_items", "claimed_by")
+    add_column(conn, "research_job_items", "heartbeat_at")
+    create_index(conn, "research_job_items", "ix_research_job_items_status_heartbeat_at")
+
+MIGRATIONS = [
+    (1, "create missing tables", _create_missing_tables),
+    (2, "created_at/updated_at on users, prospects and email_logs", _add_timestamps),
+    (3, "composite indexes for listing, drafts/history and analytics", _add_hot_query_indexes),
+    (4, "prospect emails unique per owner instead of globally", _email_unique_per_owner),
+    (5, "outbound_emails send queue", _add_outbound_email_queue),
+    (6, "company_chunks manifest for incremental ingestion", _add_company_chunks),
+    (7, "company_knowledge keyed by domain", _add_company_knowledge),
+    (8, "scrape_cache.extraction (text engine + limit of each entry)", _add_scrape_cache_extraction),
+    (9, "outbound_emails.claimed_at send lease", _add_outbound_email_lease),
+    (10, "research_job_items claimed_by/heartbeat_at leases", _add_research_job_item_leases),
+]
+
+
+# ==========================================
+# 3. RUNNING THEM
+# ==========================================
+
+def applied_versions(engine: Engine) -> set[int]:
+    with engine.begin() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+        return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+def upgrade(engine: Engine) -> list[int]:
+    """Applies every pending migration in order and returns the versions it ran."""
+    if engine.dialect.name == "sqlite":
+        # One write transaction for the whole run: BEGIN IMMEDIATE holds the database's write lock
+        with _sqlite_write_lock(engine) as conn:
+            return _apply_pending(lambda: nullcontext(conn))
+    with _advisory_lock(engine):
+        return _apply_pending(engine.begin)
+
+def _apply_pending(transaction) -> list[int]:
+    ran = []
+    with transaction() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+    for version, name, migrate in MIGRATIONS:
+        with transaction() as conn:
+            # Re-checked under the lock: another worker may have applied it while we waited
+            if conn.execute(select(schema_migrations.c.version).where(schema_migrations.c.version == version)).first():
+                continue
+            migrate(conn)
+            conn.execute(insert(schema_migrations).values(version=version, name=name, applied_at=datetime.utcnow()))
+        print(f"🗄️ Applied migration {version}: {name}")
+        ran.append(version)
+    return ran
+
+@contextmanager
+def _advisory_lock(engine: Engine):
+    """Postgres: a session-level advisory lock, held on its own connection for the whole run."""
+    with engine.connect() as lock_conn:
+        lock_conn.execute(text(f"SET lock_timeout = {int(LOCK_TIMEOUT_SECONDS * 1000)}"))
+        lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        # Session-level, so it outlives this commit (which keeps the connection from idling in a transaction)
+        lock_conn.commit()
+        try:
+            yield
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            lock_conn.execute(text("RESET lock_timeout"))
+            lock_conn.commit()
+
+@contextmanager
+def _sqlite_write_lock(engine: Engine):
+    """SQLite: BEGIN IMMEDIATE on one connection (other writers wait), committed or rolled back as a whole."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        deadline = time.monotonic() + LOCK_TIMEOUT_SECONDS
+        while True:
+            try:
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+                break
+            except OperationalError:
+                # "database is locked" after the busy timeout: another worker is still migrating
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.5)
+        try:
+            yield conn
+        except BaseException:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+        conn.exec_driver_sql("COMMIT")
@@ -0,0 +1,17 @@
+"""
+The bcrypt calls run inside the password hashing process pool (see PasswordHasher in security.py).
+Kept in their own module that imports nothing but bcrypt, so worker processes start quickly.
+"""
+import bcrypt
+
+
+def hash_password(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def check_password(password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def ping() -> bool:
+    return True
@@ -1,12 +1,20 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 import jwt
-import bcrypt
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core import password_worker
 from app.core.config import settings
 from app.core.database import get_db
 from app.models.models import User
@@ -15,18 +23,59 @@ from app.models.models import User
 # 1. PASSWORD & TOKEN GENERATION (Bcrypt)
 # ==========================================
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Checks if the typed password matches the encrypted one in the DB."""
-    return bcrypt.checkpw(
-        plain_password.encode('utf-8'), 
-        hashed_password.encode('utf-8')
-    )
+class PasswordHasher:
+    """
+    Runs bcrypt (~250 ms of CPU per call at cost 12) in a dedicated process pool, so a login
+    storm queues up there instead of competing with every other request in this process.
+    With `workers = 0` the calls run on a worker thread in this process instead.
+    """
+
+    def __init__(self, workers: int, rounds: int):
+        self.workers = workers
+        self.rounds = rounds
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # "spawn" rather than fork: this process runs other threads (browser pool, job runner)
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def start(self):
+        """Starts every worker process up front so the first logins don't pay for it."""
+        if self.workers > 0:
+            pool = self._get_pool()
+            for future in [pool.submit(password_worker.ping) for _ in range(self.workers)]:
+                future.result()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def _run(self, func, *args):
+        if self.workers <= 0:
+            return await asyncio.to_thread(func, *args)
+        return await asyncio.get_running_loop().run_in_executor(self._get_pool(), func, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(password_worker.hash_password, password, self.rounds)
 
-def get_password_hash(password: str) -> str:
-    """Encrypts a plain text password using standard bcrypt."""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8') 
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(password_worker.check_password, password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """True when the stored hash was made with a different cost than BCRYPT_ROUNDS ("$2b$<cost>$...")."""
+        try:
+            return int(hashed_password.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+
+password_hasher = PasswordHasher(workers=settings.PASSWORD_HASH_WORKERS, rounds=settings.BCRYPT_ROUNDS)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Generates the JWT passkey for the user."""
@@ -37,7 +86,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         
-    to_encode.update({"exp": expire})
+    # "iat" also keys the user cache below, so a fresh login never reuses an older token's entry
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     
     # Sign the token using your secret key
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
@@ -45,15 +95,94 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 
 # ==========================================
-# 2. THE BOUNCER (Dependency Injection)
+# 2. RESOLVED-USER CACHE
+# ==========================================
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """
+    What get_current_user hands to endpoints: a plain snapshot of the user row, not bound to
+    any Session, so one instance can be cached and shared across requests.
+    To change the user, load the row in your own Session and call `user_cache.invalidate` after commit.
+    """
+    id: int
+    email: str
+    smtp_email: Optional[str]
+    smtp_configured: bool
+
+    @classmethod
+    def from_orm(cls, user: User) -> "CurrentUser":
+        return cls(id=user.id, email=user.email, smtp_email=user.smtp_email, smtp_configured=bool(user.smtp_password))
+
+
+class UserCache:
+    """
+    Short-TTL, in-process LRU of resolved users keyed by the token's (sub, iat), so the dashboard's
+    polling doesn't look the same user up on every request.
+    Invalidation is per process: other workers pick up a profile change when the TTL runs out.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict() # (sub, iat) -> (expires_at, CurrentUser)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0}
+
+    def get(self, sub: str, iat) -> Optional[CurrentUser]:
+        with self._lock:
+            entry = self._entries.get((sub, iat))
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[(sub, iat)]
+                self._counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end((sub, iat))
+            self._counters["hits"] += 1
+            return entry[1]
+
+    def put(self, sub: str, iat, user: CurrentUser):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[(sub, iat)] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end((sub, iat))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, sub: str):
+        """Drops every cached token of one user (call after changing their row)."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == sub]:
+                del self._entries[key]
+            self._counters["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "hit_rate": round(self._counters["hits"] / lookups, 3) if lookups else 0.0,
+                "ttl_seconds": self.ttl,
+            }
+
+
+user_cache = UserCache(ttl_seconds=settings.AUTH_USER_CACHE_TTL_SECONDS, max_entries=settings.AUTH_USER_CACHE_MAX_ENTRIES)
+
+
+# ==========================================
+# 3. THE BOUNCER (Dependency Injection)
 # ==========================================
 
 # Tells FastAPI where the login route is, enabling the Swagger UI "Authorize" button
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> CurrentUser:
     """
-    Intercepts the request, reads the JWT token, and returns the current User object.
+    Intercepts the request, reads the JWT token, and returns a snapshot of the current user.
     If the token is invalid or missing, it blocks the request.
     """
     credentials_exception = HTTPException(
@@ -70,10 +199,23 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except jwt.PyJWTError:
         raise credentials_exception
+
+    # Recently resolved tokens skip the database entirely
+    cached = user_cache.get(email, payload.get("iat"))
+    if cached is not None:
+        return cached
         
     # Find the user in the database
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email).limit(1))
     if user is None:
         raise credentials_exception
-        
-    return user
\ No newline at end of file
+
+    snapshot = CurrentUser.from_orm(user)
+    user_cache.put(email, payload.get("iat"), snapshot)
+    return snapshot
+
+async def get_admin_user(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+    """Like get_current_user, but only for the operator accounts listed in ADMIN_EMAILS."""
+    if current_user.email.lower() not in {email.lower() for email in settings.ADMIN_EMAILS}:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
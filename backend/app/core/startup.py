@@ -0,0 +1,54 @@
+import time
+from contextlib import contextmanager
+
+
+class StartupTracker:
+    """
+    Records how long each import and init step takes so cold starts can be tracked,
+    and gates readiness until the background warm-up has finished.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings: dict[str, float] = {}
+        self.errors: dict[str, str] = {}
+        self.ready = False
+
+    @contextmanager
+    def measure(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - started
+
+    async def run_step(self, name: str, awaitable):
+        """Awaits one warm-up step. A failure is recorded (degraded) rather than fatal."""
+        started = time.perf_counter()
+        try:
+            await awaitable
+        except Exception as e:
+            message = (str(e).splitlines() or [""])[0]
+            self.errors[name] = f"{type(e).__name__}: {message}"
+            print(f"⚠️ Startup step '{name}' failed: {message}")
+        finally:
+            self.timings[name] = time.perf_counter() - started
+
+    def mark_ready(self):
+        self.ready = True
+        total = time.perf_counter() - self.started
+        print(f"🚀 Startup finished in {total:.2f}s")
+        for name, seconds in sorted(self.timings.items(), key=lambda item: -item[1]):
+            status = " (failed)" if name in self.errors else ""
+            print(f"   {seconds * 1000:8.1f} ms  {name}{status}")
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "degraded": sorted(self.errors),
+            "errors": self.errors,
+            "timings_ms": {name: round(seconds * 1000, 1) for name, seconds in self.timings.items()},
+        }
+
+
+startup = StartupTracker()
@@ -1,11 +1,12 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import models
 from app.schemas import prospect as prospect_schema
 
-def get_prospect_by_email(db: Session, email: str):
-    return db.query(models.Prospect).filter(models.Prospect.email == email).first()
+async def get_prospect_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(models.Prospect).where(models.Prospect.email == email).limit(1))
 
-def create_prospect(db: Session, prospect: prospect_schema.ProspectCreate):
+async def create_prospect(db: AsyncSession, prospect: prospect_schema.ProspectCreate):
     db_prospect = models.Prospect(
         first_name=prospect.first_name,
         last_name=prospect.last_name,
@@ -16,24 +17,75 @@ def create_prospect(db: Session, prospect: prospect_schema.ProspectCreate):
         job_title=prospect.job_title
     )
     db.add(db_prospect)
-    db.commit()
-    db.refresh(db_prospect)
+    await db.commit()
+    await db.refresh(db_prospect)
     return db_prospect
 
-def get_prospects(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Prospect).offset(skip).limit(limit).all()
+async def get_prospects(db: AsyncSession, skip: int = 0, limit: int = 100):
+    return (await db.scalars(select(models.Prospect).offset(skip).limit(limit))).all()
 
-def get_prospect(db: Session, prospect_id: int):
-    return db.query(models.Prospect).filter(models.Prospect.id == prospect_id).first()
+# Columns returned by the prospect listing (everything the sidebar and chat views need)
+PROSPECT_LIST_COLUMNS = (
+    models.Prospect.id,
+    models.Prospect.first_name,
+    models.Prospect.last_name,
+    models.Prospect.email,
+    models.Prospect.company_name,
+    models.Prospect.company_website,
+)
+PROSPECT_SORT_FIELDS = ("id", "first_name", "last_name", "email", "company_name")
 
-def create_email_log(db: Session, prospect_id: int, personalized_opening: str, full_body: str = ""):
+def query_prospects(owner_id: int, sort: str = "id", after: tuple = None,
+                    search: str = None, company: str = None):
+    """
+    One owner's prospects as plain rows, filtered and in a stable order for keyset pagination.
+    `sort` is a field from PROSPECT_SORT_FIELDS, prefixed with "-" for descending; `id` breaks ties.
+    `after` is the (sort value, id) of the last row already seen.
+    Returns a SELECT statement to run with `db.execute` (or `db.stream`) on either kind of session.
+    """
+    descending = sort.startswith("-")
+    field = sort.lstrip("-")
+    id_column = models.Prospect.id
+    # NULLs would break the row-value comparison below, so they sort as empty strings
+    sort_column = id_column if field == "id" else func.coalesce(getattr(models.Prospect, field), "")
+
+    query = select(*PROSPECT_LIST_COLUMNS).where(models.Prospect.owner_id == owner_id)
+
+    if search:
+        pattern = f"%{search}%"
+        query = query.where(or_(
+            models.Prospect.first_name.ilike(pattern),
+            models.Prospect.last_name.ilike(pattern),
+            models.Prospect.email.ilike(pattern),
+            models.Prospect.company_name.ilike(pattern),
+        ))
+    if company:
+        query = query.where(models.Prospect.company_name == company)
+
+    if after is not None:
+        if field == "id":
+            query = query.where(id_column < after[1] if descending else id_column > after[1])
+        else:
+            position = tuple_(sort_column, id_column)
+            query = query.where(position < tuple_(*after) if descending else position > tuple_(*after))
+
+    if field == "id":
+        return query.order_by(id_column.desc() if descending else id_column)
+    if descending:
+        return query.order_by(sort_column.desc(), id_column.desc())
+    return query.order_by(sort_column, id_column)
+
+async def get_prospect(db: AsyncSession, prospect_id: int):
+    return await db.get(models.Prospect, prospect_id)
+
+async def create_email_log(db: AsyncSession, prospect_id: int, personalized_opening: str, full_body: str = ""):
     db_email = models.EmailLog(
         prospect_id=prospect_id,
         personalized_opening=personalized_opening,
         full_body=full_body,
-        status="draft" 
+        status="draft"
     )
     db.add(db_email)
-    db.commit()
-    db.refresh(db_email)
-    return db_email
\ No newline at end of file
+    await db.commit()
+    await db.refresh(db_email)
+    return db_email
@@ -1,15 +1,77 @@
-from fastapi import FastAPI
-from app.core.config import settings
-from app.core.database import engine
-from app.models import models  
-from app.api.v1.endpoints import prospects, research, analytics, auth
-# Create the database tables
-from fastapi.middleware.cors import CORSMiddleware
-models.Base.metadata.create_all(bind=engine)
+import asyncio
+from contextlib import asynccontextmanager
+
+# Imported first so its clock starts as close to process start as possible
+from app.core.startup import startup
+
+with startup.measure("import fastapi"):
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse, Response
+with startup.measure("import app.core + models"):
+    from app.core.config import settings
+    from app.core.database import engine, async_engine
+    from app.core import migrations
+    from app.core import metrics
+with startup.measure("import app.api (endpoints + services)"):
+    from app.api.v1.endpoints import prospects, research, analytics, auth, stats
+    from app.services.browser_pool import browser_pool
+    from app.services.gemini_client import get_client
+    from app.services.scraper import scraper
+    from app.services.vector_db import vector_db
+    from app.services.job_runner import job_runner
+    from app.services.email_queue import email_queue
+    from app.services.company_ingest import company_ingest
+    from app.core.security import password_hasher
+
+
+async def warm_up():
+    """
+    Slow, network-bound init, run concurrently in the background after the server is up.
+    /health/ready answers 503 until it finishes. A failed step leaves the app degraded
+    (that service initializes lazily on first use instead) rather than failing startup.
+    """
+    await asyncio.gather(
+        # Launch the browsers up front so the first scrape doesn't pay for it
+        startup.run_step("browser_pool.start", asyncio.to_thread(browser_pool.start)),
+        startup.run_step("vector_db.backend", asyncio.to_thread(lambda: vector_db.backend)),
+        startup.run_step("gemini_client + query embeddings", warm_gemini()),
+        startup.run_step("password_hasher.start", asyncio.to_thread(password_hasher.start)),
+    )
+    startup.mark_ready()
+
+async def warm_gemini():
+    await asyncio.to_thread(get_client)
+    await vector_db.warm_query_cache()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bring the database schema up to date (everything below needs it)
+    with startup.measure("db.migrations"):
+        await asyncio.to_thread(migrations.upgrade, engine)
+    with startup.measure("job_runner.start"):
+        await job_runner.start()
+    with startup.measure("email_queue.start"):
+        await email_queue.start()
+    warm_up_task = asyncio.create_task(warm_up())
+
+    yield
+
+    warm_up_task.cancel()
+    await job_runner.stop()
+    await email_queue.stop()
+    await company_ingest.stop() # Background knowledge refreshes need the scraper below
+    scraper.close()
+    browser_pool.close()
+    password_hasher.close()
+    await vector_db.close_async()
+    await async_engine.dispose()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -19,6 +81,8 @@ app.add_middleware(
     allow_methods=["*"], # Allow GET, POST, PUT, DELETE
     allow_headers=["*"],
 )
+# Added last so it wraps everything: request latency by route, Server-Timing, ?trace=1 / X-Trace: 1
+app.add_middleware(metrics.MetricsMiddleware)
 
 @app.get("/")
 def read_root():
@@ -28,7 +92,22 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/ready")
+def readiness_check():
+    """Readiness probe: 503 until the background warm-up is done, plus the startup timing breakdown."""
+    report = startup.report()
+    if not report["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting", **report})
+    return {"status": "degraded" if report["degraded"] else "ready", **report}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape target: stage and request latency histograms, DB pool gauges, external call errors."""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
 app.include_router(prospects.router, prefix="/api/v1/prospects", tags=["prospects"])
-app.include_router(research.router, prefix="/api/v1/research", tags=["research"]) 
+app.include_router(research.router, prefix="/api/v1/research", tags=["research"])
 app.include_router(analytics.router, prefix="/api/v1/analytics", tags=["analytics"])
-app.include_router(auth.router, prefix="/api/v1/auth", tags=["authentication"])
\ No newline at end of file
+app.include_router(auth.router, prefix="/api/v1/auth", tags=["authentication"])
+app.include_router(stats.router, prefix="/api/v1/stats", tags=["stats"])
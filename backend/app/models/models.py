@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Date, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -13,20 +14,32 @@ class User(Base):
     smtp_email = Column(String, nullable=True)
     smtp_password = Column(String, nullable=True) # Their Google App Password
 
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
     prospects = relationship("Prospect", back_populates="owner")
 
 class Prospect(Base):
     __tablename__ = "prospects"
+    __table_args__ = (
+        # Duplicate check: an email is unique per user, not across every account
+        Index("ix_prospects_owner_email", "owner_id", "email", unique=True),
+        # Listing: one owner's prospects in id order (keyset pagination)
+        Index("ix_prospects_owner_id_id", "owner_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String, index=True)
     last_name = Column(String, index=True)
-    email = Column(String, unique=True, index=True)
+    email = Column(String)
     company_name = Column(String)
     company_website = Column(String)
     
     # Links Prospect to the User who created it
     owner_id = Column(Integer, ForeignKey("users.id")) 
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # THE MISSING LINES: Re-establishing the connections
     owner = relationship("User", back_populates="prospects")
@@ -34,12 +47,150 @@ class Prospect(Base):
 
 class EmailLog(Base):
     __tablename__ = "email_logs"
+    __table_args__ = (
+        # Drafts and history: one prospect's emails in id order
+        Index("ix_email_logs_prospect_id_id", "prospect_id", "id"),
+        # Analytics recounts: emails per status for a set of prospects
+        Index("ix_email_logs_prospect_id_status", "prospect_id", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     prospect_id = Column(Integer, ForeignKey("prospects.id"))
     personalized_opening = Column(String)
     full_body = Column(String)
     status = Column(String, default="draft")
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Links EmailLog back to the Prospect
-    prospect = relationship("Prospect", back_populates="emails")
\ No newline at end of file
+    prospect = relationship("Prospect", back_populates="emails")
+
+class ResearchJob(Base):
+    """A batch of prospects queued for background email generation."""
+    __tablename__ = "research_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+    status = Column(String, default="queued") # queued -> running -> completed
+    total = Column(Integer, default=0)
+    completed = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    items = relationship("ResearchJobItem", back_populates="job")
+
+class ResearchJobItem(Base):
+    """One prospect inside a ResearchJob, with its own outcome and timing."""
+    __tablename__ = "research_job_items"
+    __table_args__ = (
+        # The job runners' watchdog: running items whose worker stopped heartbeating
+        Index("ix_research_job_items_status_heartbeat_at", "status", "heartbeat_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("research_jobs.id"), index=True)
+    # Plain ids (no FKs) so deleting a prospect or its emails doesn't have to rewrite job history
+    prospect_id = Column(Integer)
+    status = Column(String, default="pending") # pending -> running -> done | failed
+    claimed_by = Column(String, nullable=True) # Worker running it (see services/job_runner.py)
+    heartbeat_at = Column(DateTime, nullable=True) # Refreshed while it runs; a stale one is handed to another worker
+    error = Column(String, nullable=True)
+    email_log_id = Column(Integer, nullable=True)
+    duration_ms = Column(Integer, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    job = relationship("ResearchJob", back_populates="items")
+
+class OutboundEmail(Base):
+    """One email handed to the background senders for SMTP delivery (see services/email_queue.py)."""
+    __tablename__ = "outbound_emails"
+    __table_args__ = (
+        # The senders' poll: queued messages that are due, oldest first
+        Index("ix_outbound_emails_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True) # Whose SMTP account sends it
+    # Plain id (no FK) so deleting a prospect's emails doesn't have to touch the send history
+    email_log_id = Column(Integer, index=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String)
+    body = Column(String)
+    status = Column(String, default="queued") # queued -> sending -> sent | failed (back to queued to retry)
+    claimed_at = Column(DateTime, nullable=True) # When a sender took it; "sending" rows older than the lease are re-queued
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+class CompanyChunk(Base):
+    """
+    One embedded chunk of a company's website, so re-ingesting only embeds chunks whose text
+    changed and deletes the ones that disappeared (see services/company_ingest.py).
+    The chunk's text and vector live in the vector index under `vector_id`.
+    """
+    __tablename__ = "company_chunks"
+    __table_args__ = (
+        Index("ix_company_chunks_company_hash", "company", "chunk_hash", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    company = Column(String, nullable=False) # The company's domain, same key as the vectors' "company" metadata filter
+    chunk_hash = Column(String(64), nullable=False) # sha256 of the chunk text
+    vector_id = Column(String, nullable=False)
+    page_url = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class CompanyKnowledge(Base):
+    """
+    One company's ingested website, keyed by normalized domain and shared by every prospect
+    (and user) at that company. `ingested_at` says how fresh its chunks are.
+    """
+    __tablename__ = "company_knowledge"
+
+    id = Column(Integer, primary_key=True, index=True)
+    domain = Column(String, unique=True, index=True, nullable=False) # e.g. "acme.com" for https://www.acme.com/about
+    name = Column(String) # Company name from the last prospect that triggered an ingest
+    website = Column(String)
+    pages = Column(Integer, default=0)
+    chunks = Column(Integer, default=0)
+    ingested_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ScrapeCacheEntry(Base):
+    """Cleaned text of a fetched URL, plus the validators needed to revalidate it cheaply."""
+    __tablename__ = "scrape_cache"
+
+    url = Column(String, primary_key=True) # Normalized, see services/scrape_cache.py
+    text = Column(String)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+    extraction = Column(String, nullable=True) # "<engine>:<max chars>" the text was extracted with
+
+class OwnerStats(Base):
+    """
+    Running per-user counters behind the analytics summary, kept up to date on every flush
+    (see services/owner_stats.py) so the dashboard never has to count rows.
+    """
+    __tablename__ = "owner_stats"
+
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    prospects = Column(Integer, default=0, nullable=False)
+    drafts = Column(Integer, default=0, nullable=False)
+    sent = Column(Integer, default=0, nullable=False)
+
+class OwnerDailyStats(Base):
+    """What happened for a user on one (UTC) day, for trend charts. Only ever incremented."""
+    __tablename__ = "owner_daily_stats"
+
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    prospects_added = Column(Integer, default=0, nullable=False)
+    drafts_created = Column(Integer, default=0, nullable=False)
+    emails_sent = Column(Integer, default=0, nullable=False)
@@ -0,0 +1,289 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.config import settings
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+LAUNCH_ARGS = ["--disable-blink-features=AutomationControlled", "--disable-infobars"]
+
+
+@dataclass
+class _Slot:
+    """One warm browser context. A slot serves a single page at a time."""
+    browser_index: int
+    context: object = None
+    generation: int = 0
+    pages_served: int = 0
+
+
+class BrowserPool:
+    """
+    Keeps a fleet of warm Chromium browsers (and their contexts) alive for the
+    lifetime of the process, so scrapes lease a page instead of launching a browser.
+
+    Playwright objects belong to the event loop that created them, so the pool owns
+    a background thread running its own loop. Every browser call (and the rest of the
+    scraper's async fetch work) is scheduled onto it via `run` / `submit`.
+    """
+
+    def __init__(self, size: int, contexts_per_browser: int, max_pages_per_context: int,
+                 lease_timeout: float, blocked_resources: list[str]):
+        self.size = size
+        self.contexts_per_browser = contexts_per_browser
+        self.max_pages_per_context = max_pages_per_context
+        self.lease_timeout = lease_timeout
+        self.blocked_resources = set(blocked_resources)
+
+        self._start_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._playwright = None
+        self._browsers: list = []
+        self._generations: list[int] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._launch_lock: Optional[asyncio.Lock] = None
+        self._relaunch_lock: Optional[asyncio.Lock] = None
+        self._in_flight: set[concurrent.futures.Future] = set()
+
+        self._leased = 0
+        self._counters = {
+            "leases": 0,
+            "pages_served": 0,
+            "contexts_created": 0,
+            "contexts_recycled": 0,
+            "browser_relaunches": 0,
+            "lease_timeouts": 0,
+            "lease_wait_seconds_total": 0.0,
+            "lease_wait_seconds_max": 0.0,
+        }
+
+    # ==========================================
+    # 1. LIFECYCLE
+    # ==========================================
+
+    def _ensure_loop(self):
+        """Spins up the pool's background event loop (idempotent)."""
+        if self._loop is not None:
+            return
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="browser-pool", daemon=True).start()
+            self._loop = loop
+
+    def start(self):
+        """Launches the browsers up front so the first scrape doesn't pay for it (idempotent)."""
+        self.run(self._ensure_browsers())
+
+    async def _ensure_browsers(self):
+        if self._idle is not None:
+            return
+        if self._launch_lock is None:
+            self._launch_lock = asyncio.Lock()
+        async with self._launch_lock:
+            if self._idle is not None:
+                return
+            try:
+                await self._start()
+            except Exception:
+                # Tear down whatever did launch so the next lease retries from scratch
+                await self._close()
+                raise
+            print(f"🌐 Browser pool ready: {self.size} browser(s) x {self.contexts_per_browser} context(s)")
+
+    async def _start(self):
+        from playwright.async_api import async_playwright
+
+        self._playwright = await async_playwright().start()
+        self._relaunch_lock = asyncio.Lock()
+        idle = asyncio.Queue()
+        for index in range(self.size):
+            self._browsers.append(await self._launch_browser())
+            self._generations.append(0)
+            for _ in range(self.contexts_per_browser):
+                idle.put_nowait(_Slot(browser_index=index))
+        self._idle = idle
+
+    async def _launch_browser(self):
+        return await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+
+    def close(self):
+        """Closes every browser and stops the pool's loop."""
+        if self._loop is None:
+            return
+        loop, self._loop = self._loop, None
+        try:
+            # Cancel in-flight work first (e.g. a warm-up launch), otherwise the threads blocked in
+            # `run()` on it would wait forever once the loop stops
+            for future in list(self._in_flight):
+                future.cancel()
+            asyncio.run_coroutine_threadsafe(self._close(), loop).result(timeout=10)
+        except Exception as e:
+            print(f"Browser pool shutdown error: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+    async def _close(self):
+        for browser in self._browsers:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        self._browsers = []
+        self._generations = []
+        self._idle = None
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+
+    # ==========================================
+    # 2. RUNNING WORK ON THE POOL'S LOOP
+    # ==========================================
+
+    def _schedule(self, coro) -> concurrent.futures.Future:
+        self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        self._in_flight.add(future)
+        future.add_done_callback(self._in_flight.discard)
+        return future
+
+    def run(self, coro):
+        """Runs a coroutine on the pool's loop and blocks until it finishes (for sync callers)."""
+        return self._schedule(coro).result()
+
+    async def submit(self, coro):
+        """Awaits a coroutine on the pool's loop from another event loop (e.g. FastAPI's)."""
+        return await asyncio.wrap_future(self._schedule(coro))
+
+    # ==========================================
+    # 3. LEASING PAGES
+    # ==========================================
+
+    @asynccontextmanager
+    async def lease_page(self):
+        """
+        Leases a fresh page from a warm context. Must run on the pool's loop.
+        The page is closed and its context handed back to the pool on exit.
+        """
+        await self._ensure_browsers()
+        started = time.perf_counter()
+        try:
+            slot = await asyncio.wait_for(self._idle.get(), timeout=self.lease_timeout)
+        except asyncio.TimeoutError:
+            self._counters["lease_timeouts"] += 1
+            raise
+        waited = time.perf_counter() - started
+        self._counters["lease_wait_seconds_total"] += waited
+        self._counters["lease_wait_seconds_max"] = max(self._counters["lease_wait_seconds_max"], waited)
+
+        page = None
+        self._leased += 1
+        try:
+            await self._prepare_slot(slot)
+            page = await slot.context.new_page()
+            from playwright_stealth import stealth_async
+            await stealth_async(page)
+            self._counters["leases"] += 1
+            yield page
+        finally:
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+                slot.pages_served += 1
+                self._counters["pages_served"] += 1
+            self._leased -= 1
+            self._idle.put_nowait(slot)
+
+    async def _prepare_slot(self, slot: _Slot):
+        """Health-checks the slot's browser and recycles its context when it is worn out."""
+        index = slot.browser_index
+        if not self._browsers[index].is_connected():
+            await self._relaunch(index)
+
+        stale = slot.generation != self._generations[index]
+        worn_out = slot.pages_served >= self.max_pages_per_context
+        if slot.context is not None and (stale or worn_out):
+            try:
+                await slot.context.close()
+            except Exception:
+                pass
+            slot.context = None
+            self._counters["contexts_recycled"] += 1
+
+        if slot.context is None:
+            slot.context = await self._browsers[index].new_context(user_agent=USER_AGENT)
+            await slot.context.route("**/*", self._block_heavy_resources)
+            slot.generation = self._generations[index]
+            slot.pages_served = 0
+            self._counters["contexts_created"] += 1
+
+    async def _relaunch(self, index: int):
+        async with self._relaunch_lock:
+            # Another slot on the same browser may have already relaunched it
+            if self._browsers[index].is_connected():
+                return
+            print(f"Browser #{index} disconnected, relaunching...")
+            self._browsers[index] = await self._launch_browser()
+            self._generations[index] += 1
+            self._counters["browser_relaunches"] += 1
+
+    async def _block_heavy_resources(self, route):
+        """We only need the DOM text, so images, fonts, media and CSS are never downloaded."""
+        if route.request.resource_type in self.blocked_resources:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    # ==========================================
+    # 4. HELPERS, HEALTH & STATS
+    # ==========================================
+
+    async def fetch(self, url: str, timeout_ms: int = 15000) -> tuple[str, dict]:
+        """Loads a URL on a leased page and returns the rendered HTML and the response headers."""
+        async with self.lease_page() as page:
+            response = await page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
+            headers = response.headers if response is not None else {}
+            return await page.content(), headers
+
+    async def _health_check(self) -> int:
+        await self._ensure_browsers()
+        relaunched = 0
+        for index, browser in enumerate(self._browsers):
+            if not browser.is_connected():
+                await self._relaunch(index)
+                relaunched += 1
+        return relaunched
+
+    def health_check(self) -> dict:
+        """Relaunches any dead browsers and reports how many needed it."""
+        relaunched = self.run(self._health_check())
+        return {"healthy": relaunched == 0, "relaunched": relaunched}
+
+    def stats(self) -> dict:
+        total_slots = self.size * self.contexts_per_browser
+        return {
+            "started": self._idle is not None,
+            "browsers": self.size,
+            "contexts_per_browser": self.contexts_per_browser,
+            "max_pages_per_context": self.max_pages_per_context,
+            "total_slots": total_slots,
+            "leased": self._leased,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "blocked_resources": sorted(self.blocked_resources),
+            **self._counters,
+        }
+
+
+browser_pool = BrowserPool(
+    size=settings.BROWSER_POOL_SIZE,
+    contexts_per_browser=settings.BROWSER_CONTEXTS_PER_BROWSER,
+    max_pages_per_context=settings.BROWSER_CONTEXT_MAX_PAGES,
+    lease_timeout=settings.BROWSER_LEASE_TIMEOUT_SECONDS,
+    blocked_resources=settings.BROWSER_BLOCKED_RESOURCES,
+)
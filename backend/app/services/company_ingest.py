@@ -0,0 +1,329 @@
+import asyncio
+import hashlib
+import re
+import time
+import urllib.parse
+from datetime import datetime
+from typing import Optional
+
+from app.core.config import settings
+from app.core.database import SessionLocal, dialect_insert
+from app.models import models
+from app.services.scraper import scraper
+from app.services.vector_db import vector_db
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+ANCHOR_EVERY = 4 # On average one sentence in this many may end a chunk early (see chunk_text)
+
+
+def chunk_text(text: str, target_chars: int, overlap_chars: int) -> list[str]:
+    """
+    Splits text into chunks of about `target_chars`, each starting with the last sentence(s) of
+    the previous one (up to `overlap_chars`).
+
+    Once a chunk is half full it also ends after any "anchor" sentence, picked by hashing the
+    sentence itself. Boundaries therefore follow the content rather than character offsets, so
+    an edit near the top of a page only changes the chunk it lands in instead of shifting (and
+    re-embedding) every chunk after it.
+    """
+    sentences = []
+    for sentence in SENTENCE_END.split(text.strip()):
+        # Menus and lists often have no punctuation at all: cut those into word-boundary pieces
+        while len(sentence) > target_chars:
+            cut = sentence.rfind(" ", 0, target_chars)
+            cut = cut if cut > 0 else target_chars
+            sentences.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+        if sentence:
+            sentences.append(sentence)
+
+    chunks, current, size, carried = [], [], 0, 0
+    for sentence in sentences:
+        current.append(sentence)
+        size += len(sentence) + 1
+        anchor = int(hashlib.md5(sentence.encode("utf-8")).hexdigest(), 16) % ANCHOR_EVERY == 0
+        if size >= target_chars or (anchor and size >= target_chars // 2):
+            chunks.append(" ".join(current))
+            overlap = []
+            for previous in reversed(current):
+                if sum(len(s) + 1 for s in overlap) + len(previous) > overlap_chars:
+                    break
+                overlap.insert(0, previous)
+            current, size, carried = overlap, sum(len(s) + 1 for s in overlap), len(overlap)
+    # The tail is only worth a chunk if it holds more than the overlap carried over from the last one
+    if len(current) > carried:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def company_domain(website: str) -> str:
+    """The key company knowledge is shared under: lowercase host without "www." or port ("https://www.Acme.com/x" -> "acme.com")."""
+    website = website.strip()
+    if "://" not in website:
+        website = "https://" + website
+    host = (urllib.parse.urlsplit(website).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class CompanyIngestor:
+    """
+    Turns a company's website into retrievable knowledge: crawls a handful of high-signal pages
+    (home, about, news, blog, careers), splits them into overlapping chunks and stores one vector
+    per chunk. Every chunk is identified by the hash of its text and listed in the company_chunks
+    table, so re-ingesting only embeds chunks that are new (in batched Gemini calls) and deletes
+    the ones that disappeared. A site that barely changed costs close to zero embedding calls.
+
+    Knowledge is keyed by the company's domain and shared by every prospect and user there: while
+    it is fresh the pipeline goes straight to retrieval, once stale it is re-crawled in the
+    background, and concurrent requests for the same company share one crawl.
+    """
+
+    def __init__(self, paths: list[str], chunk_chars: int, overlap_chars: int, knowledge_ttl_seconds: int):
+        self.paths = paths
+        self.chunk_chars = chunk_chars
+        self.overlap_chars = overlap_chars
+        self.knowledge_ttl_seconds = knowledge_ttl_seconds
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._lock_users: dict[str, int] = {} # company -> ingests holding or waiting on its lock (dropped at 0)
+        self._refreshing: dict[str, asyncio.Task] = {} # domain -> the crawl + ingest everyone asking is waiting on
+        self._background: set[asyncio.Task] = set()
+        self._counters = {
+            "ingests": 0, "pages": 0, "chunks_seen": 0, "chunks_embedded": 0, "chunks_unchanged": 0, "chunks_removed": 0,
+            "knowledge_fresh": 0, "knowledge_stale": 0, "knowledge_missing": 0,
+            "background_refreshes": 0, "refresh_failures": 0, "coalesced_refreshes": 0,
+        }
+
+    # ==========================================
+    # 1. CRAWLING
+    # ==========================================
+
+    def page_urls(self, website: str) -> list[str]:
+        """The homepage plus the configured high-signal paths on the same site."""
+        parts = urllib.parse.urlsplit(website)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        urls = [website]
+        for path in self.paths:
+            url = origin + path
+            if url.rstrip("/") != website.rstrip("/") and url not in urls:
+                urls.append(url)
+        return urls
+
+    async def crawl_async(self, website: str) -> dict[str, str]:
+        """Fetches the pages concurrently (the scraper paces them per host) and returns url -> text, homepage first."""
+        urls = self.page_urls(website)
+        texts = await asyncio.gather(*(scraper.scrape_website_async(url) for url in urls))
+        pages, seen = {}, set()
+        for url, text in zip(urls, texts):
+            # Missing sections often just redirect to (or re-render) the homepage
+            if text and text not in seen:
+                pages[url] = text
+                seen.add(text)
+        return pages
+
+    # ==========================================
+    # 2. INGESTION
+    # ==========================================
+
+    def _chunks(self, pages: dict[str, str]) -> dict[str, tuple[str, str]]:
+        """chunk hash -> (page url, text), in page order, without duplicates."""
+        chunks = {}
+        for url, text in pages.items():
+            for chunk in chunk_text(text, self.chunk_chars, self.overlap_chars):
+                chunks.setdefault(hashlib.sha256(chunk.encode("utf-8")).hexdigest(), (url, chunk))
+        return chunks
+
+    def _vector_id(self, company: str, chunk_hash: str) -> str:
+        # Hashed so any company name gives a short, ASCII-only id (Pinecone requires that)
+        return f"chunk_{hashlib.sha1(company.encode('utf-8')).hexdigest()[:12]}_{chunk_hash[:24]}"
+
+    def _existing_chunks(self, company: str) -> dict[str, tuple[str, str]]:
+        """chunk hash -> (vector id, page url) of everything stored for the company."""
+        with SessionLocal() as db:
+            rows = db.query(models.CompanyChunk.chunk_hash, models.CompanyChunk.vector_id, models.CompanyChunk.page_url).filter(
+                models.CompanyChunk.company == company
+            )
+            return {chunk_hash: (vector_id, page_url) for chunk_hash, vector_id, page_url in rows}
+
+    def _save_manifest(self, company: str, added: list[dict], removed_hashes: list[str]):
+        with SessionLocal() as db:
+            if removed_hashes:
+                db.query(models.CompanyChunk).filter(
+                    models.CompanyChunk.company == company,
+                    models.CompanyChunk.chunk_hash.in_(removed_hashes)
+                ).delete(synchronize_session=False)
+            if added:
+                # Another process may have stored some of the same chunks (same hashes, same vector ids):
+                # keep theirs, in the same transaction as the delete
+                db.execute(
+                    dialect_insert(models.CompanyChunk).values(added)
+                    .on_conflict_do_nothing(index_elements=["company", "chunk_hash"])
+                )
+            db.commit()
+
+    async def ingest_async(self, company: str, pages: dict[str, str]) -> dict:
+        """Brings the vectors of the pages in `pages` up to date, embedding only chunks we haven't stored before."""
+        # Two prospects at the same company ingest one after the other, so the second finds the chunks stored
+        lock = self._locks.setdefault(company, asyncio.Lock())
+        self._lock_users[company] = self._lock_users.get(company, 0) + 1
+        try:
+            async with lock:
+                return await self._ingest(company, pages)
+        finally:
+            # Forget the lock once nobody holds or waits on it, so one entry per company ever seen doesn't pile up
+            self._lock_users[company] -= 1
+            if not self._lock_users[company]:
+                del self._lock_users[company]
+                del self._locks[company]
+
+    async def _ingest(self, company: str, pages: dict[str, str]) -> dict:
+        started = time.perf_counter()
+        chunks = self._chunks(pages)
+        existing = await asyncio.to_thread(self._existing_chunks, company)
+        new_hashes = [chunk_hash for chunk_hash in chunks if chunk_hash not in existing]
+        # Only pages we actually fetched this time can tell us a chunk is gone. A page that timed out
+        # or got throttled is just missing from `pages`, and its chunks stay until it is fetched again.
+        removed_hashes = [
+            chunk_hash for chunk_hash, (_, page_url) in existing.items()
+            if chunk_hash not in chunks and page_url in pages
+        ]
+
+        if new_hashes:
+            print(f"Embedding {len(new_hashes)} new chunk(s) for {company} ({len(chunks) - len(new_hashes)} unchanged)...")
+            vectors = await vector_db.embed_batch_async([chunks[chunk_hash][1] for chunk_hash in new_hashes])
+            records = []
+            for chunk_hash, vector in zip(new_hashes, vectors):
+                url, text = chunks[chunk_hash]
+                records.append({
+                    "id": self._vector_id(company, chunk_hash),
+                    "values": vector,
+                    # We store the actual text as metadata so we can retrieve it later
+                    "metadata": {"company": company, "text": text, "url": url},
+                })
+            await vector_db.upsert_async(records)
+        if removed_hashes:
+            await vector_db.delete_async([existing[chunk_hash][0] for chunk_hash in removed_hashes])
+
+        added = [
+            {"company": company, "chunk_hash": chunk_hash, "vector_id": self._vector_id(company, chunk_hash),
+             "page_url": chunks[chunk_hash][0], "created_at": datetime.utcnow()}
+            for chunk_hash in new_hashes
+        ]
+        if added or removed_hashes:
+            await asyncio.to_thread(self._save_manifest, company, added, removed_hashes)
+
+        result = {
+            "pages": len(pages),
+            "chunks": len(chunks),
+            "embedded": len(new_hashes),
+            "unchanged": len(chunks) - len(new_hashes),
+            "removed": len(removed_hashes),
+            "elapsed_ms": int((time.perf_counter() - started) * 1000),
+        }
+        self._counters["ingests"] += 1
+        self._counters["pages"] += result["pages"]
+        self._counters["chunks_seen"] += result["chunks"]
+        self._counters["chunks_embedded"] += result["embedded"]
+        self._counters["chunks_unchanged"] += result["unchanged"]
+        self._counters["chunks_removed"] += result["removed"]
+        return result
+
+    # ==========================================
+    # 3. COMPANY KNOWLEDGE (shared across prospects, keyed by domain)
+    # ==========================================
+
+    def _load_knowledge(self, domain: str) -> Optional[dict]:
+        with SessionLocal() as db:
+            row = db.query(models.CompanyKnowledge).filter(models.CompanyKnowledge.domain == domain).first()
+            if row is None or row.ingested_at is None:
+                return None
+            age = (datetime.utcnow() - row.ingested_at).total_seconds()
+            return {
+                "domain": domain,
+                "chunks": row.chunks,
+                "pages": row.pages,
+                "age_seconds": int(age),
+                "fresh": age < self.knowledge_ttl_seconds,
+            }
+
+    async def knowledge_async(self, domain: str) -> Optional[dict]:
+        """What we already know about the company at `domain` (and whether it is fresh), or None."""
+        knowledge = await asyncio.to_thread(self._load_knowledge, domain)
+        if knowledge is None or not knowledge["chunks"]:
+            self._counters["knowledge_missing"] += 1
+            return None
+        self._counters["knowledge_fresh" if knowledge["fresh"] else "knowledge_stale"] += 1
+        return knowledge
+
+    def _save_knowledge(self, domain: str, name: str, website: str, pages: int, chunks: int):
+        # One upsert on the unique domain, so two processes finishing the same crawl can't collide
+        values = {"name": name, "website": website, "pages": pages, "chunks": chunks, "ingested_at": datetime.utcnow()}
+        statement = dialect_insert(models.CompanyKnowledge).values(domain=domain, created_at=datetime.utcnow(), **values)
+        with SessionLocal() as db:
+            db.execute(statement.on_conflict_do_update(index_elements=["domain"], set_=values))
+            db.commit()
+
+    async def refresh_async(self, domain: str, website: str, name: str) -> dict:
+        """
+        Crawls and (incrementally) ingests the company, returning {"pages": url -> text, "ingest": stats}.
+        Callers asking for a domain that is already being crawled wait for that crawl instead.
+        """
+        task = self._refreshing.get(domain)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh(domain, website, name))
+            self._refreshing[domain] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(domain, None))
+        else:
+            self._counters["coalesced_refreshes"] += 1
+        # Shielded so one caller going away (a closed SSE stream) doesn't cancel the crawl others wait on
+        return await asyncio.shield(task)
+
+    async def _refresh(self, domain: str, website: str, name: str) -> dict:
+        pages = await self.crawl_async(website)
+        if not pages:
+            return {"pages": {}, "ingest": None}
+        ingested = await self.ingest_async(domain, pages)
+        await asyncio.to_thread(self._save_knowledge, domain, name, website, len(pages), ingested["chunks"])
+        return {"pages": pages, "ingest": ingested}
+
+    def refresh_in_background(self, domain: str, website: str, name: str):
+        """Re-crawls stale knowledge without making the current request wait for it."""
+        if domain in self._refreshing:
+            return
+        self._counters["background_refreshes"] += 1
+        print(f"Refreshing stale company knowledge for {domain} in the background...")
+        task = asyncio.ensure_future(self.refresh_async(domain, website, name))
+        self._background.add(task)
+        task.add_done_callback(self._background_done)
+
+    def _background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._counters["refresh_failures"] += 1
+            print(f"Background company refresh failed: {task.exception()}")
+
+    async def stop(self):
+        tasks = [*self._background, *self._refreshing.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        seen = self._counters["chunks_seen"]
+        known = self._counters["knowledge_fresh"] + self._counters["knowledge_stale"]
+        lookups = known + self._counters["knowledge_missing"]
+        return {
+            **self._counters,
+            "reuse_rate": round(self._counters["chunks_unchanged"] / seen, 3) if seen else 0.0,
+            "knowledge_hit_rate": round(known / lookups, 3) if lookups else 0.0,
+            "refreshing_now": len(self._refreshing),
+            "knowledge_ttl_seconds": self.knowledge_ttl_seconds,
+            "vector_db": vector_db.stats(),
+        }
+
+
+company_ingest = CompanyIngestor(
+    paths=settings.COMPANY_INGEST_PATHS,
+    chunk_chars=settings.COMPANY_CHUNK_CHARS,
+    overlap_chars=settings.COMPANY_CHUNK_OVERLAP_CHARS,
+    knowledge_ttl_seconds=settings.COMPANY_KNOWLEDGE_TTL_SECONDS,
+)
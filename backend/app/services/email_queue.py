@@ -0,0 +1,293 @@
+import asyncio
+import random
+import smtplib
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import external_error
+from app.models import models
+from app.services.email_sender import email_sender
+from app.services.gemini_client import TokenBucket
+
+
+class PermanentSendError(Exception):
+    """A failure retrying won't fix (bad credentials, rejected recipient)."""
+
+
+class EmailQueueService:
+    """
+    Delivers queued emails (the `outbound_emails` table) in the background on the app's event loop.
+
+    Each sender account gets its own drain task that sends that account's due messages one at a
+    time over its pooled SMTP connection (see EmailSenderService), throttled by a per-account
+    token bucket. A global semaphore caps how many messages are in flight across all accounts.
+    Temporary failures (4xx replies, dropped connections, timeouts) are retried with jittered
+    exponential backoff; permanent ones (5xx, bad login) fail the message straight away.
+    The outcome is written back to EmailLog.status: queued -> sent | failed.
+    Everything lives in the DB, so messages queued before a restart are still delivered.
+    Claiming a message stamps `claimed_at`; only claims older than the lease (their worker died
+    mid-send) are put back in the queue, so other live workers' sends are never repeated.
+    """
+
+    def __init__(self, concurrency: int, rate_per_minute: int, max_attempts: int,
+                 backoff_base: float, backoff_max: float, poll_seconds: float, lease_seconds: float):
+        self.concurrency = concurrency
+        self.rate_per_minute = rate_per_minute
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_seconds = poll_seconds
+        self.lease = timedelta(seconds=lease_seconds)
+        self._semaphore = None
+        self._wake = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._drains: dict[int, asyncio.Task] = {} # owner_id -> task sending that account's mail
+        self._buckets: dict[int, TokenBucket] = {}
+        self._counters = {"queued": 0, "sent": 0, "failed": 0, "retries": 0}
+
+    # ==========================================
+    # 1. QUEUEING (called from the endpoints)
+    # ==========================================
+
+    async def enqueue(self, db: AsyncSession, email_log: models.EmailLog, owner_id: int,
+                      to_email: str, subject: str, body: str) -> models.OutboundEmail:
+        """Adds a message for delivery, marks its EmailLog as queued and commits (with the caller's other changes)."""
+        outbound = models.OutboundEmail(
+            owner_id=owner_id,
+            email_log_id=email_log.id,
+            to_email=to_email,
+            subject=subject,
+            body=body,
+            status="queued",
+        )
+        db.add(outbound)
+        email_log.status = "queued"
+        await db.commit()
+        self._counters["queued"] += 1
+        self.wake()
+        return outbound
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    # ==========================================
+    # 2. LIFECYCLE
+    # ==========================================
+
+    async def start(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._wake = asyncio.Event()
+        await self._requeue_expired()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self):
+        tasks = [task for task in (self._dispatcher, *self._drains.values()) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.to_thread(email_sender.close)
+
+    async def _requeue_expired(self):
+        requeued = await asyncio.to_thread(self._reset_expired_claims)
+        if requeued:
+            print(f"📬 Re-queued {requeued} email(s) whose sender stopped mid-send (lease expired)")
+
+    def _reset_expired_claims(self) -> int:
+        """Puts "sending" messages back in the queue once their claim is older than the lease."""
+        expired = datetime.utcnow() - self.lease
+        with SessionLocal() as db:
+            result = db.execute(
+                update(models.OutboundEmail).where(
+                    models.OutboundEmail.status == "sending",
+                    (models.OutboundEmail.claimed_at == None) | (models.OutboundEmail.claimed_at < expired) # noqa: E711
+                ).values(status="queued", claimed_at=None)
+            )
+            db.commit()
+            return result.rowcount
+
+    # ==========================================
+    # 3. DISPATCHING (one drain task per account with due mail)
+    # ==========================================
+
+    async def _dispatch(self):
+        while True:
+            try:
+                # Any live worker recovers the claims of one that died
+                await self._requeue_expired()
+                for owner_id in await asyncio.to_thread(self._owners_with_due_mail):
+                    if owner_id not in self._drains:
+                        task = asyncio.create_task(self._drain(owner_id))
+                        self._drains[owner_id] = task
+                        task.add_done_callback(lambda _, owner_id=owner_id: self._drains.pop(owner_id, None))
+                await asyncio.to_thread(email_sender.close_idle)
+            except Exception as e:
+                print(f"Email queue dispatch failed: {e}")
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def _owners_with_due_mail(self) -> list[int]:
+        with SessionLocal() as db:
+            rows = db.query(models.OutboundEmail.owner_id).filter(
+                models.OutboundEmail.status == "queued",
+                models.OutboundEmail.next_attempt_at <= datetime.utcnow()
+            ).distinct()
+            return [owner_id for (owner_id,) in rows]
+
+    async def _drain(self, owner_id: int):
+        """Sends one account's due messages in order until none are left."""
+        bucket = self._buckets.setdefault(owner_id, TokenBucket(self.rate_per_minute))
+        while True:
+            # Stay under the provider's per-account rate (waiting doesn't hold a sender slot)
+            delay = bucket.reserve(1)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            async with self._semaphore:
+                # Claimed only once a slot is free, so the lease covers the send and not the wait
+                claimed = await asyncio.to_thread(self._claim_next, owner_id)
+                if claimed is None:
+                    return
+                message, sender_email, sender_password = claimed
+                try:
+                    if not sender_email or not sender_password:
+                        raise PermanentSendError("SMTP settings are missing for this account")
+                    await asyncio.to_thread(
+                        email_sender.deliver, sender_email, sender_password,
+                        message["to_email"], message["subject"], message["body"]
+                    )
+                except Exception as e:
+                    external_error("smtp", type(e).__name__)
+                    gave_up = await self._write_back(self._record_failure, message, e)
+                    if gave_up is not None:
+                        self._counters["failed" if gave_up else "retries"] += 1
+                    continue
+            if await self._write_back(self._mark_sent, message) is not None:
+                self._counters["sent"] += 1
+
+    async def _write_back(self, transition, message: dict, *args):
+        """
+        Records a send's outcome, retrying DB errors a few times so a hiccup doesn't kill the drain
+        task. If it still fails the message stays "sending" until its lease runs out and it is
+        re-queued (after a successful send that means it can go out twice, hence the retries).
+        Returns the transition's result, or None if it couldn't be recorded.
+        """
+        for attempt in range(3):
+            try:
+                return await asyncio.to_thread(transition, message, *args)
+            except Exception as e:
+                print(f"Email #{message['id']}: couldn't record {transition.__name__} (attempt {attempt + 1}/3): {e}")
+                await asyncio.sleep(1 + attempt)
+        return None
+
+    # ==========================================
+    # 4. DB STATE TRANSITIONS
+    # ==========================================
+
+    def _claim_next(self, owner_id: int):
+        """Moves the account's oldest due message to "sending" and returns it with the account's credentials."""
+        with SessionLocal() as db:
+            while True:
+                outbound = db.query(models.OutboundEmail).filter(
+                    models.OutboundEmail.owner_id == owner_id,
+                    models.OutboundEmail.status == "queued",
+                    models.OutboundEmail.next_attempt_at <= datetime.utcnow()
+                ).order_by(models.OutboundEmail.id).first()
+                if outbound is None:
+                    return None
+                # Conditional update, so two processes polling the same table can't both claim it
+                claimed = db.execute(
+                    update(models.OutboundEmail)
+                    .where(models.OutboundEmail.id == outbound.id, models.OutboundEmail.status == "queued")
+                    .values(status="sending", claimed_at=datetime.utcnow(), attempts=models.OutboundEmail.attempts + 1)
+                ).rowcount
+                db.commit()
+                if claimed:
+                    break
+
+            user = db.get(models.User, owner_id)
+            message = {
+                "id": outbound.id,
+                "email_log_id": outbound.email_log_id,
+                "to_email": outbound.to_email,
+                "subject": outbound.subject or "",
+                "body": outbound.body or "",
+                "attempts": outbound.attempts,
+            }
+            return message, user.smtp_email if user else None, user.smtp_password if user else None
+
+    def _mark_sent(self, message: dict) -> bool:
+        with SessionLocal() as db:
+            outbound = db.get(models.OutboundEmail, message["id"])
+            outbound.status = "sent"
+            outbound.claimed_at = None
+            outbound.sent_at = datetime.utcnow()
+            outbound.last_error = None
+            # Through the ORM (not a bulk update) so the owner's analytics counters see the status change
+            email_log = db.get(models.EmailLog, message["email_log_id"])
+            if email_log is not None:
+                email_log.status = "sent"
+            db.commit()
+            return True
+
+    def _record_failure(self, message: dict, error: Exception) -> bool:
+        """Schedules a retry, or fails the message for good. Returns True if it gave up."""
+        permanent = self._is_permanent(error)
+        attempts = message["attempts"]
+        with SessionLocal() as db:
+            outbound = db.get(models.OutboundEmail, message["id"])
+            outbound.last_error = f"{type(error).__name__}: {error}"[:500]
+            outbound.claimed_at = None
+            if permanent or attempts >= self.max_attempts:
+                outbound.status = "failed"
+                email_log = db.get(models.EmailLog, message["email_log_id"])
+                if email_log is not None:
+                    email_log.status = "failed"
+                print(f"📭 Email #{outbound.id} to {outbound.to_email} failed for good: {outbound.last_error}")
+            else:
+                # Full jitter, like the Gemini scheduler, so a provider hiccup doesn't retry everything at once
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1))))
+                outbound.status = "queued"
+                outbound.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+                print(f"Email #{outbound.id} to {outbound.to_email} will be retried in {delay:.0f}s "
+                      f"(attempt {attempts}/{self.max_attempts}): {outbound.last_error}")
+            db.commit()
+            return outbound.status == "failed"
+
+    def _is_permanent(self, error: Exception) -> bool:
+        if isinstance(error, (PermanentSendError, smtplib.SMTPAuthenticationError)):
+            return True
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return all(code >= 500 for code, _ in error.recipients.values())
+        if isinstance(error, smtplib.SMTPResponseException):
+            return error.smtp_code >= 500
+        # Dropped connections, timeouts, refused connects: worth another try
+        return False
+
+    def stats(self) -> dict:
+        return {
+            **self._counters,
+            "active_accounts": len(self._drains),
+            "rate_per_minute_per_account": self.rate_per_minute,
+            "smtp": email_sender.stats(),
+        }
+
+
+email_queue = EmailQueueService(
+    concurrency=settings.EMAIL_SENDER_CONCURRENCY,
+    rate_per_minute=settings.EMAIL_SEND_RATE_PER_MINUTE,
+    max_attempts=settings.EMAIL_SEND_MAX_ATTEMPTS,
+    backoff_base=settings.EMAIL_SEND_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.EMAIL_SEND_BACKOFF_MAX_SECONDS,
+    poll_seconds=settings.EMAIL_QUEUE_POLL_SECONDS,
+    lease_seconds=settings.EMAIL_SEND_LEASE_SECONDS,
+)
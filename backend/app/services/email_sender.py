@@ -1,27 +1,178 @@
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+from app.core.config import settings
+
+
 class EmailSenderService:
-    def send_email(self, to_email: str, subject: str, body: str, sender_email: str, sender_password: str) -> bool:
+    """
+    Sends mail over SMTP, keeping one authenticated connection open per sender account and
+    reusing it for every message, so a burst of emails costs one TLS handshake and one login
+    instead of one per email.
+
+    An account's connection is only ever used by one thread at a time (per-account lock).
+    Connections unused for `idle_seconds` are closed by `close_idle`, and one the server already
+    dropped is reopened transparently on the next send.
+    """
+
+    def __init__(self, host: str, port: int, ssl_port: int, use_ssl: bool, timeout: float, idle_seconds: float,
+                 allow_plaintext: bool = False):
+        self.host = host
+        self.port = port
+        self.ssl_port = ssl_port
+        self.use_ssl = use_ssl
+        self.allow_plaintext = allow_plaintext
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self._connections = {} # (sender_email, sender_password) -> [smtp connection, last used]
+        self._account_locks = {}
+        self._lock = threading.Lock()
+        self._counters = {"messages": 0, "connections_opened": 0, "connections_reused": 0, "reconnects": 0, "errors": 0}
+
+    # ==========================================
+    # 1. SENDING
+    # ==========================================
+
+    def build_message(self, sender_email: str, to_email: str, subject: str, body: str) -> MIMEMultipart:
+        msg = MIMEMultipart()
+        msg['From'] = sender_email
+        msg['To'] = to_email
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'html'))
+        return msg
+
+    def deliver(self, sender_email: str, sender_password: str, to_email: str, subject: str, body: str):
+        """Sends one message on the account's pooled connection. Raises the smtplib error on failure."""
+        msg = self.build_message(sender_email, to_email, subject, body)
+        key = (sender_email, sender_password)
+
+        with self._account_lock(key):
+            server, reused = self._checkout(key)
+            try:
+                self._send_on(key, server, msg)
+            except smtplib.SMTPServerDisconnected:
+                if not reused:
+                    raise
+                # The server closed our idle connection on its side: reconnect once and resend
+                self._count("reconnects")
+                server, _ = self._checkout(key)
+                self._send_on(key, server, msg)
+        self._count("messages")
+
+    def _send_on(self, key, server, msg):
         try:
-            msg = MIMEMultipart()
-            msg['From'] = sender_email
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            msg.attach(MIMEText(body, 'html'))
-
-            # THE FIX: Use SMTP_SSL on Port 465 instead of standard SMTP on 587
-            # This starts a fully encrypted connection immediately, bypassing firewalls
-            server = smtplib.SMTP_SSL('smtp.gmail.com', 465, timeout=15)
-            
-            server.login(sender_email, sender_password)
             server.send_message(msg)
-            server.quit()
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+            # The server answered with an error and smtplib already reset the transaction: the connection is fine
+            self._connections[key][1] = time.monotonic()
+            self._count("errors")
+            raise
+        except Exception:
+            # Disconnected, timed out or mid-transaction: the connection can't be trusted any more
+            self._discard(key)
+            self._count("errors")
+            raise
+        self._connections[key][1] = time.monotonic()
+
+    def send_email(self, to_email: str, subject: str, body: str, sender_email: str, sender_password: str) -> bool:
+        try:
+            self.deliver(sender_email, sender_password, to_email, subject, body)
             return True
         except Exception as e:
             print(f"SMTP Error: {e}")
             return False
 
+    # ==========================================
+    # 2. THE CONNECTION POOL
+    # ==========================================
+
+    def _account_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._account_locks.setdefault(key, threading.Lock())
+
+    def _checkout(self, key) -> tuple:
+        """The account's open connection (and whether it was reused), logging in a new one if needed."""
+        entry = self._connections.get(key)
+        if entry is not None and time.monotonic() - entry[1] > self.idle_seconds:
+            self._discard(key)
+            entry = None
+        if entry is not None:
+            self._count("connections_reused")
+            return entry[0], True
+
+        sender_email, sender_password = key
+        if self.use_ssl:
+            # SMTP_SSL starts a fully encrypted connection immediately, bypassing firewalls that block 587
+            server = smtplib.SMTP_SSL(self.host, self.ssl_port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            server.ehlo()
+            if server.has_extn("starttls"):
+                server.starttls()
+                server.ehlo()
+            elif not self.allow_plaintext:
+                # Otherwise a server (or anyone in between stripping the extension) would get the password in the clear
+                self._quit(server)
+                raise smtplib.SMTPException(f"{self.host}:{self.port} doesn't offer STARTTLS; refusing to log in over plaintext")
+        try:
+            server.login(sender_email, sender_password)
+        except smtplib.SMTPException:
+            self._quit(server)
+            raise
+        self._connections[key] = [server, time.monotonic()]
+        self._count("connections_opened")
+        return server, False
+
+    def _discard(self, key):
+        entry = self._connections.pop(key, None)
+        if entry is not None:
+            self._quit(entry[0])
+
+    def _quit(self, server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def close_idle(self) -> int:
+        """Closes connections unused for longer than idle_seconds. Accounts mid-send are skipped."""
+        closed = 0
+        now = time.monotonic()
+        for key, entry in list(self._connections.items()):
+            lock = self._account_lock(key)
+            if now - entry[1] <= self.idle_seconds or not lock.acquire(blocking=False):
+                continue
+            try:
+                if key in self._connections:
+                    self._discard(key)
+                    closed += 1
+            finally:
+                lock.release()
+        return closed
+
+    def close(self):
+        for key in list(self._connections):
+            with self._account_lock(key):
+                self._discard(key)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "open_connections": len(self._connections)}
+
 # Ensure this instance is created at the bottom of the file
-email_sender = EmailSenderService()
\ No newline at end of file
+email_sender = EmailSenderService(
+    host=settings.SMTP_HOST,
+    port=settings.SMTP_PORT,
+    ssl_port=settings.SMTP_SSL_PORT,
+    use_ssl=settings.SMTP_USE_SSL,
+    allow_plaintext=settings.SMTP_ALLOW_PLAINTEXT,
+    timeout=settings.SMTP_TIMEOUT_SECONDS,
+    idle_seconds=settings.SMTP_CONNECTION_IDLE_SECONDS,
+)
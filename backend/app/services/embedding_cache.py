@@ -0,0 +1,150 @@
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+
+SQLITE_MAX_VARIABLES = 500 # Keys per "WHERE key IN (...)" (older SQLite builds allow 999 parameters)
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of embedding vectors keyed by (model, dimensionality, sha256(text)).
+    Tier 1 is an in-process LRU. Tier 2 is a SQLite file of float32 blobs, so vectors
+    survive restarts and are shared by every worker on the machine.
+    """
+
+    def __init__(self, path: str, max_memory_entries: int):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self._lru: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened lazily (under self._lock) so importing the module never touches the disk
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+        return self._db
+
+    @staticmethod
+    def make_key(model: str, dimensionality: int, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model}:{dimensionality}:{digest}"
+
+    def get(self, model: str, dimensionality: int, text: str) -> Optional[list[float]]:
+        key = self.make_key(model, dimensionality, text)
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return vector
+
+            row = self._connection().execute(
+                "SELECT vector FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+
+            vector = array("f")
+            vector.frombytes(row[0])
+            vector = vector.tolist()
+            self._remember(key, vector)
+            self._counters["disk_hits"] += 1
+            return vector
+
+    def get_many(self, model: str, dimensionality: int, texts: list[str]) -> list[Optional[list[float]]]:
+        """Batch `get`: one lock hold and one disk query per SQLITE_MAX_VARIABLES keys, misses come back as None."""
+        keys = [self.make_key(model, dimensionality, text) for text in texts]
+        vectors: list[Optional[list[float]]] = [None] * len(keys)
+        with self._lock:
+            on_disk: dict[str, list[int]] = {}
+            for i, key in enumerate(keys):
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    vectors[i] = vector
+                else:
+                    on_disk.setdefault(key, []).append(i)
+
+            wanted = list(on_disk)
+            for start in range(0, len(wanted), SQLITE_MAX_VARIABLES):
+                chunk = wanted[start:start + SQLITE_MAX_VARIABLES]
+                rows = self._connection().execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    vector = vector.tolist()
+                    self._remember(key, vector)
+                    for i in on_disk[key]:
+                        vectors[i] = vector
+                    self._counters["disk_hits"] += len(on_disk[key])
+
+            self._counters["misses"] += sum(1 for i in range(len(keys)) if vectors[i] is None)
+        return vectors
+
+    def put(self, model: str, dimensionality: int, text: str, vector: list[float]):
+        key = self.make_key(model, dimensionality, text)
+        with self._lock:
+            db = self._connection()
+            db.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                (key, array("f", vector).tobytes())
+            )
+            db.commit()
+            self._remember(key, list(vector))
+            self._counters["stores"] += 1
+
+    def put_many(self, model: str, dimensionality: int, texts: list[str], vectors: list[list[float]]):
+        """Batch `put`: every vector is written in a single transaction."""
+        if not texts:
+            return
+        rows = [
+            (self.make_key(model, dimensionality, text), array("f", vector).tobytes())
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            db = self._connection()
+            db.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            db.commit()
+            for (key, _), vector in zip(rows, vectors):
+                self._remember(key, list(vector))
+            self._counters["stores"] += len(rows)
+
+    def _remember(self, key: str, vector: list[float]):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_memory_entries:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            memory_entries = len(self._lru)
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        return {
+            "memory_entries": memory_entries,
+            "max_memory_entries": self.max_memory_entries,
+            **counters,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+embedding_cache = EmbeddingCache(
+    path=settings.EMBEDDING_CACHE_PATH,
+    max_memory_entries=settings.EMBEDDING_CACHE_MEMORY_ENTRIES,
+)
@@ -0,0 +1,139 @@
+import re
+import statistics
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict, deque
+from typing import Optional
+
+from app.core.config import settings
+
+TIERS = ("http", "browser")
+
+# Bot protection answers a plain client with these (Cloudflare, Akamai, DataDome...)
+BLOCKED_STATUSES = {401, 403, 429, 503}
+CHALLENGE_MARKERS = re.compile(
+    r"<title>\s*(just a moment|attention required|access denied|are you a robot)|captcha|cf-chl-|challenge-platform",
+    re.IGNORECASE,
+)
+# An empty mount point means the page is rendered by JavaScript (React, Vue, Angular, Next, Nuxt...)
+APP_SHELL_MARKERS = re.compile(
+    r"<div[^>]+id=[\"'](root|app|__next|__nuxt|svelte)[\"'][^>]*>\s*</div>|<app-root[^>]*>\s*</app-root>",
+    re.IGNORECASE,
+)
+
+
+def escalation_reason(status: int, html: str, text: str, min_text_chars: int) -> Optional[str]:
+    """
+    Why a plain HTTP fetch isn't good enough and the page needs a real browser, or None if it is.
+    "blocked": bot protection refused us. "app_shell": the HTML is a JS app's empty shell (an empty
+    mount point and little text; a widget's mount point on a full server-rendered page doesn't count).
+    "thin": no app markers, but the page yielded almost no text.
+    """
+    if status in BLOCKED_STATUSES or (status == 200 and len(text) < min_text_chars and CHALLENGE_MARKERS.search(html)):
+        return "blocked"
+    if len(text) < 2 * min_text_chars and APP_SHELL_MARKERS.search(html):
+        return "app_shell"
+    if len(text) < min_text_chars:
+        return "thin"
+    return None
+
+
+def domain_of(url: str) -> str:
+    return (urllib.parse.urlsplit(url.strip()).hostname or "").lower()
+
+
+class FetchStrategy:
+    """
+    Remembers which fetch tier worked for each domain (plain HTTP or the headless browser), so
+    repeat scrapes of a JS-heavy or bot-protected site skip the HTTP attempt that would only
+    be escalated again. Entries expire so a site that changes its setup gets re-probed.
+
+    Also keeps per-tier latency and the escalation counters behind /stats/scraper.
+    """
+
+    def __init__(self, memory_seconds: float, max_domains: int, samples: int = 1000):
+        self.memory_seconds = memory_seconds
+        self.max_domains = max_domains
+        self._tiers: OrderedDict = OrderedDict() # domain -> (expires_at, tier)
+        self._lock = threading.Lock()
+        self._latencies_ms = {tier: deque(maxlen=samples) for tier in TIERS}
+        self._tier_counters = {tier: {"attempts": 0, "successes": 0, "failures": 0} for tier in TIERS}
+        self._escalations = {"blocked": 0, "app_shell": 0, "thin": 0, "http_error": 0}
+        self._counters = {"scrapes": 0, "remembered_browser": 0, "browser_fallbacks_to_http": 0}
+
+    # ==========================================
+    # 1. PER-DOMAIN MEMORY
+    # ==========================================
+
+    def tier_for(self, domain: str) -> Optional[str]:
+        """The tier that worked for this domain last time, or None if we don't know (yet)."""
+        with self._lock:
+            self._counters["scrapes"] += 1
+            entry = self._tiers.get(domain)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._tiers[domain]
+                return None
+            self._tiers.move_to_end(domain)
+            if entry[1] == "browser":
+                self._counters["remembered_browser"] += 1
+            return entry[1]
+
+    def remember(self, domain: str, tier: str):
+        if not domain or self.memory_seconds <= 0:
+            return
+        with self._lock:
+            self._tiers[domain] = (time.monotonic() + self.memory_seconds, tier)
+            self._tiers.move_to_end(domain)
+            while len(self._tiers) > self.max_domains:
+                self._tiers.popitem(last=False)
+
+    # ==========================================
+    # 2. STATS
+    # ==========================================
+
+    def record(self, tier: str, elapsed_ms: float, ok: bool):
+        with self._lock:
+            self._tier_counters[tier]["attempts"] += 1
+            self._tier_counters[tier]["successes" if ok else "failures"] += 1
+            self._latencies_ms[tier].append(elapsed_ms)
+
+    def record_escalation(self, reason: str):
+        with self._lock:
+            self._escalations[reason] += 1
+
+    def record_fallback(self):
+        with self._lock:
+            self._counters["browser_fallbacks_to_http"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            tiers = {}
+            for tier in TIERS:
+                latencies = sorted(self._latencies_ms[tier])
+                tiers[tier] = {
+                    **self._tier_counters[tier],
+                    "p50_ms": round(statistics.median(latencies), 1) if latencies else 0.0,
+                    "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1) if latencies else 0.0,
+                    "max_ms": round(latencies[-1], 1) if latencies else 0.0,
+                }
+            escalated = sum(self._escalations.values())
+            http_attempts = self._tier_counters["http"]["attempts"]
+            remembered = {tier: 0 for tier in TIERS}
+            for _, tier in self._tiers.values():
+                remembered[tier] += 1
+            return {
+                **self._counters,
+                "tiers": tiers,
+                "escalations": {**self._escalations, "total": escalated},
+                "escalation_rate": round(escalated / http_attempts, 3) if http_attempts else 0.0,
+                "remembered_domains": remembered,
+            }
+
+
+fetch_strategy = FetchStrategy(
+    memory_seconds=settings.SCRAPE_TIER_MEMORY_SECONDS,
+    max_domains=settings.SCRAPE_TIER_MEMORY_MAX_DOMAINS,
+)
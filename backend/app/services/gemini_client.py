@@ -0,0 +1,338 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from app.core.config import settings
+from app.core.metrics import external_error
+
+_client = None
+_lock = threading.Lock()
+
+def get_client():
+    """
+    The shared Gemini client (used by both the LLM and embedding services).
+    Built on first use so importing the app stays cheap and never needs the network.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from google import genai
+                http_options = {"base_url": settings.GEMINI_BASE_URL} if settings.GEMINI_BASE_URL else None
+                _client = genai.Client(api_key=settings.GEMINI_API_KEY, http_options=http_options)
+    return _client
+
+
+# ==========================================
+# 1. RATE LIMITING
+# ==========================================
+
+class TokenBucket:
+    """
+    A per-minute budget that refills continuously. Callers *reserve* capacity and get back
+    how long to wait before using it, so the bucket works the same for threads and coroutines
+    and callers queue up in arrival order instead of failing.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Going into debt is what makes later callers wait behind earlier ones
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def adjust(self, amount: float):
+        """Corrects an earlier reservation once the real cost is known (negative refunds)."""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class ModelLimiter:
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def reserve(self, estimated_tokens: int) -> float:
+        return max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+
+
+class SlotPool:
+    """
+    A counting semaphore shared by threads and by coroutines on any event loop (the app's, the
+    browser pool's), so sync and async calls draw from one in-flight cap. Waiters are served in
+    arrival order; a coroutine waits on a future of its own loop, so it never ties up a thread.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._free = size
+        self._lock = threading.Lock()
+        self._waiters: deque = deque() # threading.Event (a thread) or (loop, future) (a coroutine)
+
+    def acquire(self):
+        with self._lock:
+            if self._free > 0 and not self._waiters:
+                self._free -= 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free > 0 and not self._waiters:
+                self._free -= 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                queued = waiter in self._waiters
+                if queued:
+                    self._waiters.remove(waiter)
+            # Handed a slot just before being cancelled: give it back (a hand-over still in
+            # flight finds the future cancelled and passes the slot on by itself)
+            if not queued and waiter[1].done() and not waiter[1].cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._free += 1
+                return
+            waiter = self._waiters.popleft()
+        # The slot goes straight to the next waiter, so nobody can jump the queue
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+            return
+        loop, future = waiter
+        try:
+            loop.call_soon_threadsafe(self._hand_over, future)
+        except RuntimeError:
+            # Its loop has been closed: pass the slot on
+            self.release()
+
+    def _hand_over(self, future: asyncio.Future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+# ==========================================
+# 2. THE SCHEDULER
+# ==========================================
+
+class GeminiScheduler:
+    """
+    The single way the app calls Gemini. Every call:
+    1. waits for its model's requests-per-minute and tokens-per-minute budget,
+    2. takes one of a capped number of in-flight slots (one pool for sync and async callers),
+    3. retries 429 / 5xx responses with jittered exponential backoff.
+    Throughput therefore sits at the quota instead of falling into error fallbacks.
+    """
+
+    RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, rate_limits: dict, max_concurrency: int, max_retries: int,
+                 backoff_base: float, backoff_max: float):
+        self.rate_limits = rate_limits
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._limiters: dict[str, ModelLimiter] = {}
+        self._limiters_lock = threading.Lock()
+        # One budget for sync and async callers alike, whatever thread or loop they run on
+        self._slots = SlotPool(max_concurrency)
+        self._stats_lock = threading.Lock()
+        self._stats: dict[str, dict] = {}
+        self._in_flight = 0
+
+    def _limiter(self, model: str) -> ModelLimiter:
+        with self._limiters_lock:
+            if model not in self._limiters:
+                limits = self.rate_limits.get(model) or self.rate_limits["default"]
+                self._limiters[model] = ModelLimiter(rpm=limits["rpm"], tpm=limits["tpm"])
+            return self._limiters[model]
+
+    # --- Public API (mirrors client.models.*) ---
+
+    def generate_content(self, model: str, contents, **kwargs):
+        call = lambda: get_client().models.generate_content(model=model, contents=contents, **kwargs)
+        return self._run(model, self._estimate_tokens(contents, expected_output=256), call)
+
+    async def generate_content_async(self, model: str, contents, **kwargs):
+        call = lambda: get_client().aio.models.generate_content(model=model, contents=contents, **kwargs)
+        return await self._run_async(model, self._estimate_tokens(contents, expected_output=256), call)
+
+    async def generate_content_stream_async(self, model: str, contents, **kwargs):
+        """
+        Yields chunks from the SDK's generate_content_stream under the same budget and slot rules.
+        Only failures before the first chunk are retried: once text has reached the caller a retry would repeat it.
+        """
+        estimate = self._estimate_tokens(contents, expected_output=256)
+        limiter = self._limiter(model)
+        for attempt in range(self.max_retries + 1):
+            wait = limiter.reserve(estimate)
+            self._record(model, queued_seconds=wait)
+            await asyncio.sleep(wait)
+
+            async with self._slots:
+                self._track_in_flight(1)
+                last_chunk = None
+                try:
+                    stream = await get_client().aio.models.generate_content_stream(model=model, contents=contents, **kwargs)
+                    async for chunk in stream:
+                        last_chunk = chunk
+                        yield chunk
+                except Exception as e:
+                    if last_chunk is not None:
+                        self._record(model, errors=1)
+                        external_error("gemini", type(e).__name__)
+                        raise
+                    error = e
+                else:
+                    # The final chunk carries the usage metadata for the whole response
+                    self._settle(model, limiter, estimate, last_chunk)
+                    return
+                finally:
+                    self._track_in_flight(-1)
+            await asyncio.sleep(self._backoff_or_raise(model, error, attempt))
+
+    def embed_content(self, model: str, contents, **kwargs):
+        call = lambda: get_client().models.embed_content(model=model, contents=contents, **kwargs)
+        return self._run(model, self._estimate_tokens(contents), call)
+
+    async def embed_content_async(self, model: str, contents, **kwargs):
+        call = lambda: get_client().aio.models.embed_content(model=model, contents=contents, **kwargs)
+        return await self._run_async(model, self._estimate_tokens(contents), call)
+
+    # --- Internals ---
+
+    def _estimate_tokens(self, contents, expected_output: int = 0) -> int:
+        # ~4 characters per token is close enough to budget against before the real count is known
+        texts = contents if isinstance(contents, list) else [contents]
+        return sum(len(text) // 4 + 1 for text in texts if isinstance(text, str)) + expected_output
+
+    def _run(self, model: str, estimate: int, call):
+        limiter = self._limiter(model)
+        for attempt in range(self.max_retries + 1):
+            wait = limiter.reserve(estimate)
+            self._record(model, queued_seconds=wait)
+            time.sleep(wait)
+
+            with self._slots:
+                self._track_in_flight(1)
+                try:
+                    result = call()
+                except Exception as e:
+                    error = e
+                else:
+                    self._settle(model, limiter, estimate, result)
+                    return result
+                finally:
+                    self._track_in_flight(-1)
+            # The slot is released before sleeping so backoff never blocks other callers
+            time.sleep(self._backoff_or_raise(model, error, attempt))
+
+    async def _run_async(self, model: str, estimate: int, call):
+        limiter = self._limiter(model)
+        for attempt in range(self.max_retries + 1):
+            wait = limiter.reserve(estimate)
+            self._record(model, queued_seconds=wait)
+            await asyncio.sleep(wait)
+
+            async with self._slots:
+                self._track_in_flight(1)
+                try:
+                    result = await call()
+                except Exception as e:
+                    error = e
+                else:
+                    self._settle(model, limiter, estimate, result)
+                    return result
+                finally:
+                    self._track_in_flight(-1)
+            await asyncio.sleep(self._backoff_or_raise(model, error, attempt))
+
+    def _settle(self, model: str, limiter: ModelLimiter, estimate: int, result):
+        usage = getattr(result, "usage_metadata", None)
+        actual = getattr(usage, "total_token_count", None) if usage else None
+        if actual:
+            limiter.tokens.adjust(actual - estimate)
+        self._record(model, requests=1)
+
+    def _backoff_or_raise(self, model: str, error: Exception, attempt: int) -> float:
+        status = getattr(error, "code", None) or getattr(error, "status_code", None)
+        # Every failed attempt counts, including the ones a retry recovers from
+        external_error("gemini", str(status) if status else type(error).__name__)
+        if status not in self.RETRYABLE_STATUS or attempt >= self.max_retries:
+            self._record(model, errors=1)
+            raise error
+        # Full jitter: a random delay up to the exponential cap, so retries from many callers spread out
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        print(f"Gemini {model} returned {status}, retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_retries})")
+        self._record(model, retries=1)
+        return delay
+
+    def _track_in_flight(self, delta: int):
+        with self._stats_lock:
+            self._in_flight += delta
+
+    def _record(self, model: str, requests: int = 0, retries: int = 0, errors: int = 0, queued_seconds: float = 0.0):
+        with self._stats_lock:
+            stats = self._stats.setdefault(model, {"requests": 0, "retries": 0, "errors": 0, "queued_seconds": 0.0})
+            stats["requests"] += requests
+            stats["retries"] += retries
+            stats["errors"] += errors
+            stats["queued_seconds"] += queued_seconds
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            models = {model: {**stats, "queued_seconds": round(stats["queued_seconds"], 3)} for model, stats in self._stats.items()}
+            in_flight = self._in_flight
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": in_flight,
+            "rate_limits": self.rate_limits,
+            "models": models,
+        }
+
+
+gemini = GeminiScheduler(
+    rate_limits=settings.GEMINI_RATE_LIMITS,
+    max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+    max_retries=settings.GEMINI_MAX_RETRIES,
+    backoff_base=settings.GEMINI_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.GEMINI_BACKOFF_MAX_SECONDS,
+)
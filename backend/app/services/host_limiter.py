@@ -0,0 +1,198 @@
+import asyncio
+import time
+import urllib.parse
+import urllib.robotparser
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from app.core.config import settings
+from app.services.fetch_strategy import domain_of
+
+THROTTLE_STATUSES = {403, 429, 503}
+MAX_TRACKED_HOSTS = 10000
+
+
+@dataclass
+class _HostState:
+    """Politeness bookkeeping for one host. Lives on the browser pool's loop, like the fetches."""
+    semaphore: asyncio.Semaphore
+    robots_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    next_start: float = 0.0 # loop time before which the next request may not start
+    penalty: float = 0.0 # extra spacing earned by 403/429/503 answers, halved on each success
+    crawl_delay: float = 0.0
+    robots_expires: float = 0.0
+    active: int = 0
+
+
+class HostLimiter:
+    """
+    Per-host politeness for the scraper: at most `per_host_concurrency` fetches to one host at
+    a time, request starts spaced by the host's minimum delay (or its robots.txt Crawl-delay,
+    whichever is longer), plus a penalty that doubles every time the host blocks or throttles
+    us and halves again as requests succeed. Different hosts never wait on each other, so a
+    batch spread over many domains still runs at full speed while google.com gets paced.
+
+    All methods run on the browser pool's event loop (see ScraperService).
+    """
+
+    def __init__(self, per_host_concurrency: int, min_delays: dict[str, float], respect_crawl_delay: bool,
+                 max_crawl_delay: float, robots_ttl: float, max_penalty: float):
+        self.per_host_concurrency = per_host_concurrency
+        self.min_delays = min_delays
+        self.respect_crawl_delay = respect_crawl_delay
+        self.max_crawl_delay = max_crawl_delay
+        self.robots_ttl = robots_ttl
+        self.max_penalty = max_penalty
+        self._hosts: OrderedDict[str, _HostState] = OrderedDict()
+        self._counters = {
+            "requests": 0,
+            "delayed": 0,
+            "delay_seconds_total": 0.0,
+            "delay_seconds_max": 0.0,
+            "throttled_responses": 0,
+            "robots_fetched": 0,
+            "robots_with_crawl_delay": 0,
+        }
+
+    # ==========================================
+    # 1. WAITING FOR A TURN
+    # ==========================================
+
+    @asynccontextmanager
+    async def slot(self, url: str, http_client):
+        """Waits until the URL's host may be fetched again, and holds one of its slots while the caller fetches."""
+        host = domain_of(url)
+        state = self._state(host)
+        state.active += 1
+        try:
+            if self.respect_crawl_delay:
+                await self._load_robots(state, url, http_client)
+            async with state.semaphore:
+                loop = asyncio.get_running_loop()
+                spacing = max(self.min_delays.get(host, self.min_delays.get("default", 0.0)), state.crawl_delay) + state.penalty
+                now = loop.time()
+                start_at = max(now, state.next_start)
+                state.next_start = start_at + spacing
+                self._counters["requests"] += 1
+                if start_at > now:
+                    waited = start_at - now
+                    self._counters["delayed"] += 1
+                    self._counters["delay_seconds_total"] += waited
+                    self._counters["delay_seconds_max"] = max(self._counters["delay_seconds_max"], waited)
+                    await asyncio.sleep(waited)
+                yield
+        finally:
+            state.active -= 1
+
+    def _state(self, host: str) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = _HostState(semaphore=asyncio.Semaphore(self.per_host_concurrency))
+            self._hosts[host] = state
+            self._evict_idle()
+        self._hosts.move_to_end(host)
+        return state
+
+    def _evict_idle(self):
+        """Forgets the least recently used hosts once there are too many (never one mid-fetch)."""
+        for host in list(self._hosts):
+            if len(self._hosts) <= MAX_TRACKED_HOSTS:
+                return
+            if self._hosts[host].active == 0:
+                del self._hosts[host]
+
+    # ==========================================
+    # 2. ROBOTS.TXT CRAWL-DELAY (cached per host)
+    # ==========================================
+
+    async def _load_robots(self, state: _HostState, url: str, http_client):
+        if state.robots_expires > time.monotonic():
+            return
+        async with state.robots_lock:
+            # Another request for this host may have loaded it while we waited
+            if state.robots_expires > time.monotonic():
+                return
+            state.crawl_delay = await self._fetch_crawl_delay(url, http_client)
+            state.robots_expires = time.monotonic() + self.robots_ttl
+
+    async def _fetch_crawl_delay(self, url: str, http_client) -> float:
+        parts = urllib.parse.urlsplit(url)
+        robots_url = f"{parts.scheme or 'https'}://{parts.netloc}/robots.txt"
+        try:
+            response = await http_client.get(robots_url, timeout=5)
+        except Exception:
+            return 0.0
+        self._counters["robots_fetched"] += 1
+        if response.status_code != 200:
+            return 0.0
+
+        parser = urllib.robotparser.RobotFileParser()
+        parser.parse(response.text.splitlines())
+        user_agent = http_client.headers.get("user-agent", "*")
+        delay = parser.crawl_delay(user_agent) or 0.0
+        rate = parser.request_rate(user_agent)
+        if rate is not None and rate.requests:
+            delay = max(delay, rate.seconds / rate.requests)
+        if delay:
+            self._counters["robots_with_crawl_delay"] += 1
+        return min(float(delay), self.max_crawl_delay)
+
+    # ==========================================
+    # 3. FEEDBACK FROM RESPONSES
+    # ==========================================
+
+    def feedback(self, url: str, status: int, retry_after: Optional[str] = None):
+        """Backs a host off after a block/throttle answer (honouring Retry-After), and eases off after successes."""
+        state = self._hosts.get(domain_of(url))
+        if state is None:
+            return
+        if status in THROTTLE_STATUSES:
+            self._counters["throttled_responses"] += 1
+            base = max(self.min_delays.get("default", 0.0), 1.0)
+            state.penalty = min(self.max_penalty, max(base, state.penalty * 2))
+            pause = self._retry_after_seconds(retry_after)
+            if pause:
+                state.next_start = max(state.next_start, asyncio.get_running_loop().time() + min(pause, self.max_penalty))
+        elif status < 400 and state.penalty:
+            state.penalty = state.penalty / 2 if state.penalty > 0.1 else 0.0
+
+    def _retry_after_seconds(self, value: Optional[str]) -> float:
+        if not value:
+            return 0.0
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return 0.0
+
+    def stats(self) -> dict:
+        hosts = list(self._hosts.items()) # Snapshot: the pool's loop may be adding hosts while we read
+        penalized = sorted(
+            ((host, state.penalty) for host, state in hosts if state.penalty),
+            key=lambda item: item[1], reverse=True,
+        )
+        return {
+            **self._counters,
+            "delay_seconds_total": round(self._counters["delay_seconds_total"], 3),
+            "delay_seconds_max": round(self._counters["delay_seconds_max"], 3),
+            "tracked_hosts": len(hosts),
+            "busy_hosts": sum(1 for _, state in hosts if state.active),
+            "penalized_hosts": {host: round(penalty, 2) for host, penalty in penalized[:20]},
+            "per_host_concurrency": self.per_host_concurrency,
+        }
+
+
+host_limiter = HostLimiter(
+    per_host_concurrency=settings.SCRAPE_PER_HOST_CONCURRENCY,
+    min_delays=settings.SCRAPE_HOST_MIN_DELAY_SECONDS,
+    respect_crawl_delay=settings.SCRAPE_RESPECT_CRAWL_DELAY,
+    max_crawl_delay=settings.SCRAPE_MAX_CRAWL_DELAY_SECONDS,
+    robots_ttl=settings.SCRAPE_ROBOTS_TTL_SECONDS,
+    max_penalty=settings.SCRAPE_THROTTLE_PENALTY_MAX_SECONDS,
+)
@@ -0,0 +1,143 @@
+from lxml import etree
+
+# Subtrees that never hold page copy. Their events are skipped as they stream past, nothing is built.
+SKIP_TAGS = {"script", "style", "noscript", "nav", "footer", "header", "aside", "template", "svg", "iframe", "select"}
+MAIN_TAGS = {"main", "article"}
+
+FEED_CHUNK_CHARS = 16 * 1024
+MAIN_LOOKAHEAD_CHARS = 64 * 1024 # Keep reading this far past a full budget in case a <main> shows up later
+MIN_MAIN_CHARS = 200 # A main region shorter than this (a login box, a cookie notice) isn't trusted over the whole page
+
+
+class _TextCollector:
+    """
+    lxml parser target: receives start/end/data events straight from libxml2's tokenizer and
+    keeps only the visible text, split into the page title, text inside main-content regions
+    (<main>, <article>, role="main") and all text in document order.
+    """
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.title = []
+        self.main, self.main_chars = [], 0
+        self.page, self.page_chars = [], 0
+        self.saw_main = False
+        self._skip_depth = 0 # > 0 while inside a junk subtree
+        self._main_depth = 0 # > 0 while inside a main-content region
+        self._in_title = False
+        self._stack = [] # per open element: does it start a main region?
+        self._pending = [] # text chunks of the current text node (libxml2 may split one node across calls)
+
+    @property
+    def main_full(self) -> bool:
+        return self.main_chars >= self.max_chars
+
+    @property
+    def page_full(self) -> bool:
+        return self.page_chars >= self.max_chars
+
+    def start(self, tag, attrib):
+        self.flush()
+        if self._skip_depth:
+            self._skip_depth += 1
+            return
+        if tag in SKIP_TAGS or "hidden" in attrib or attrib.get("aria-hidden") == "true":
+            self._skip_depth = 1
+            return
+        is_main = tag in MAIN_TAGS or attrib.get("role") == "main"
+        if is_main:
+            self._main_depth += 1
+            self.saw_main = True
+        self._in_title = tag == "title"
+        self._stack.append(is_main)
+
+    def end(self, tag):
+        self.flush()
+        if self._skip_depth:
+            self._skip_depth -= 1
+            return
+        self._in_title = False
+        if self._stack and self._stack.pop():
+            self._main_depth -= 1
+
+    def data(self, text):
+        if not self._skip_depth:
+            self._pending.append(text)
+
+    def flush(self):
+        """Turns the buffered text node into one whitespace-normalized piece (like get_text(separator=' '))."""
+        if not self._pending:
+            return
+        text = " ".join("".join(self._pending).split())
+        self._pending = []
+        if not text:
+            return
+        if self._in_title:
+            self.title.append(text)
+        elif self._main_depth and not self.main_full:
+            self.main.append(text)
+            self.main_chars += len(text) + 1
+        if not self.page_full:
+            self.page.append(text)
+            self.page_chars += len(text) + 1
+
+    def close(self):
+        self.flush()
+
+    def text(self) -> str:
+        if self.main_chars >= MIN_MAIN_CHARS:
+            return " ".join(self.title + self.main)[:self.max_chars]
+        return " ".join(self.page)[:self.max_chars]
+
+
+def extract_text(html_content: str, max_chars: int = 2000) -> str:
+    """
+    Visible text of a page, at most `max_chars` long, preferring its main-content region.
+
+    Streams the HTML through lxml's C parser in chunks instead of building a tree, and stops
+    feeding as soon as the budget is filled: once the main region has `max_chars` of text, or
+    (on pages without one) once the whole page has, plus a short lookahead for a late <main>.
+    """
+    if not html_content:
+        return ""
+
+    collector = _TextCollector(max_chars)
+    parser = etree.HTMLParser(target=collector, no_network=True)
+    full_at = None
+    for offset in range(0, len(html_content), FEED_CHUNK_CHARS):
+        parser.feed(html_content[offset:offset + FEED_CHUNK_CHARS])
+        if collector.main_full:
+            break
+        if collector.page_full and not collector.saw_main:
+            full_at = offset if full_at is None else full_at
+            if offset - full_at >= MAIN_LOOKAHEAD_CHARS:
+                break
+    else:
+        try:
+            parser.close()
+        except etree.XMLSyntaxError:
+            pass # Nothing to recover: libxml2 already sent everything it could parse
+    collector.flush()
+    return collector.text()
+
+
+def extract_text_bs4(html_content: str, max_chars: int = 2000) -> str:
+    """The original extractor: full BeautifulSoup tree, junk tags decomposed, first `max_chars` of the text."""
+    if not html_content:
+        return ""
+
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html_content, "html.parser")
+
+    # Remove junk tags
+    for element in soup(["script", "style", "noscript", "nav", "footer", "header", "aside"]):
+        element.decompose()
+
+    # Extract text
+    text = soup.get_text(separator=' ')
+    clean_text = " ".join(text.split())
+
+    return clean_text[:max_chars]
+
+
+ENGINES = {"lxml": extract_text, "bs4": extract_text_bs4}
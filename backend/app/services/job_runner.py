@@ -0,0 +1,277 @@
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import models
+from app.services.research_pipeline import pipeline, ResearchError
+
+
+class ResearchJobRunner:
+    """
+    Works through ResearchJobs in the background on the app's event loop.
+    A single semaphore caps how many prospects are generated at once across every job,
+    and all progress lives in the DB so unfinished jobs are picked up again after a restart.
+
+    Several workers (processes) can share the tables: each item is claimed with a conditional
+    UPDATE that stamps `claimed_by`, and its outcome only counts while that claim still holds, so
+    an item never yields two drafts. A watchdog refreshes `heartbeat_at` on this worker's running
+    items; items whose heartbeat went stale (their worker died) go back to pending for whoever
+    polls next, and idle workers pick up unclaimed items of any unfinished job.
+    """
+
+    def __init__(self, concurrency: int, heartbeat_seconds: float, lease_seconds: float):
+        self.concurrency = concurrency
+        self.heartbeat_seconds = heartbeat_seconds
+        self.lease = timedelta(seconds=lease_seconds)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._semaphore = None
+        self._watchdog: Optional[asyncio.Task] = None
+        self._jobs: dict[int, asyncio.Task] = {} # job_id -> task working it in this process
+
+    # ==========================================
+    # 1. CREATING JOBS (called from the endpoints)
+    # ==========================================
+
+    async def create_job(self, db: AsyncSession, owner_id: int, prospect_ids: list[int]) -> models.ResearchJob:
+        """Persists a job with one pending item per prospect. Call `enqueue` afterwards."""
+        job = models.ResearchJob(owner_id=owner_id, status="queued", total=len(prospect_ids))
+        db.add(job)
+        await db.flush()
+        db.add_all([
+            models.ResearchJobItem(job_id=job.id, prospect_id=prospect_id, status="pending")
+            for prospect_id in prospect_ids
+        ])
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    def enqueue(self, job_id: int) -> bool:
+        """Starts working a job in this process (no-op if it already is). Returns whether it started."""
+        if job_id in self._jobs:
+            return False
+        task = asyncio.get_running_loop().create_task(self._run_job(job_id))
+        self._jobs[job_id] = task
+        task.add_done_callback(lambda _, job_id=job_id: self._jobs.pop(job_id, None))
+        return True
+
+    # ==========================================
+    # 2. LIFECYCLE
+    # ==========================================
+
+    async def start(self):
+        """Resumes unfinished jobs (only items no live worker holds), then keeps heartbeating and polling."""
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        await self._resume()
+        self._watchdog = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        tasks = [task for task in (self._watchdog, *self._jobs.values()) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Hand our unfinished items back right away rather than after the lease runs out
+        await asyncio.to_thread(self._release_claims)
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                await asyncio.to_thread(self._heartbeat)
+                await self._resume()
+            except Exception as e:
+                print(f"Research job watchdog failed: {e}")
+
+    async def _resume(self):
+        for job_id in await asyncio.to_thread(self._recover_stale):
+            if self.enqueue(job_id):
+                print(f"Resuming research job #{job_id}")
+
+    def _heartbeat(self):
+        with SessionLocal() as db:
+            db.query(models.ResearchJobItem).filter(
+                models.ResearchJobItem.status == "running",
+                models.ResearchJobItem.claimed_by == self.worker_id
+            ).update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+
+    def _recover_stale(self) -> list[int]:
+        """
+        Puts running items with a stale heartbeat back to pending. Returns the unfinished jobs that
+        have pending items, or none left at all (their worker died before marking them completed).
+        """
+        stale = datetime.utcnow() - self.lease
+        with SessionLocal() as db:
+            reset = db.query(models.ResearchJobItem).filter(
+                models.ResearchJobItem.status == "running",
+                or_(models.ResearchJobItem.heartbeat_at == None, models.ResearchJobItem.heartbeat_at < stale) # noqa: E711
+            ).update({"status": "pending", "started_at": None, "claimed_by": None, "heartbeat_at": None}, synchronize_session=False)
+            db.commit()
+            if reset:
+                print(f"Re-queued {reset} research item(s) whose worker stopped heartbeating")
+            job_ids = [job_id for (job_id,) in db.query(models.ResearchJob.id).filter(models.ResearchJob.status.in_(["queued", "running"]))]
+            if not job_ids:
+                return []
+            items_by_status = {"pending": set(), "running": set()}
+            for job_id, status in db.query(models.ResearchJobItem.job_id, models.ResearchJobItem.status).filter(
+                models.ResearchJobItem.job_id.in_(job_ids),
+                models.ResearchJobItem.status.in_(["pending", "running"])
+            ).distinct():
+                items_by_status[status].add(job_id)
+            return [
+                job_id for job_id in job_ids
+                if job_id in items_by_status["pending"] or job_id not in items_by_status["running"]
+            ]
+
+    def _release_claims(self):
+        with SessionLocal() as db:
+            db.query(models.ResearchJobItem).filter(
+                models.ResearchJobItem.status == "running",
+                models.ResearchJobItem.claimed_by == self.worker_id
+            ).update({"status": "pending", "started_at": None, "claimed_by": None, "heartbeat_at": None}, synchronize_session=False)
+            db.commit()
+
+    # ==========================================
+    # 3. WORKING A JOB
+    # ==========================================
+
+    async def _run_job(self, job_id: int):
+        item_ids = await asyncio.to_thread(self._claim_job, job_id)
+        await asyncio.gather(*(self._run_item(job_id, item_id) for item_id in item_ids))
+        await asyncio.to_thread(self._finish_job, job_id)
+
+    async def _run_item(self, job_id: int, item_id: int):
+        async with self._semaphore:
+            claimed, prospect = await asyncio.to_thread(self._start_item, item_id)
+            if not claimed:
+                # Another worker got to it first
+                return
+            started = time.perf_counter()
+            try:
+                if prospect is None:
+                    raise ResearchError(404, "Prospect not found")
+                result = await pipeline.run(prospect)
+            except Exception as e:
+                error = e.detail if isinstance(e, ResearchError) else f"{type(e).__name__}: {e}"
+                print(f"Research job #{job_id}: prospect item #{item_id} failed: {error}")
+                await asyncio.to_thread(self._fail_item, job_id, item_id, error, self._elapsed_ms(started))
+                return
+            await asyncio.to_thread(
+                self._complete_item, job_id, item_id, prospect.id, result["generated_line"], self._elapsed_ms(started)
+            )
+
+    def _elapsed_ms(self, started: float) -> int:
+        return int((time.perf_counter() - started) * 1000)
+
+    def _claim_job(self, job_id: int) -> list[int]:
+        """Marks the job running (unless it already finished) and returns its pending items."""
+        with SessionLocal() as db:
+            claimed = db.query(models.ResearchJob).filter(
+                models.ResearchJob.id == job_id,
+                models.ResearchJob.status.in_(["queued", "running"])
+            ).update({
+                "status": "running",
+                "started_at": func.coalesce(models.ResearchJob.started_at, datetime.utcnow()),
+            }, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                return []
+            return [
+                item_id for (item_id,) in db.query(models.ResearchJobItem.id).filter(
+                    models.ResearchJobItem.job_id == job_id,
+                    models.ResearchJobItem.status == "pending"
+                ).order_by(models.ResearchJobItem.id)
+            ]
+
+    def _start_item(self, item_id: int) -> tuple:
+        """Claims a pending item for this worker. Returns (claimed, prospect)."""
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            # Conditional update, so two workers can't both start the same item
+            claimed = db.query(models.ResearchJobItem).filter(
+                models.ResearchJobItem.id == item_id,
+                models.ResearchJobItem.status == "pending"
+            ).update({
+                "status": "running",
+                "started_at": now,
+                "claimed_by": self.worker_id,
+                "heartbeat_at": now,
+            }, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                return False, None
+            prospect_id = db.query(models.ResearchJobItem.prospect_id).filter(models.ResearchJobItem.id == item_id).scalar()
+            return True, db.get(models.Prospect, prospect_id)
+
+    def _finish_item(self, db, item_id: int, values: dict) -> bool:
+        """Records an item's outcome if this worker still holds it (its claim may have been handed on)."""
+        finished = db.query(models.ResearchJobItem).filter(
+            models.ResearchJobItem.id == item_id,
+            models.ResearchJobItem.status == "running",
+            models.ResearchJobItem.claimed_by == self.worker_id
+        ).update({**values, "finished_at": datetime.utcnow()}, synchronize_session=False)
+        if not finished:
+            print(f"Research item #{item_id} was handed to another worker meanwhile, dropping this result")
+            db.rollback()
+        return bool(finished)
+
+    def _complete_item(self, job_id: int, item_id: int, prospect_id: int, generated_line: str, duration_ms: int):
+        with SessionLocal() as db:
+            # Item outcome, draft and job progress land in one transaction
+            if not self._finish_item(db, item_id, {"status": "done", "duration_ms": duration_ms}):
+                return
+            saved_email = models.EmailLog(
+                prospect_id=prospect_id,
+                personalized_opening=generated_line,
+                full_body="",
+                status="draft"
+            )
+            db.add(saved_email)
+            db.flush()
+            db.query(models.ResearchJobItem).filter(models.ResearchJobItem.id == item_id).update(
+                {"email_log_id": saved_email.id}, synchronize_session=False
+            )
+            db.query(models.ResearchJob).filter(models.ResearchJob.id == job_id).update(
+                {"completed": models.ResearchJob.completed + 1}, synchronize_session=False
+            )
+            db.commit()
+
+    def _fail_item(self, job_id: int, item_id: int, error: str, duration_ms: int):
+        with SessionLocal() as db:
+            if not self._finish_item(db, item_id, {"status": "failed", "error": error[:500], "duration_ms": duration_ms}):
+                return
+            db.query(models.ResearchJob).filter(models.ResearchJob.id == job_id).update(
+                {"failed": models.ResearchJob.failed + 1}, synchronize_session=False
+            )
+            db.commit()
+
+    def _finish_job(self, job_id: int):
+        """Completes the job once no item is left, whichever worker ran the last one."""
+        unfinished = select(models.ResearchJobItem.id).where(
+            models.ResearchJobItem.job_id == job_id,
+            models.ResearchJobItem.status.in_(["pending", "running"])
+        ).exists()
+        with SessionLocal() as db:
+            db.query(models.ResearchJob).filter(
+                models.ResearchJob.id == job_id,
+                models.ResearchJob.status == "running",
+                ~unfinished
+            ).update(
+                {"status": "completed", "finished_at": datetime.utcnow()}, synchronize_session=False
+            )
+            db.commit()
+
+
+job_runner = ResearchJobRunner(
+    concurrency=settings.RESEARCH_JOB_CONCURRENCY,
+    heartbeat_seconds=settings.RESEARCH_JOB_HEARTBEAT_SECONDS,
+    lease_seconds=settings.RESEARCH_JOB_LEASE_SECONDS,
+)
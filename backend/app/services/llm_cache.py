@@ -0,0 +1,99 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+
+
+class LLMCache:
+    """
+    Persistent cache of LLM responses keyed by sha256(model, prompt template version, rendered prompt).
+    Stored in a SQLite file and evicted by age (TTL) and size (max entries, oldest first).
+    Each entry remembers how long the original call took, so hits can report the latency they saved.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._counters = {"hits": 0, "misses": 0, "bypassed": 0, "stores": 0, "evictions": 0}
+        self._saved_seconds = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened lazily (under self._lock) so importing the module never touches the disk
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, latency REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_responses_created_at ON responses (created_at)")
+        return self._db
+
+    @staticmethod
+    def make_key(model: str, prompt_version: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\x00{prompt_version}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, prompt_version: str, prompt: str) -> Optional[str]:
+        key = self.make_key(model, prompt_version, prompt)
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT response, latency FROM responses WHERE key = ? AND created_at >= ?",
+                (key, time.time() - self.ttl_seconds)
+            ).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            self._saved_seconds += row[1]
+            return row[0]
+
+    def put(self, model: str, prompt_version: str, prompt: str, response: str, latency: float):
+        key = self.make_key(model, prompt_version, prompt)
+        with self._lock:
+            db = self._connection()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, latency) VALUES (?, ?, ?, ?)",
+                (key, response, time.time(), latency)
+            )
+            self._counters["stores"] += 1
+            self._evict(db)
+            db.commit()
+
+    def _evict(self, db: sqlite3.Connection):
+        expired = db.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        overflow = db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self._counters["evictions"] += expired.rowcount + overflow.rowcount
+
+    def record_bypass(self):
+        with self._lock:
+            self._counters["bypassed"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            saved_seconds = self._saved_seconds
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups, 3) if lookups else 0.0,
+            "saved_latency_seconds": round(saved_seconds, 3),
+        }
+
+
+llm_cache = LLMCache(
+    path=settings.LLM_CACHE_PATH,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+)
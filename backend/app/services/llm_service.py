@@ -1,17 +1,18 @@
-from google import genai
-from app.core.config import settings
+import asyncio
+import time
+from app.core.metrics import span
+from app.services.gemini_client import gemini
+from app.services.llm_cache import llm_cache
 
-# Initialize the Gemini client using the API key from your config
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
+MODEL = "gemini-2.5-flash"
+# Bump whenever build_prompt changes so cached lines from the old template are never reused
+PROMPT_VERSION = "v1"
+
+FALLBACK_LINE = "I noticed your team is doing some interesting work lately."
 
 class LLMService:
-    def generate_opening_line(self, prospect_name: str, company_name: str, scraped_context: str) -> str:
-        """
-        Uses Gemini to generate a hyper-personalized cold email opening line 
-        based on the scraped website context.
-        """
-        
-        prompt = f"""
+    def build_prompt(self, prospect_name: str, company_name: str, scraped_context: str) -> str:
+        return f"""
         You are an elite B2B Sales Development Representative. 
         Your objective is to write a single, highly personalized opening line for a cold email to {prospect_name} at {company_name}.
         
@@ -28,18 +29,102 @@ class LLMService:
         5. TONE: Peer-to-peer energy. Confident and conversational. Do not sound like a vendor pitching.
         6. EXACT FORMAT: DO NOT include a greeting ("Hi {prospect_name},"). DO NOT include a sign-off. DO NOT wrap the output in quotation marks. Output ONLY the raw opening line.
         """
+
+    def generate_opening_line(self, prospect_name: str, company_name: str, scraped_context: str,
+                              fresh: bool = False) -> str:
+        """
+        Uses Gemini to generate a hyper-personalized cold email opening line 
+        based on the scraped website context.
+        Identical inputs are served from the LLM cache unless `fresh` is set.
+        """
+        prompt = self.build_prompt(prospect_name, company_name, scraped_context)
+        cached = self._cached_line(prompt, fresh)
+        if cached is not None:
+            return cached
         
         try:
+            started = time.perf_counter()
             # Using Gemini 2.5 Flash as it is optimized for speed and cost
-            response = client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=prompt
-            )
+            with span("llm", "generate"):
+                response = gemini.generate_content(
+                    model=MODEL,
+                    contents=prompt
+                )
             # The SDK uses response.text to easily access the generated string
-            return response.text.strip()
+            line = response.text.strip()
+            llm_cache.put(MODEL, PROMPT_VERSION, prompt, line, time.perf_counter() - started)
+            return line
             
         except Exception as e:
             print(f"Gemini Generation Error: {e}")
-            return "I noticed your team is doing some interesting work lately." # Fallback line
+            return FALLBACK_LINE
+
+    async def generate_opening_line_async(self, prospect_name: str, company_name: str, scraped_context: str,
+                                          fresh: bool = False) -> str:
+        """Async version of `generate_opening_line` (uses the SDK's aio client)."""
+        prompt = self.build_prompt(prospect_name, company_name, scraped_context)
+        cached = await asyncio.to_thread(self._cached_line, prompt, fresh)
+        if cached is not None:
+            return cached
+
+        try:
+            started = time.perf_counter()
+            with span("llm", "generate"):
+                response = await gemini.generate_content_async(
+                    model=MODEL,
+                    contents=prompt
+                )
+            line = response.text.strip()
+            await asyncio.to_thread(llm_cache.put, MODEL, PROMPT_VERSION, prompt, line, time.perf_counter() - started)
+            return line
+
+        except Exception as e:
+            print(f"Gemini Generation Error: {e}")
+            return FALLBACK_LINE
+
+    async def stream_opening_line_async(self, prospect_name: str, company_name: str, scraped_context: str,
+                                        fresh: bool = False):
+        """
+        Streaming version of `generate_opening_line_async`: yields the line in chunks as Gemini writes it.
+        A cached line arrives as a single chunk, and the fallback line is used if nothing was streamed.
+        A failure after some chunks went out is re-raised: the caller must drop the partial line
+        (it is never cached).
+        """
+        prompt = self.build_prompt(prospect_name, company_name, scraped_context)
+        cached = await asyncio.to_thread(self._cached_line, prompt, fresh)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        try:
+            started = time.perf_counter()
+            with span("llm", "stream"):
+                async for chunk in gemini.generate_content_stream_async(model=MODEL, contents=prompt):
+                    text = chunk.text
+                    if not text:
+                        continue
+                    if not chunks:
+                        text = text.lstrip()
+                    chunks.append(text)
+                    yield text
+            line = "".join(chunks).strip()
+            if line:
+                await asyncio.to_thread(llm_cache.put, MODEL, PROMPT_VERSION, prompt, line, time.perf_counter() - started)
+            else:
+                yield FALLBACK_LINE
+
+        except Exception as e:
+            print(f"Gemini Streaming Error: {e}")
+            if chunks:
+                raise
+            yield FALLBACK_LINE
+
+    def _cached_line(self, prompt: str, fresh: bool):
+        # A fresh call skips the lookup, but its result still replaces the cached line
+        if fresh:
+            llm_cache.record_bypass()
+            return None
+        return llm_cache.get(MODEL, PROMPT_VERSION, prompt)
 
-llm = LLMService()
\ No newline at end of file
+llm = LLMService()
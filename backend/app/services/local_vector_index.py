@@ -0,0 +1,218 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+
+class LocalVectorIndex:
+    """
+    In-process vector index used when VECTOR_BACKEND = "local".
+
+    Vectors are L2-normalized float32 rows in an append-only memory-mapped file, so cosine
+    similarity is a single matrix-vector product. A JSONL side log holds each row's id and
+    metadata and is replayed on startup to rebuild the company -> row ids index.
+    Re-upserting an id appends a new row and tombstones the old one; `compact` rewrites
+    both files without the dead rows.
+    """
+
+    COMPACT_MIN_DEAD_ROWS = 1000
+    COMPACT_DEAD_RATIO = 0.3
+
+    def __init__(self, directory: str, dimension: int):
+        self.dimension = dimension
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.meta_path = os.path.join(directory, "meta.jsonl")
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._matrix = None
+        self._rows = 0
+        self._ids: dict[str, int] = {}
+        self._row_ids: dict[int, str] = {}
+        self._companies: dict[str, set[int]] = {}
+        self._metadata: dict[int, dict] = {}
+        self._load()
+
+    # ==========================================
+    # 1. LOADING
+    # ==========================================
+
+    def _load(self):
+        """
+        Replays the side log over the vector file. A crash mid-append can leave a partial last log
+        line, a partial last vector, or vectors whose log entries were never written (vectors are
+        appended first): both files are cut back to the rows they agree on.
+        """
+        entries = self._read_log()
+        row_bytes = 4 * self.dimension
+        vector_rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        logged_rows = max((entry["row"] + 1 for entry in entries if not entry.get("deleted")), default=0)
+        self._rows = min(vector_rows, logged_rows)
+
+        # Rows are appended in order, so everything from the first entry without its vector on is lost
+        kept = next((i for i, entry in enumerate(entries) if not entry.get("deleted") and entry["row"] >= self._rows), len(entries))
+        if kept < len(entries):
+            print(f"⚠️ Vector index: dropping {len(entries) - kept} log entries whose vectors are missing")
+            entries = entries[:kept]
+            tmp_meta = self.meta_path + ".tmp"
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp_meta, self.meta_path)
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) != self._rows * row_bytes:
+            print(f"⚠️ Vector index: truncating {self.vectors_path} from {vector_rows} to {self._rows} rows")
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(self._rows * row_bytes)
+
+        for entry in entries:
+            self._apply(entry)
+        self._remap()
+
+    def _read_log(self) -> list[dict]:
+        """The side log's complete lines. A trailing line without its newline was cut off mid-write and is removed."""
+        if not os.path.exists(self.meta_path):
+            return []
+        with open(self.meta_path, "rb") as f:
+            data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            print(f"⚠️ Vector index: discarding a partially written last line of {self.meta_path}")
+            with open(self.meta_path, "r+b") as f:
+                f.truncate(complete)
+        return [json.loads(line) for line in data[:complete].decode("utf-8").splitlines() if line.strip()]
+
+    def _apply(self, entry: dict):
+        """Replays one side-log entry onto the in-memory indexes."""
+        row = entry["row"]
+        if entry.get("deleted"):
+            metadata = self._metadata.pop(row, None)
+            if metadata is not None:
+                self._companies.get(metadata.get("company"), set()).discard(row)
+            vector_id = self._row_ids.pop(row, None)
+            if vector_id is not None and self._ids.get(vector_id) == row:
+                del self._ids[vector_id]
+            return
+
+        self._metadata[row] = entry["metadata"]
+        self._ids[entry["id"]] = row
+        self._row_ids[row] = entry["id"]
+        self._companies.setdefault(entry["metadata"].get("company"), set()).add(row)
+
+    def _remap(self):
+        if self._rows:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self._rows, self.dimension))
+        else:
+            self._matrix = np.empty((0, self.dimension), dtype=np.float32)
+
+    # ==========================================
+    # 2. WRITES
+    # ==========================================
+
+    def upsert(self, records: list[dict]):
+        """Appends records shaped like Pinecone's: {"id", "values", "metadata"}."""
+        if not records:
+            return
+        vectors = np.asarray([record["values"] for record in records], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            entries = []
+            new_rows = {}
+            for offset, record in enumerate(records):
+                old_row = new_rows.get(record["id"], self._ids.get(record["id"]))
+                if old_row is not None:
+                    entries.append({"row": old_row, "deleted": True})
+                new_rows[record["id"]] = self._rows + offset
+                entries.append({"row": self._rows + offset, "id": record["id"], "metadata": record.get("metadata", {})})
+
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self.meta_path, "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + "\n")
+
+            for entry in entries:
+                self._apply(entry)
+            self._rows += len(records)
+            self._remap()
+
+            if self._should_compact():
+                self.compact()
+
+    def delete(self, ids: list[str]):
+        with self._lock:
+            entries = [{"row": self._ids[vector_id], "deleted": True} for vector_id in ids if vector_id in self._ids]
+            if not entries:
+                return
+            with open(self.meta_path, "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + "\n")
+            for entry in entries:
+                self._apply(entry)
+
+    def _should_compact(self) -> bool:
+        dead = self._rows - len(self._metadata)
+        return dead >= self.COMPACT_MIN_DEAD_ROWS and dead >= self._rows * self.COMPACT_DEAD_RATIO
+
+    def compact(self):
+        """Rewrites the vector file and side log without tombstoned rows."""
+        with self._lock:
+            live_rows = sorted(self._metadata)
+            live_vectors = np.array(self._matrix[live_rows], dtype=np.float32) if live_rows else np.empty((0, self.dimension), dtype=np.float32)
+
+            tmp_vectors, tmp_meta = self.vectors_path + ".tmp", self.meta_path + ".tmp"
+            with open(tmp_vectors, "wb") as f:
+                f.write(live_vectors.tobytes())
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                for new_row, old_row in enumerate(live_rows):
+                    f.write(json.dumps({"row": new_row, "id": self._row_ids[old_row], "metadata": self._metadata[old_row]}) + "\n")
+
+            self._matrix = None # Release the old mapping before replacing its file
+            os.replace(tmp_vectors, self.vectors_path)
+            os.replace(tmp_meta, self.meta_path)
+
+            self._ids, self._row_ids, self._companies, self._metadata = {}, {}, {}, {}
+            with open(self.meta_path, encoding="utf-8") as f:
+                for line in f:
+                    self._apply(json.loads(line))
+            self._rows = len(live_rows)
+            self._remap()
+
+    # ==========================================
+    # 3. QUERIES
+    # ==========================================
+
+    def query(self, vector: list[float], top_k: int, company: str = None) -> list[dict]:
+        """Cosine top-k, optionally restricted to one company's rows."""
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query /= norm
+
+        with self._lock:
+            if company is not None:
+                rows = np.fromiter(self._companies.get(company, ()), dtype=np.int64)
+            else:
+                rows = np.fromiter(self._metadata.keys(), dtype=np.int64)
+            if rows.size == 0:
+                return []
+
+            scores = self._matrix[rows] @ query
+            k = min(top_k, rows.size)
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return [
+                {"id": self._row_ids[int(rows[i])], "score": float(scores[i]), "metadata": self._metadata[int(rows[i])]}
+                for i in best
+            ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rows": self._rows,
+                "live_rows": len(self._metadata),
+                "companies": sum(1 for rows in self._companies.values() if rows),
+                "dimension": self.dimension,
+            }
@@ -0,0 +1,216 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, attributes
+
+from app.core.database import dialect_insert
+from app.models import models
+
+# EmailLog.status -> OwnerStats column
+STATUS_COLUMNS = {"draft": "drafts", "sent": "sent"}
+TOTAL_COLUMNS = ("prospects", "drafts", "sent")
+
+
+class OwnerStatsService:
+    """
+    Keeps `owner_stats` (running totals) and `owner_daily_stats` (per-day activity) in step
+    with the prospects and email_logs tables.
+
+    A before_flush listener turns every ORM insert, delete and status change into counter
+    deltas and applies them as `col = col + delta` UPDATEs in the same transaction, so the
+    counters commit or roll back together with the rows they describe. Bulk writes that skip
+    the ORM unit of work (e.g. `query.delete()`, executemany inserts) must call `bump` themselves.
+    """
+
+    # ==========================================
+    # 1. CHANGE TRACKING (before_flush)
+    # ==========================================
+
+    def before_flush(self, session: Session, flush_context, instances):
+        totals = defaultdict(Counter)
+        daily = defaultdict(Counter)
+
+        with session.no_autoflush:
+            for obj in session.new:
+                if isinstance(obj, models.Prospect):
+                    totals[obj.owner_id]["prospects"] += 1
+                    daily[obj.owner_id]["prospects_added"] += 1
+                elif isinstance(obj, models.EmailLog):
+                    # The column default hasn't been applied yet at this point
+                    status = obj.status or "draft"
+                    owner_id = self._owner_of(session, obj)
+                    self._count_status(totals[owner_id], status, 1)
+                    self._count_new_status(daily[owner_id], status)
+
+            for obj in session.deleted:
+                if isinstance(obj, models.Prospect):
+                    totals[obj.owner_id]["prospects"] -= 1
+                elif isinstance(obj, models.EmailLog):
+                    self._count_status(totals[self._owner_of(session, obj)], obj.status, -1)
+
+            for obj in session.dirty:
+                if not isinstance(obj, models.EmailLog):
+                    continue
+                history = attributes.get_history(obj, "status")
+                if not history.added:
+                    continue
+                owner_id = self._owner_of(session, obj)
+                for old_status in history.deleted:
+                    self._count_status(totals[owner_id], old_status, -1)
+                new_status = history.added[0]
+                self._count_status(totals[owner_id], new_status, 1)
+                self._count_new_status(daily[owner_id], new_status)
+
+        for owner_id in set(totals) | set(daily):
+            if owner_id is not None:
+                self.bump(session, owner_id, **totals[owner_id], **daily[owner_id])
+
+    def _owner_of(self, session: Session, email_log: models.EmailLog):
+        prospect = email_log.prospect or session.get(models.Prospect, email_log.prospect_id)
+        return prospect.owner_id if prospect else None
+
+    def _count_status(self, counter: Counter, status: str, delta: int):
+        if status in STATUS_COLUMNS:
+            counter[STATUS_COLUMNS[status]] += delta
+
+    def _count_new_status(self, counter: Counter, status: str):
+        if status == "draft":
+            counter["drafts_created"] += 1
+        elif status == "sent":
+            counter["emails_sent"] += 1
+
+    # ==========================================
+    # 2. APPLYING DELTAS
+    # ==========================================
+
+    def bump(self, session: Session, owner_id: int, prospects: int = 0, drafts: int = 0, sent: int = 0,
+             prospects_added: int = 0, drafts_created: int = 0, emails_sent: int = 0):
+        """
+        Applies counter deltas for one owner inside the caller's transaction.
+        Call it before the writes it describes: an owner's first row is seeded from a live count.
+        """
+        totals = {"prospects": prospects, "drafts": drafts, "sent": sent}
+        if any(totals.values()):
+            stats = models.OwnerStats.__table__
+            add_totals = (
+                update(stats).where(stats.c.owner_id == owner_id)
+                .values({col: stats.c[col] + delta for col, delta in totals.items() if delta})
+            )
+            if session.execute(add_totals).rowcount == 0:
+                # First write for this owner: seed from the rows already stored so older data is counted too.
+                # A concurrent first write may seed it before us, so insert-or-ignore, then add our deltas
+                session.execute(self._seed(owner_id, self._count_owner(session, owner_id)))
+                session.execute(add_totals)
+
+        activity = {"prospects_added": prospects_added, "drafts_created": drafts_created, "emails_sent": emails_sent}
+        if any(activity.values()):
+            daily = models.OwnerDailyStats.__table__
+            today = datetime.utcnow().date()
+            add_activity = (
+                update(daily).where(daily.c.owner_id == owner_id, daily.c.day == today)
+                .values({col: daily.c[col] + delta for col, delta in activity.items() if delta})
+            )
+            if session.execute(add_activity).rowcount == 0:
+                session.execute(
+                    dialect_insert(daily).values(owner_id=owner_id, day=today)
+                    .on_conflict_do_nothing(index_elements=["owner_id", "day"])
+                )
+                session.execute(add_activity)
+
+    def _seed(self, owner_id: int, counts: dict):
+        """Creates an owner's counters row unless one already exists (first writes can race)."""
+        return (
+            dialect_insert(models.OwnerStats.__table__).values(owner_id=owner_id, **counts)
+            .on_conflict_do_nothing(index_elements=["owner_id"])
+        )
+
+    # ==========================================
+    # 3. READS AND REBUILDS
+    # ==========================================
+
+    def _count_owner(self, session: Session, owner_id: int) -> dict:
+        """Counts one owner's rows from scratch (what the counters should say)."""
+        counts = dict.fromkeys(TOTAL_COLUMNS, 0)
+        counts["prospects"] = session.query(func.count(models.Prospect.id)).filter(
+            models.Prospect.owner_id == owner_id
+        ).scalar()
+        rows = session.query(models.EmailLog.status, func.count(models.EmailLog.id)).join(models.Prospect).filter(
+            models.Prospect.owner_id == owner_id
+        ).group_by(models.EmailLog.status)
+        for status, count in rows:
+            if status in STATUS_COLUMNS:
+                counts[STATUS_COLUMNS[status]] = count
+        return counts
+
+    def get(self, session: Session, owner_id: int) -> models.OwnerStats:
+        """The owner's counters: one primary-key lookup, seeded from a full count the first time."""
+        stats = session.get(models.OwnerStats, owner_id)
+        if stats is None:
+            session.execute(self._seed(owner_id, self._count_owner(session, owner_id)))
+            session.commit()
+            stats = session.get(models.OwnerStats, owner_id)
+        return stats
+
+    async def get_async(self, session: AsyncSession, owner_id: int) -> models.OwnerStats:
+        """`get` for the endpoints' AsyncSession."""
+        stats = await session.get(models.OwnerStats, owner_id)
+        if stats is None:
+            counts = await session.run_sync(self._count_owner, owner_id)
+            await session.execute(self._seed(owner_id, counts))
+            await session.commit()
+            stats = await session.get(models.OwnerStats, owner_id)
+        return stats
+
+    def _daily_query(self, owner_id: int, since):
+        return select(models.OwnerDailyStats).where(
+            models.OwnerDailyStats.owner_id == owner_id,
+            models.OwnerDailyStats.day >= since
+        ).order_by(models.OwnerDailyStats.day)
+
+    def daily(self, session: Session, owner_id: int, since) -> list:
+        return session.scalars(self._daily_query(owner_id, since)).all()
+
+    async def daily_async(self, session: AsyncSession, owner_id: int, since) -> list:
+        return (await session.scalars(self._daily_query(owner_id, since))).all()
+
+    def rebuild(self, session: Session, fix: bool = True) -> list[dict]:
+        """
+        Recounts every owner's totals and reports where the stored counters drifted.
+        With `fix`, the stored counters are overwritten with the recount (caller commits).
+        Daily rollups record events as they happen and can't be recomputed, so they are left alone.
+        """
+        expected = defaultdict(lambda: dict.fromkeys(TOTAL_COLUMNS, 0))
+        for owner_id, count in session.query(models.Prospect.owner_id, func.count(models.Prospect.id)).group_by(models.Prospect.owner_id):
+            expected[owner_id]["prospects"] = count
+        email_counts = session.query(models.Prospect.owner_id, models.EmailLog.status, func.count(models.EmailLog.id)).join(
+            models.Prospect, models.EmailLog.prospect_id == models.Prospect.id
+        ).group_by(models.Prospect.owner_id, models.EmailLog.status)
+        for owner_id, status, count in email_counts:
+            if status in STATUS_COLUMNS:
+                expected[owner_id][STATUS_COLUMNS[status]] = count
+
+        stored = {stats.owner_id: stats for stats in session.query(models.OwnerStats)}
+        drift = []
+        for owner_id in (set(expected) | set(stored)) - {None}:
+            counts = expected[owner_id]
+            stats = stored.get(owner_id)
+            current = {col: getattr(stats, col) for col in TOTAL_COLUMNS} if stats else None
+            if current == counts:
+                continue
+            drift.append({"owner_id": owner_id, "stored": current, "expected": counts})
+            if fix:
+                if stats is None:
+                    session.add(models.OwnerStats(owner_id=owner_id, **counts))
+                else:
+                    for col, value in counts.items():
+                        setattr(stats, col, value)
+        return drift
+
+
+owner_stats = OwnerStatsService()
+
+# Every Session in the app goes through this: SessionLocal() in background workers, and the
+# endpoints' AsyncSessions too (each one wraps a plain Session that does the actual flush)
+event.listen(Session, "before_flush", owner_stats.before_flush)
@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+from typing import BinaryIO, Iterator, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import models
+from app.schemas.prospect import ProspectCreate
+from app.services.owner_stats import owner_stats
+
+# The ProspectCreate fields that exist as columns on the prospects table
+PROSPECT_COLUMNS = ("first_name", "last_name", "email", "company_name", "company_website")
+
+
+class ProspectImporter:
+    """
+    Bulk-imports prospects from a CSV or NDJSON upload.
+
+    The file is parsed row by row and handled in fixed-size chunks. Each chunk costs one
+    query to find emails that already exist and one executemany INSERT. Nothing outside
+    the current chunk is kept in memory except the (capped) error report.
+    Everything runs in one transaction, so a failed import leaves no partial data behind.
+    """
+
+    FORMATS = ("csv", "ndjson")
+
+    def __init__(self, chunk_size: int, max_errors: int):
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+
+    # ==========================================
+    # 1. PARSING
+    # ==========================================
+
+    def detect_format(self, filename: Optional[str]) -> Optional[str]:
+        name = (filename or "").lower()
+        if name.endswith(".csv"):
+            return "csv"
+        if name.endswith((".ndjson", ".jsonl")):
+            return "ndjson"
+        return None
+
+    def _iter_rows(self, file: BinaryIO, fmt: str) -> Iterator[tuple[int, Optional[dict], Optional[str]]]:
+        """Yields (line number, row, parse error) without reading the whole file."""
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            # Headers are matched case-insensitively ("First Name" -> "first_name")
+            if reader.fieldnames:
+                reader.fieldnames = [name.strip().lower().replace(" ", "_") for name in reader.fieldnames]
+            for row in reader:
+                yield reader.line_num, row, None
+        else:
+            for line_number, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_number, None, f"Invalid JSON: {e}"
+                    continue
+                if not isinstance(row, dict):
+                    yield line_number, None, "Expected a JSON object"
+                    continue
+                yield line_number, row, None
+
+    def _validate(self, row: dict) -> tuple[Optional[dict], Optional[str]]:
+        try:
+            prospect = ProspectCreate(**{key: value for key, value in row.items() if key and value not in ("", None)})
+        except ValidationError as e:
+            return None, "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors())
+        return {column: getattr(prospect, column) for column in PROSPECT_COLUMNS}, None
+
+    # ==========================================
+    # 2. IMPORTING
+    # ==========================================
+
+    def run(self, db: Session, owner_id: int, file: BinaryIO, fmt: str) -> dict:
+        report = {"rows": 0, "created": 0, "duplicates": 0, "failed": 0, "errors": [], "errors_truncated": False}
+        chunk = []
+
+        for line_number, row, error in self._iter_rows(file, fmt):
+            report["rows"] += 1
+            if row is not None:
+                values, error = self._validate(row)
+            if error:
+                self._add_error(report, line_number, row, error)
+                continue
+            chunk.append((line_number, values))
+            if len(chunk) >= self.chunk_size:
+                self._insert_chunk(db, owner_id, chunk, report)
+                chunk = []
+
+        if chunk:
+            self._insert_chunk(db, owner_id, chunk, report)
+
+        db.commit()
+        return report
+
+    def _insert_chunk(self, db: Session, owner_id: int, chunk: list, report: dict):
+        emails = {values["email"] for _, values in chunk}
+        # One set-based lookup per chunk (served by the (owner_id, email) index).
+        # Rows inserted by earlier chunks are visible too, since it's the same transaction
+        existing = {email for (email,) in db.query(models.Prospect.email).filter(
+            models.Prospect.owner_id == owner_id,
+            models.Prospect.email.in_(emails)
+        )}
+
+        rows = []
+        for _, values in chunk:
+            if values["email"] in existing:
+                report["duplicates"] += 1
+            else:
+                existing.add(values["email"])
+                rows.append({**values, "owner_id": owner_id})
+
+        if rows:
+            # executemany skips the ORM flush, so the analytics counters are bumped by hand (before the insert, see bump)
+            owner_stats.bump(db, owner_id, prospects=len(rows), prospects_added=len(rows))
+            db.execute(insert(models.Prospect), rows)
+            report["created"] += len(rows)
+
+    def _add_error(self, report: dict, line_number: int, row: Optional[dict], error: str):
+        report["failed"] += 1
+        if len(report["errors"]) >= self.max_errors:
+            report["errors_truncated"] = True
+            return
+        report["errors"].append({"line": line_number, "email": (row or {}).get("email"), "error": error})
+
+
+prospect_importer = ProspectImporter(
+    chunk_size=settings.PROSPECT_IMPORT_CHUNK_SIZE,
+    max_errors=settings.PROSPECT_IMPORT_MAX_ERRORS,
+)
@@ -0,0 +1,173 @@
+import asyncio
+import time
+import urllib.parse
+
+from app.core.metrics import span
+from app.services.company_ingest import company_domain, company_ingest
+from app.services.scraper import scraper
+from app.services.llm_service import llm
+from app.services.vector_db import vector_db, SEARCH_QUERY
+
+NO_LINKEDIN_CONTEXT = "No specific personal background found. Focus entirely on the company context."
+PROMPT_FALLBACK_CHARS = 2000 # Homepage text used as the company context when retrieval finds nothing
+
+
+class ResearchError(Exception):
+    """A pipeline failure that maps straight onto an HTTP error for the caller."""
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class ResearchPipeline:
+    """
+    The async crawl -> ingest -> retrieve -> LLM pipeline behind `/research/{id}/generate`.
+    Stages that don't depend on each other (site crawl + ingest, LinkedIn lookup, embedding the
+    fixed search query) run concurrently, so latency tracks the slowest branch. Company knowledge
+    is shared by domain, so only the first prospect at a company waits for the crawl.
+    """
+
+    async def run(self, prospect, fresh: bool = False) -> dict:
+        """`fresh` bypasses the LLM response cache to force a new variant of the line."""
+        result = None
+        async for event in self.stream(prospect, fresh=fresh, stream_tokens=False):
+            if event["event"] == "result":
+                result = event["data"]
+        return result
+
+    async def stream(self, prospect, fresh: bool = False, stream_tokens: bool = True):
+        """
+        Runs the pipeline as an async generator of events, each {"event": ..., "data": {...}}:
+        - "stage" as each stage finishes (knowledge, scraped, linkedin, query_embedded, embedded, retrieved);
+          "knowledge" comes first when the company was already ingested, and then scraped/embedded are skipped
+        - "token" for each chunk of the opening line (a single chunk when `stream_tokens` is off)
+        - "result" last, with the retrieved context and the full generated line
+        If Gemini fails partway through the line, a ResearchError is raised instead of "result", and
+        the tokens already sent must be discarded.
+        """
+        if not prospect.company_website:
+            raise ResearchError(400, "No company website to scrape")
+
+        url = prospect.company_website
+        if not url.startswith("http"):
+            url = "https://" + url
+        domain = company_domain(url)
+
+        started = time.perf_counter()
+        def stage(name: str, **data) -> dict:
+            return {"event": "stage", "data": {"stage": name, "elapsed_ms": int((time.perf_counter() - started) * 1000), **data}}
+
+        def crawled(refreshed: dict) -> list[dict]:
+            pages, ingested = refreshed["pages"], refreshed["ingest"]
+            if not pages:
+                raise ResearchError(500, "Failed to scrape website.")
+            return [
+                stage("scraped", pages=len(pages), chars=sum(len(text) for text in pages.values())),
+                stage("embedded", chunks=ingested["chunks"], new_chunks=ingested["embedded"], removed_chunks=ingested["removed"]),
+            ]
+
+        # 1. COMPANY KNOWLEDGE: another prospect at this company may already have paid for the crawl
+        knowledge = await company_ingest.knowledge_async(domain)
+        if knowledge is not None:
+            yield stage("knowledge", fresh=knowledge["fresh"], age_seconds=knowledge["age_seconds"], chunks=knowledge["chunks"])
+            if not knowledge["fresh"]:
+                # Answer from what we have now, re-crawl for the next prospect
+                company_ingest.refresh_in_background(domain, url, prospect.company_name)
+
+        # 2. Independent branches: LinkedIn lookup, query embedding, and (only when we know nothing
+        # about the company yet) the website crawl (homepage + about/news/...) + RAG ingestion
+        print(f"Fetching LinkedIn context via Google{'' if knowledge else f' and scraping {url}'}...")
+        tasks = {
+            asyncio.create_task(self.fetch_linkedin_context(prospect)): "linkedin",
+            asyncio.create_task(vector_db.get_embedding_async(SEARCH_QUERY)): "query_embedded",
+        }
+        if knowledge is None:
+            tasks[asyncio.create_task(company_ingest.refresh_async(domain, url, prospect.company_name))] = "scraped"
+        results = {}
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = tasks[task]
+                    results[name] = task.result()
+                    if name == "linkedin":
+                        yield stage(name, found=results[name] != NO_LINKEDIN_CONTEXT)
+                    elif name == "scraped":
+                        for event in crawled(results[name]):
+                            yield event
+                    else:
+                        yield stage(name)
+        finally:
+            # A failed branch or a client that went away shouldn't leave the others running
+            # (a crawl other requests share keeps going, see CompanyIngestor.refresh_async)
+            for task in tasks:
+                task.cancel()
+        pages = results["scraped"]["pages"] if "scraped" in results else {}
+
+        # 3. RAG RETRIEVAL (reusing the query vector computed above)
+        retrieved_context = await vector_db.search_company_data_async(
+            query=SEARCH_QUERY,
+            company_name=domain,
+            query_vector=results["query_embedded"]
+        )
+        if not retrieved_context and not pages:
+            # The knowledge outlived its vectors (index wiped or moved): rebuild it now
+            refreshed = await company_ingest.refresh_async(domain, url, prospect.company_name)
+            for event in crawled(refreshed):
+                yield event
+            pages = refreshed["pages"]
+            retrieved_context = await vector_db.search_company_data_async(
+                query=SEARCH_QUERY,
+                company_name=domain,
+                query_vector=results["query_embedded"]
+            )
+        scraped_data = next(iter(pages.values()))[:PROMPT_FALLBACK_CHARS] if pages else ""
+        yield stage("retrieved", chars=len(retrieved_context))
+
+        # 4. AI Generation (Combined Contexts)
+        print("Generating personalized line with AI...")
+        combined_prompt_context = f"Company Context: {retrieved_context or scraped_data}\n\nLinkedIn Context: {results['linkedin']}"
+        line_args = dict(
+            prospect_name=prospect.first_name,
+            company_name=prospect.company_name,
+            scraped_context=combined_prompt_context,
+            fresh=fresh
+        )
+
+        if stream_tokens:
+            chunks = []
+            try:
+                async for text in llm.stream_opening_line_async(**line_args):
+                    chunks.append(text)
+                    yield {"event": "token", "data": {"text": text}}
+            except Exception:
+                # A truncated line must never become a draft
+                raise ResearchError(502, "The opening line was cut off, try again.")
+            personalized_line = "".join(chunks).strip()
+        else:
+            personalized_line = await llm.generate_opening_line_async(**line_args)
+            yield {"event": "token", "data": {"text": personalized_line}}
+
+        yield {
+            "event": "result",
+            "data": {
+                "retrieved_context": retrieved_context,
+                "generated_line": personalized_line,
+            },
+        }
+
+    async def fetch_linkedin_context(self, prospect) -> str:
+        """Scrapes LinkedIn context via Google Dorking."""
+        query = f'site:linkedin.com/in/ "{prospect.first_name} {prospect.last_name}" "{prospect.company_name}"'
+        google_search_url = f"https://www.google.com/search?q={urllib.parse.quote(query)}"
+
+        with span("linkedin"):
+            linkedin_raw_data = await scraper.scrape_website_async(google_search_url)
+        if linkedin_raw_data and "No LinkedIn data found" not in linkedin_raw_data and "Google" not in linkedin_raw_data[:50]:
+            return linkedin_raw_data[:500]
+        return NO_LINKEDIN_CONTEXT
+
+
+pipeline = ResearchPipeline()
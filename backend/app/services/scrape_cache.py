@@ -0,0 +1,111 @@
+import threading
+import urllib.parse
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import models
+
+TRACKING_PARAM_PREFIXES = ("utm_",)
+TRACKING_PARAMS = {"gclid", "fbclid", "ref"}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical cache key for a URL: lowercase scheme/host, no default port, no fragment,
+    no tracking params, sorted query string and an explicit "/" for empty paths.
+    """
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "https"
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+
+    query = [
+        (key, value) for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if key not in TRACKING_PARAMS and not key.startswith(TRACKING_PARAM_PREFIXES)
+    ]
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    return urllib.parse.urlunsplit((scheme, host, path, urllib.parse.urlencode(sorted(query)), ""))
+
+
+def current_extraction() -> str:
+    """How page text is extracted right now; entries stored under other settings are misses."""
+    return f"{settings.SCRAPE_TEXT_ENGINE}:{settings.SCRAPE_TEXT_MAX_CHARS}"
+
+
+class ScrapeCache:
+    """
+    DB-backed cache of scrape results keyed by normalized URL.
+    An entry only counts if its text was extracted with the current engine and SCRAPE_TEXT_MAX_CHARS
+    (otherwise a 2000-char page would keep being served after the limit went up).
+    Fresh entries are served as-is. Expired entries are first revalidated with a
+    conditional request (see ScraperService) before paying for a full browser render.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "revalidated": 0, "changed": 0, "stores": 0}
+
+    def get(self, url: str) -> Optional[models.ScrapeCacheEntry]:
+        with SessionLocal() as db:
+            entry = db.query(models.ScrapeCacheEntry).filter(
+                models.ScrapeCacheEntry.url == normalize_url(url)
+            ).first()
+        if entry is None or entry.extraction != current_extraction():
+            return None
+        return entry
+
+    def is_fresh(self, entry: models.ScrapeCacheEntry) -> bool:
+        return entry.fetched_at is not None and datetime.utcnow() - entry.fetched_at < self.ttl
+
+    def put(self, url: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        with SessionLocal() as db:
+            db.merge(models.ScrapeCacheEntry(
+                url=normalize_url(url),
+                text=text,
+                etag=etag,
+                last_modified=last_modified,
+                fetched_at=datetime.utcnow(),
+                extraction=current_extraction()
+            ))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker cached the same URL at the same moment, theirs is just as good
+                db.rollback()
+                return
+        self.record("stores")
+
+    def touch(self, url: str):
+        """Marks an entry fresh again after the origin answered 304 Not Modified."""
+        with SessionLocal() as db:
+            db.query(models.ScrapeCacheEntry).filter(
+                models.ScrapeCacheEntry.url == normalize_url(url)
+            ).update({"fetched_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+
+    def record(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["revalidated"] + counters["changed"] + counters["misses"]
+        served = counters["hits"] + counters["revalidated"]
+        return {
+            "ttl_seconds": int(self.ttl.total_seconds()),
+            **counters,
+            "hit_rate": round(served / lookups, 3) if lookups else 0.0,
+        }
+
+
+scrape_cache = ScrapeCache(ttl_seconds=settings.SCRAPE_CACHE_TTL_SECONDS)
@@ -1,68 +1,194 @@
-import requests
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
-from playwright_stealth import stealth_sync
+import asyncio
+import time
+import httpx
 import urllib.parse
+from app.core.config import settings
+from app.core.metrics import external_error, span
+from app.services.browser_pool import USER_AGENT, browser_pool
+from app.services.fetch_strategy import BLOCKED_STATUSES, domain_of, escalation_reason, fetch_strategy
+from app.services.host_limiter import host_limiter
+from app.services.html_text import ENGINES, extract_text
+from app.services.scrape_cache import scrape_cache
+
+# Look like the browser tier, so bot protection doesn't block the HTTP tier just for its headers
+HTTP_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
 
 class ScraperService:
+    def __init__(self):
+        # Shared keep-alive client for the HTTP tier. Created lazily on the pool's loop.
+        self._http = None
+
+    def close(self):
+        if self._http is not None:
+            browser_pool.run(self._http.aclose())
+            self._http = None
+
     def scrape_website(self, url: str) -> str:
         """
-        Attempts to scrape using Stealth Playwright. 
-        If it fails or times out, falls back to the standard Requests library.
+        Fetches the page with a plain HTTP request, and escalates to Stealth Playwright
+        only when the result looks client-rendered or blocked.
         """
+        return browser_pool.run(self._scrape(url))
+
+    async def scrape_website_async(self, url: str) -> str:
+        """Async version of `scrape_website` for the research pipeline."""
+        return await browser_pool.submit(self._scrape(url))
+
+    async def _scrape(self, url: str) -> str:
+        # Runs on the browser pool's event loop (see BrowserPool.run / submit)
+
+        # --- CACHE: fresh hit, or a cheap conditional revalidation of an expired entry ---
+        cached = await asyncio.to_thread(scrape_cache.get, url)
+        if cached is not None:
+            if scrape_cache.is_fresh(cached):
+                scrape_cache.record("hits")
+                print(f"Scrape cache hit: {url}")
+                return cached.text
+            if await self._is_unchanged(url, cached):
+                scrape_cache.record("revalidated")
+                await asyncio.to_thread(scrape_cache.touch, url)
+                print(f"Scrape cache revalidated (304): {url}")
+                return cached.text
+            scrape_cache.record("changed")
+        else:
+            scrape_cache.record("misses")
+
         print(f"Attempting to scrape: {url}")
-        html_content = ""
+        clean_text, headers = await self._fetch(url)
+        if clean_text:
+            await asyncio.to_thread(
+                scrape_cache.put, url, clean_text, headers.get("etag"), headers.get("last-modified")
+            )
+        return clean_text
+
+    async def _fetch(self, url: str) -> tuple[str, dict]:
+        """
+        Tiered fetch: plain HTTP first, the headless browser only when the HTTP result looks
+        client-rendered or blocked (see fetch_strategy.escalation_reason). The tier that worked is
+        remembered per domain, so the next scrape of a JS-heavy site goes straight to the browser.
+        """
+        domain = domain_of(url)
+        remembered = fetch_strategy.tier_for(domain)
+        http_text, http_headers, reason = "", {}, None
 
-        # --- METHOD 1: STEALTH PLAYWRIGHT ---
+        # --- TIER 1: PLAIN HTTP (shared keep-alive client) ---
+        if remembered != "browser":
+            started = time.perf_counter()
+            try:
+                async with host_limiter.slot(url, self._get_http()):
+                    with span("fetch", "http", service="website"):
+                        response = await self._get_http().get(url)
+                self._feedback(url, response)
+                status, html_content, http_headers = response.status_code, response.text, response.headers
+            except Exception as e:
+                fetch_strategy.record("http", (time.perf_counter() - started) * 1000, ok=False)
+                print(f"HTTP fetch failed: {e}")
+                status, html_content, reason = None, "", "http_error"
+            else:
+                # Parsing is CPU-bound, so keep it off the loop that drives the browsers
+                http_text = await asyncio.to_thread(self.clean_html, html_content) if status == 200 else ""
+                reason = escalation_reason(status, html_content, http_text, settings.SCRAPE_MIN_TEXT_CHARS)
+                fetch_strategy.record("http", (time.perf_counter() - started) * 1000, ok=reason is None)
+
+            if reason == "thin" and remembered == "http":
+                # The browser didn't find more text here last time: this site is just short
+                reason = None
+            if reason is None:
+                print("HTTP fetch successful.")
+                fetch_strategy.remember(domain, "http")
+                return http_text, http_headers
+            if status is not None and status >= 400 and status not in BLOCKED_STATUSES:
+                # A real 404/500: a browser would only get the same page
+                print(f"HTTP fetch got {status}, not escalating.")
+                return "", {}
+            fetch_strategy.record_escalation(reason)
+            print(f"Escalating to the browser ({reason})...")
+
+        # --- TIER 2: STEALTH PLAYWRIGHT (leased from the warm browser pool) ---
+        started = time.perf_counter()
         try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(
-                    headless=True,
-                    args=["--disable-blink-features=AutomationControlled", "--disable-infobars"]
-                )
-                context = browser.new_context(
-                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-                )
-                page = context.new_page()
-                stealth_sync(page)
-                
-                # CHANGED: Back to domcontentloaded so it doesn't hang forever
-                page.goto(url, wait_until="domcontentloaded", timeout=15000)
-                html_content = page.content()
-                browser.close()
-                print("Playwright scraping successful.")
-                
+            async with host_limiter.slot(url, self._get_http()):
+                with span("fetch", "browser", service="browser"):
+                    # CHANGED: Back to domcontentloaded so it doesn't hang forever
+                    html_content, headers = await browser_pool.fetch(url, timeout_ms=15000)
+            clean_text = await asyncio.to_thread(self.clean_html, html_content)
+            fetch_strategy.record("browser", (time.perf_counter() - started) * 1000, ok=True)
+            print("Playwright scraping successful.")
+            if http_text and len(clean_text) <= len(http_text):
+                # Rendering added nothing (a genuinely short page): stay on plain HTTP for this domain
+                fetch_strategy.remember(domain, "http")
+                return http_text, http_headers
+            fetch_strategy.remember(domain, "browser")
+            return clean_text, headers
         except Exception as e:
+            fetch_strategy.record("browser", (time.perf_counter() - started) * 1000, ok=False)
             print(f"Playwright failed/timed out: {e}")
-            print("Falling back to basic requests...")
 
-        # --- METHOD 2: FALLBACK (Requests) ---
-        if not html_content:
+        # The browser didn't work either: a thin HTTP page beats nothing (a bot challenge page doesn't)
+        if http_text and reason != "blocked":
+            fetch_strategy.record_fallback()
+            return http_text, http_headers
+        if remembered == "browser":
+            # We skipped HTTP because of what we remembered; try it before giving up
+            fetch_strategy.record_fallback()
             try:
-                headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-                response = requests.get(url, headers=headers, timeout=10)
+                async with host_limiter.slot(url, self._get_http()):
+                    with span("fetch", "http", service="website"):
+                        response = await self._get_http().get(url)
+                self._feedback(url, response)
                 response.raise_for_status()
-                html_content = response.text
                 print("Fallback request successful.")
+                return await asyncio.to_thread(self.clean_html, response.text), response.headers
             except Exception as e:
                 print(f"Fallback request also failed: {e}")
-                return ""
+        return "", {}
 
-        # --- PARSE AND CLEAN THE HTML ---
-        if html_content:
-            soup = BeautifulSoup(html_content, "html.parser")
+    def _feedback(self, url: str, response):
+        """Tells the host limiter how the host answered, and counts blocks and server errors as failed calls."""
+        host_limiter.feedback(url, response.status_code, response.headers.get("retry-after"))
+        if response.status_code >= 500 or response.status_code in BLOCKED_STATUSES:
+            external_error("website", str(response.status_code))
 
-            # Remove junk tags
-            for element in soup(["script", "style", "noscript", "nav", "footer", "header", "aside"]):
-                element.decompose()
+    def _get_http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                headers=HTTP_HEADERS,
+                follow_redirects=True,
+                timeout=settings.SCRAPE_HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=settings.SCRAPE_HTTP_MAX_CONNECTIONS, max_keepalive_connections=20),
+            )
+        return self._http
 
-            # Extract text
-            text = soup.get_text(separator=' ')
-            clean_text = " ".join(text.split())
-            
-            return clean_text[:2000]
-            
-        return ""
+    async def _is_unchanged(self, url: str, cached) -> bool:
+        """Asks the origin whether the page changed since we cached it (If-None-Match / If-Modified-Since)."""
+        conditional_headers = {}
+        if cached.etag:
+            conditional_headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            conditional_headers["If-Modified-Since"] = cached.last_modified
+        if not conditional_headers:
+            return False
+
+        try:
+            # Streamed so a 200 doesn't download the body we're about to re-render anyway
+            async with host_limiter.slot(url, self._get_http()):
+                with span("fetch", "revalidate", service="website"):
+                    async with self._get_http().stream("GET", url, headers=conditional_headers) as response:
+                        self._feedback(url, response)
+                        return response.status_code == 304
+        except Exception as e:
+            print(f"Revalidation failed for {url}: {e}")
+            return False
+
+    def clean_html(self, html_content: str) -> str:
+        """Returns up to SCRAPE_TEXT_MAX_CHARS of the page's visible text (see services/html_text.py)."""
+        extract = ENGINES.get(settings.SCRAPE_TEXT_ENGINE, extract_text)
+        with span("parse", settings.SCRAPE_TEXT_ENGINE):
+            return extract(html_content, settings.SCRAPE_TEXT_MAX_CHARS)
     
 
     async def get_linkedin_snippet(name: str, company: str, page) -> str:
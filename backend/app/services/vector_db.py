@@ -1,24 +1,73 @@
-from google import genai
-from google.genai import types
-from pinecone import Pinecone, ServerlessSpec
+import asyncio
+import threading
 from app.core.config import settings
+from app.core.metrics import span
+from app.services.embedding_cache import embedding_cache
+from app.services.gemini_client import gemini
 
-# Initialize Gemini Client
-ai_client = genai.Client(api_key=settings.GEMINI_API_KEY)
-
-# Initialize Pinecone Client
-pc = Pinecone(api_key=settings.PINECONE_API_KEY)
 INDEX_NAME = "cold-email-rag"
 
-class VectorDBService:
+EMBEDDING_MODEL = "gemini-embedding-001"
+EMBEDDING_DIMENSIONS = 768 # We force Gemini to output 768 dimensions to optimize speed/cost
+
+# The fixed retrieval intent used by the research pipeline
+SEARCH_QUERY = "What is a recent company news, product launch, or key achievement?"
+# Query intents embedded once at startup so generate calls never wait on them
+QUERY_INTENTS = [SEARCH_QUERY]
+
+
+# ==========================================
+# 1. STORAGE BACKENDS
+# ==========================================
+
+class VectorBackend:
+    """
+    Where vectors live. Records are Pinecone-shaped dicts ({"id", "values", "metadata"})
+    and matches come back as {"id", "score", "metadata"}, best first.
+    Backends only need the sync methods; the async ones default to a worker thread.
+    """
+    name = "base"
+
+    def upsert(self, records: list[dict]):
+        raise NotImplementedError
+
+    def query(self, vector: list[float], top_k: int, company: str) -> list[dict]:
+        raise NotImplementedError
+
+    def delete(self, ids: list[str]):
+        raise NotImplementedError
+
+    async def upsert_async(self, records: list[dict]):
+        await asyncio.to_thread(self.upsert, records)
+
+    async def delete_async(self, ids: list[str]):
+        await asyncio.to_thread(self.delete, ids)
+
+    async def query_async(self, vector: list[float], top_k: int, company: str) -> list[dict]:
+        return await asyncio.to_thread(self.query, vector, top_k, company)
+
+    async def close_async(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class PineconeBackend(VectorBackend):
+    name = "pinecone"
+
     def __init__(self):
+        from pinecone import Pinecone, ServerlessSpec
+
+        self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+
         # Create the index in Pinecone if it doesn't exist yet
-        existing_indexes = [index.name for index in pc.list_indexes()]
+        existing_indexes = [index.name for index in self.pc.list_indexes()]
         if INDEX_NAME not in existing_indexes:
             print(f"Creating Pinecone Index: {INDEX_NAME}...")
-            pc.create_index(
+            self.pc.create_index(
                 name=INDEX_NAME,
-                dimension=768, # We force Gemini to output 768 dimensions to optimize speed/cost
+                dimension=EMBEDDING_DIMENSIONS,
                 metric="cosine",
                 spec=ServerlessSpec(
                     cloud="aws",
@@ -26,60 +75,272 @@ class VectorDBService:
                 )
             )
         # Connect to the index
-        self.index = pc.Index(INDEX_NAME)
+        self.index = self.pc.Index(INDEX_NAME)
+        # The asyncio index is bound to the event loop that first uses it, so it is opened lazily
+        self._async_index = None
 
-    def get_embedding(self, text: str) -> list[float]:
-        """Converts text into a vector array using Gemini."""
-        result = ai_client.models.embed_content(
-            model="gemini-embedding-001",
-            contents=text,
-            config=types.EmbedContentConfig(output_dimensionality=768)
-        )
-        return result.embeddings[0].values
-
-    def store_company_data(self, prospect_id: int, company_name: str, scraped_text: str):
-        """Generates an embedding and saves it to Pinecone with metadata."""
-        
-        # 1. Convert the text to a vector
-        print(f"Generating embeddings for {company_name}...")
-        vector = self.get_embedding(scraped_text)
-        
-        # 2. Store it in Pinecone
-        print("Saving to Pinecone...")
-        self.index.upsert(
-            vectors=[
-                {
-                    "id": f"prospect_{prospect_id}",
-                    "values": vector,
-                    # We store the actual text as metadata so we can retrieve it later
-                    "metadata": {"company": company_name, "text": scraped_text} 
-                }
-            ]
-        )
+    def _matches(self, results) -> list[dict]:
+        return [{"id": match.id, "score": match.score, "metadata": match.metadata or {}} for match in results.matches]
 
-    # ADD company_name to the parameters
-    def search_company_data(self, query: str, company_name: str, top_k: int = 1) -> str:
-        """
-        Searches Pinecone for the most relevant chunk of text, 
-        filtered ONLY for the specific company we are emailing.
-        """
-        print(f"Searching Pinecone for: '{query}' at {company_name}")
-        
-        query_vector = self.get_embedding(query)
-        
+    def upsert(self, records: list[dict]):
+        self.index.upsert(vectors=records)
+
+    def delete(self, ids: list[str]):
+        self.index.delete(ids=ids)
+
+    def query(self, vector: list[float], top_k: int, company: str) -> list[dict]:
         results = self.index.query(
-            vector=query_vector,
+            vector=vector,
             top_k=top_k,
             include_metadata=True,
             # THE FIX: This forces Pinecone to only look at this specific company's data
             filter={
-                "company": {"$eq": company_name} 
+                "company": {"$eq": company}
             }
         )
-        
-        if results.matches:
-            return results.matches[0].metadata.get("text", "")
-            
-        return ""
+        return self._matches(results)
+
+    async def _get_async_index(self):
+        if self._async_index is None:
+            description = await asyncio.to_thread(self.pc.describe_index, INDEX_NAME)
+            self._async_index = self.pc.IndexAsyncio(host=description.host)
+        return self._async_index
+
+    async def upsert_async(self, records: list[dict]):
+        index = await self._get_async_index()
+        await index.upsert(vectors=records)
+
+    async def delete_async(self, ids: list[str]):
+        index = await self._get_async_index()
+        await index.delete(ids=ids)
+
+    async def query_async(self, vector: list[float], top_k: int, company: str) -> list[dict]:
+        index = await self._get_async_index()
+        results = await index.query(
+            vector=vector,
+            top_k=top_k,
+            include_metadata=True,
+            filter={
+                "company": {"$eq": company}
+            }
+        )
+        return self._matches(results)
+
+    async def close_async(self):
+        if self._async_index is not None:
+            await self._async_index.close()
+            self._async_index = None
+
+
+class LocalBackend(VectorBackend):
+    """In-process NumPy/mmap index, so the RAG path runs without Pinecone (tests, offline dev)."""
+    name = "local"
+
+    def __init__(self):
+        from app.services.local_vector_index import LocalVectorIndex
+        self.index = LocalVectorIndex(settings.LOCAL_VECTOR_INDEX_DIR, EMBEDDING_DIMENSIONS)
+
+    def upsert(self, records: list[dict]):
+        self.index.upsert(records)
+
+    def query(self, vector: list[float], top_k: int, company: str) -> list[dict]:
+        return self.index.query(vector, top_k=top_k, company=company)
+
+    def delete(self, ids: list[str]):
+        self.index.delete(ids)
+
+    # The async methods come from VectorBackend (a worker thread each): upserts write the memmap and
+    # append to the JSONL log, and can trigger a compaction, none of which belongs on the event loop.
+    # The index takes its own lock, so concurrent calls are safe.
+
+    def stats(self) -> dict:
+        return self.index.stats()
+
+
+BACKENDS = {"pinecone": PineconeBackend, "local": LocalBackend}
+
+
+# ==========================================
+# 2. THE SERVICE
+# ==========================================
+
+class VectorDBService:
+    def __init__(self, backend_name: str):
+        if backend_name not in BACKENDS:
+            raise ValueError(f"Unknown VECTOR_BACKEND '{backend_name}', expected one of {sorted(BACKENDS)}")
+        self.backend_name = backend_name
+        # Connecting (e.g. Pinecone's list/create index calls) is deferred to first use or app warm-up
+        self._backend: VectorBackend | None = None
+        self._backend_lock = threading.Lock()
+        self._counters = {"embedding_calls": 0, "texts_embedded": 0, "upsert_calls": 0}
+
+    @property
+    def backend(self) -> VectorBackend:
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = BACKENDS[self.backend_name]()
+        return self._backend
+
+    @property
+    def backend_ready(self) -> bool:
+        return self._backend is not None
+
+    async def _get_backend_async(self) -> VectorBackend:
+        # The first connection does blocking network I/O, keep it off the event loop
+        if self._backend is None:
+            return await asyncio.to_thread(lambda: self.backend)
+        return self._backend
+
+    def _embed_config(self):
+        from google.genai import types
+        return types.EmbedContentConfig(output_dimensionality=EMBEDDING_DIMENSIONS)
+
+    def get_embedding(self, text: str) -> list[float]:
+        """Converts text into a vector array using Gemini (served from the embedding cache when possible)."""
+        cached = embedding_cache.get(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, text)
+        if cached is not None:
+            return cached
+
+        with span("embed", "query"):
+            result = gemini.embed_content(
+                model=EMBEDDING_MODEL,
+                contents=text,
+                config=self._embed_config()
+            )
+        vector = result.embeddings[0].values
+        embedding_cache.put(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, text, vector)
+        return vector
+
+    async def get_embedding_async(self, text: str) -> list[float]:
+        """Async version of `get_embedding`."""
+        # A memory miss reads SQLite under the cache's lock, which a batch put_many can hold for a while
+        cached = await asyncio.to_thread(embedding_cache.get, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, text)
+        if cached is not None:
+            return cached
+
+        with span("embed", "query"):
+            result = await gemini.embed_content_async(
+                model=EMBEDDING_MODEL,
+                contents=text,
+                config=self._embed_config()
+            )
+        vector = result.embeddings[0].values
+        await asyncio.to_thread(embedding_cache.put, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, text, vector)
+        return vector
+
+    async def warm_query_cache(self):
+        """Precomputes the fixed query intents (a no-op after the first run, thanks to the disk tier)."""
+        await asyncio.gather(*(self.get_embedding_async(intent) for intent in QUERY_INTENTS))
+
+    async def close_async(self):
+        if self._backend is not None:
+            await self._backend.close_async()
+
+    # --- Batches (used by the company ingestion, see services/company_ingest.py) ---
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Embeds many texts with as few Gemini calls as possible: cached ones are skipped, the rest go in batches."""
+        vectors = embedding_cache.get_many(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        for start in range(0, len(missing), settings.EMBEDDING_BATCH_SIZE):
+            batch = missing[start:start + settings.EMBEDDING_BATCH_SIZE]
+            with span("embed", "batch"):
+                result = gemini.embed_content(
+                    model=EMBEDDING_MODEL,
+                    contents=[texts[i] for i in batch],
+                    config=self._embed_config()
+                )
+            self._counters["embedding_calls"] += 1
+            for i, embedding in zip(batch, self._embeddings_of(result, batch)):
+                vectors[i] = embedding.values
+            embedding_cache.put_many(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, [texts[i] for i in batch], [vectors[i] for i in batch])
+        self._counters["texts_embedded"] += len(missing)
+        return vectors
+
+    async def embed_batch_async(self, texts: list[str]) -> list[list[float]]:
+        """Async version of `embed_batch`; the batches are sent concurrently."""
+        vectors = await asyncio.to_thread(embedding_cache.get_many, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        batches = [missing[start:start + settings.EMBEDDING_BATCH_SIZE] for start in range(0, len(missing), settings.EMBEDDING_BATCH_SIZE)]
+        with span("embed", "batch"):
+            results = await asyncio.gather(*(
+                gemini.embed_content_async(model=EMBEDDING_MODEL, contents=[texts[i] for i in batch], config=self._embed_config())
+                for batch in batches
+            ))
+        self._counters["embedding_calls"] += len(batches)
+        self._counters["texts_embedded"] += len(missing)
+        for batch, result in zip(batches, results):
+            for i, embedding in zip(batch, self._embeddings_of(result, batch)):
+                vectors[i] = embedding.values
+        await asyncio.to_thread(embedding_cache.put_many, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, [texts[i] for i in missing], [vectors[i] for i in missing])
+        return vectors
+
+    def _embeddings_of(self, result, batch: list[int]) -> list:
+        # zip() would silently leave the missing texts as None vectors (and cache/upsert them)
+        embeddings = result.embeddings or []
+        if len(embeddings) != len(batch):
+            raise ValueError(f"Gemini returned {len(embeddings)} embeddings for {len(batch)} texts")
+        return embeddings
+
+    def upsert(self, records: list[dict]):
+        for start in range(0, len(records), settings.VECTOR_UPSERT_BATCH_SIZE):
+            with span("upsert", self.backend.name, service="vector_db"):
+                self.backend.upsert(records[start:start + settings.VECTOR_UPSERT_BATCH_SIZE])
+            self._counters["upsert_calls"] += 1
+
+    async def upsert_async(self, records: list[dict]):
+        backend = await self._get_backend_async()
+        for start in range(0, len(records), settings.VECTOR_UPSERT_BATCH_SIZE):
+            with span("upsert", backend.name, service="vector_db"):
+                await backend.upsert_async(records[start:start + settings.VECTOR_UPSERT_BATCH_SIZE])
+            self._counters["upsert_calls"] += 1
+
+    def delete(self, ids: list[str]):
+        for start in range(0, len(ids), settings.VECTOR_UPSERT_BATCH_SIZE):
+            self.backend.delete(ids[start:start + settings.VECTOR_UPSERT_BATCH_SIZE])
+
+    async def delete_async(self, ids: list[str]):
+        backend = await self._get_backend_async()
+        for start in range(0, len(ids), settings.VECTOR_UPSERT_BATCH_SIZE):
+            await backend.delete_async(ids[start:start + settings.VECTOR_UPSERT_BATCH_SIZE])
+
+    def stats(self) -> dict:
+        return dict(self._counters)
+
+    # --- Retrieval ---
+
+    def _join_matches(self, matches: list[dict]) -> str:
+        # Best chunk first; chunks overlap a little, which the LLM doesn't mind
+        return "\n\n".join(match["metadata"].get("text", "") for match in matches)
+
+    # ADD company_name to the parameters
+    def search_company_data(self, query: str, company_name: str, top_k: int = None) -> str:
+        """
+        Searches the vector backend for the most relevant chunks of text,
+        filtered ONLY for the specific company we are emailing.
+        """
+        print(f"Searching {self.backend.name} index for: '{query}' at {company_name}")
+
+        query_vector = self.get_embedding(query)
+        with span("query", self.backend.name, service="vector_db"):
+            matches = self.backend.query(query_vector, top_k=top_k or settings.COMPANY_RETRIEVAL_TOP_K, company=company_name)
+        return self._join_matches(matches)
+
+    async def search_company_data_async(self, query: str, company_name: str, top_k: int = None,
+                                        query_vector: list[float] | None = None) -> str:
+        """
+        Async version of `search_company_data`. Callers that already embedded the
+        query (e.g. concurrently with scraping) can pass `query_vector` to skip that step.
+        """
+        backend = await self._get_backend_async()
+        print(f"Searching {backend.name} index for: '{query}' at {company_name}")
+
+        if query_vector is None:
+            query_vector = await self.get_embedding_async(query)
+
+        with span("query", backend.name, service="vector_db"):
+            matches = await backend.query_async(query_vector, top_k=top_k or settings.COMPANY_RETRIEVAL_TOP_K, company=company_name)
+        return self._join_matches(matches)
 
-vector_db = VectorDBService()
\ No newline at end of file
+vector_db = VectorDBService(settings.VECTOR_BACKEND)
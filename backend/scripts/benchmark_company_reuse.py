@@ -0,0 +1,184 @@
+"""
+End-to-end latency of the research pipeline (services/research_pipeline.py) for the first
+prospect at a company vs the second and later ones, which reuse the company knowledge the
+first one crawled and ingested (keyed by domain, see services/company_ingest.py).
+
+Each company is a small local website (one loopback address per company, so each has its own
+domain) that answers after --site-latency-ms. Gemini embeddings, the LLM call and the LinkedIn
+lookup are replaced by stand-ins that sleep for a typical latency, so no API key or network is
+needed and the numbers isolate what reuse skips: the crawl, chunking and chunk embedding.
+Everything runs against a throwaway SQLite database and local vector index.
+Run from the backend folder:
+    python -m scripts.benchmark_company_reuse
+    python -m scripts.benchmark_company_reuse --companies 10 --prospects 5 --embed-latency-ms 300
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+# Throwaway storage, set before the app reads its settings
+WORK_DIR = tempfile.mkdtemp(prefix="company_reuse_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'bench.db')}"
+os.environ["VECTOR_BACKEND"] = "local"
+os.environ["LOCAL_VECTOR_INDEX_DIR"] = os.path.join(WORK_DIR, "vectors")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(WORK_DIR, "embeddings.db")
+
+from app.core.database import engine  # noqa: E402
+from app.core.migrations import upgrade  # noqa: E402
+from app.services import gemini_client  # noqa: E402
+from app.services.browser_pool import browser_pool  # noqa: E402
+from app.services.company_ingest import company_ingest  # noqa: E402
+from app.services.llm_service import llm  # noqa: E402
+from app.services.research_pipeline import NO_LINKEDIN_CONTEXT, pipeline  # noqa: E402
+from app.services.scraper import scraper  # noqa: E402
+from app.services.vector_db import EMBEDDING_DIMENSIONS  # noqa: E402
+
+SENTENCES = [
+    "{name} builds logistics software for mid-sized freight carriers across Europe.",
+    "Our routing engine cut empty truck miles by a fifth for our first hundred customers.",
+    "In March we opened a second office and doubled the engineering team.",
+    "{name} was founded by two former dispatchers who were tired of spreadsheets.",
+    "The company recently announced a partnership with a major port operator.",
+    "We publish a quarterly report on freight rates and capacity trends.",
+    "Customers use {name} to plan loads, track shipments and settle invoices in one place.",
+    "Our newest product predicts delays before they happen using live traffic data.",
+]
+
+
+# ==========================================
+# 1. STAND-INS (local websites, Gemini, LinkedIn)
+# ==========================================
+
+def serve_sites(latency_ms: int) -> int:
+    """One server for every company site; the loopback address a request came in on picks the company."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency_ms / 1000)
+            if self.path == "/robots.txt":
+                self.send_response(404)
+                self.end_headers()
+                return
+            name = f"Company {self.server_address_for_request()}"
+            section = self.path.strip("/") or "home"
+            paragraphs = "".join(
+                f"<p>{sentence.format(name=name)} ({section} {number})</p>"
+                for number, sentence in enumerate(SENTENCES * 2)
+            )
+            body = f"<html><head><title>{name} - {section}</title></head><body><main><h1>{section}</h1>{paragraphs}</main></body></html>"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def server_address_for_request(self) -> str:
+            return self.connection.getsockname()[0].rsplit(".", 1)[-1]
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+
+def stub_external_calls(embed_latency_ms: int, llm_latency_ms: int, linkedin_latency_ms: int) -> dict:
+    """Replaces Gemini and the Google/LinkedIn lookup with sleeps; returns the call counters."""
+    calls = {"embed_requests": 0, "embedded_texts": 0}
+
+    def vector_for(text: str) -> list[float]:
+        digest = hashlib.sha256(text.encode()).digest()
+        return [digest[i % len(digest)] / 255 for i in range(EMBEDDING_DIMENSIONS)]
+
+    async def embed_content_async(model, contents, config=None):
+        texts = [contents] if isinstance(contents, str) else contents
+        calls["embed_requests"] += 1
+        calls["embedded_texts"] += len(texts)
+        await asyncio.sleep(embed_latency_ms / 1000)
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=vector_for(text)) for text in texts])
+
+    async def generate_opening_line_async(prospect_name, company_name, scraped_context, fresh=False):
+        await asyncio.sleep(llm_latency_ms / 1000)
+        return f"Loved reading about {company_name}, {prospect_name}."
+
+    async def fetch_linkedin_context(prospect):
+        await asyncio.sleep(linkedin_latency_ms / 1000)
+        return NO_LINKEDIN_CONTEXT
+
+    gemini_client.gemini.embed_content_async = embed_content_async
+    llm.generate_opening_line_async = generate_opening_line_async
+    pipeline.fetch_linkedin_context = fetch_linkedin_context
+    return calls
+
+
+# ==========================================
+# 2. BENCHMARK
+# ==========================================
+
+async def run(args) -> dict:
+    port = serve_sites(args.site_latency_ms)
+    first, later = [], []
+    for company in range(2, args.companies + 2):
+        for number in range(args.prospects):
+            prospect = SimpleNamespace(
+                first_name=f"First{number}", last_name=f"Last{number}",
+                company_name=f"Company {company}", company_website=f"http://127.0.0.{company}:{port}",
+            )
+            started = time.perf_counter()
+            stages = []
+            async for event in pipeline.stream(prospect, stream_tokens=False):
+                if event["event"] == "stage":
+                    stages.append(event["data"]["stage"])
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            (first if number == 0 else later).append(elapsed_ms)
+            print(f"  {prospect.company_name:<11} prospect {number + 1}: {elapsed_ms:7.0f} ms  ({', '.join(stages)})")
+    return {"first": first, "later": later}
+
+
+def summarize(label: str, samples: list[float]):
+    if samples:
+        print(f"  {label:<28} median {statistics.median(samples):7.0f} ms | max {max(samples):7.0f} ms | n={len(samples)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--companies", type=int, default=5, help="distinct company websites")
+    parser.add_argument("--prospects", type=int, default=4, help="prospects researched per company, one after another")
+    parser.add_argument("--site-latency-ms", type=int, default=150, help="response time of each company page")
+    parser.add_argument("--embed-latency-ms", type=int, default=250, help="latency of one Gemini embedding request")
+    parser.add_argument("--llm-latency-ms", type=int, default=800, help="latency of generating the opening line")
+    parser.add_argument("--linkedin-latency-ms", type=int, default=600, help="latency of the Google/LinkedIn lookup")
+    args = parser.parse_args()
+    if not 1 <= args.companies <= 250:
+        sys.exit("--companies must be between 1 and 250 (one loopback address each)")
+
+    upgrade(engine)
+    calls = stub_external_calls(args.embed_latency_ms, args.llm_latency_ms, args.linkedin_latency_ms)
+    print(f"Researching {args.prospects} prospects at each of {args.companies} companies (data in {WORK_DIR})\n")
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        scraper.close()
+        browser_pool.close()
+
+    print("\nEnd-to-end latency")
+    summarize("first prospect (crawl+ingest)", results["first"])
+    summarize("later prospects (reuse)", results["later"])
+    if results["first"] and results["later"]:
+        saved = statistics.median(results["first"]) - statistics.median(results["later"])
+        print(f"  saved per later prospect      {saved:7.0f} ms ({saved / statistics.median(results['first']):.0%})")
+    stats = company_ingest.stats()
+    print(f"\nKnowledge lookups: {stats['knowledge_fresh']} fresh, {stats['knowledge_stale']} stale, "
+          f"{stats['knowledge_missing']} missing | embedding requests: {calls['embed_requests']} "
+          f"({calls['embedded_texts']} texts)")
+
+
+if __name__ == "__main__":
+    main()
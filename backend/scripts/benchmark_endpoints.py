@@ -0,0 +1,166 @@
+"""
+Load benchmark for the prospect listing and analytics endpoints: requests/sec and latency
+percentiles under concurrent clients.
+
+Each target gets its own uvicorn server on a throwaway SQLite database, seeded through the API.
+Pass --ref to also benchmark another git revision (checked out in a temporary worktree), e.g. the
+commit before the AsyncSession data layer, to compare the sync and async versions side by side.
+Run from the backend folder:
+    python -m scripts.benchmark_endpoints
+    python -m scripts.benchmark_endpoints --ref HEAD~1 --requests 2000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+EMAIL, PASSWORD = "bench@example.com", "correct horse battery staple"
+ENDPOINTS = [
+    ("GET /prospects?limit=50", "/api/v1/prospects/?limit=50"),
+    ("GET /prospects?q=lead1&sort=last_name", "/api/v1/prospects/?limit=50&q=lead1&sort=last_name"),
+    ("GET /analytics/summary", "/api/v1/analytics/summary"),
+]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def wait_until_up(client: httpx.AsyncClient, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("Server did not come up")
+
+
+async def seed(client: httpx.AsyncClient, prospects: int) -> dict:
+    """Creates the benchmark user and their prospects through the API; returns auth headers."""
+    await client.post("/api/v1/auth/signup", json={"email": EMAIL, "password": PASSWORD})
+    token = (await client.post("/api/v1/auth/login", data={"username": EMAIL, "password": PASSWORD})).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    semaphore = asyncio.Semaphore(16)
+
+    async def add(number: int):
+        async with semaphore:
+            response = await client.post("/api/v1/prospects/", headers=headers, json={
+                "first_name": f"First{number}",
+                "last_name": f"Last{number % 97}",
+                "email": f"lead{number}@bench.test",
+                "company_name": f"Company {number % 50}",
+                "company_website": "example.com",
+            })
+            response.raise_for_status()
+
+    await asyncio.gather(*(add(number) for number in range(prospects)))
+    return headers
+
+
+async def load(client: httpx.AsyncClient, path: str, headers: dict, requests: int, concurrency: int) -> dict:
+    """Sends `requests` GETs from `concurrency` clients at once."""
+    samples = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_request():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            response.raise_for_status()
+            samples.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_request() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "rps": requests / elapsed,
+        "p50": statistics.median(samples),
+        "p95": percentile(samples, 0.95),
+    }
+
+
+async def measure(base_url: str, args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await wait_until_up(client)
+        headers = await seed(client, args.prospects)
+        results = {}
+        for name, path in ENDPOINTS:
+            await load(client, path, headers, min(args.requests, 100), args.concurrency) # warm-up
+            results[name] = await load(client, path, headers, args.requests, args.concurrency)
+        return results
+
+
+def run_target(backend_dir: str, args) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'bench.db')}",
+            "VECTOR_BACKEND": "local",
+            "LOCAL_VECTOR_INDEX_DIR": os.path.join(directory, "vector_index"),
+            "EMBEDDING_CACHE_PATH": os.path.join(directory, "embedding_cache.db"),
+            "LLM_CACHE_PATH": os.path.join(directory, "llm_cache.db"),
+            "BCRYPT_ROUNDS": "4",
+            "PASSWORD_HASH_WORKERS": "0",
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+            cwd=backend_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            return asyncio.run(measure(f"http://127.0.0.1:{args.port}", args))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+def run_ref(ref: str, args) -> dict:
+    """Benchmarks another revision from a temporary git worktree."""
+    with tempfile.TemporaryDirectory() as directory:
+        tree = os.path.join(directory, "tree")
+        subprocess.run(["git", "worktree", "add", "--detach", "--quiet", tree, ref], cwd=REPO_DIR, check=True)
+        try:
+            return run_target(os.path.join(tree, "backend"), args)
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", tree], cwd=REPO_DIR, check=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ref", action="append", default=[], help="git revision to benchmark as well (repeatable)")
+    parser.add_argument("--prospects", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    results = {}
+    for ref in args.ref:
+        print(f"Benchmarking {ref} ...")
+        results[ref] = run_ref(ref, args)
+    print("Benchmarking the working tree ...")
+    results["working tree"] = run_target(BACKEND_DIR, args)
+
+    width = max(len(name) for name, _ in ENDPOINTS)
+    for name, _ in ENDPOINTS:
+        print(f"\n{name}  ({args.requests} requests, {args.concurrency} concurrent)")
+        for target, data in results.items():
+            row = data[name]
+            print(f"  {target:<{max(width - 2, 14)}}  {row['rps']:8.1f} req/s | p50 {row['p50']:7.1f} ms | p95 {row['p95']:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Speed and output quality of the page text extractors (app/services/html_text.py) on a corpus
+of saved HTML pages: the streaming lxml engine vs the original BeautifulSoup one.
+
+For each page it reports the median parse time, the peak Python memory allocated while parsing, how
+many of the page's key content phrases made it into the text ("kept") and how many junk phrases
+(cookie banners, menus, comments, serialized JSON) leaked in ("junk"). The phrases for each page
+are in scripts/html_corpus/expectations.json; drop more saved pages into that folder to extend it.
+Run from the backend folder:
+    python -m scripts.benchmark_html_text
+    python -m scripts.benchmark_html_text --runs 50 --max-chars 4000 --show
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+from app.services.html_text import ENGINES
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "html_corpus")
+
+
+def load_corpus() -> list[tuple[str, str, dict]]:
+    with open(os.path.join(CORPUS_DIR, "expectations.json")) as f:
+        expectations = json.load(f)
+    pages = []
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if name.endswith(".html"):
+            with open(os.path.join(CORPUS_DIR, name), encoding="utf-8") as f:
+                pages.append((name, f.read(), expectations.get(name, {})))
+    return pages
+
+
+def measure(extract, html: str, max_chars: int, runs: int) -> dict:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        text = extract(html, max_chars)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    extract(html, max_chars)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"text": text, "ms": statistics.median(timings), "peak_kb": peak / 1024}
+
+
+def score(text: str, expected: dict) -> tuple[int, int]:
+    kept = sum(phrase in text for phrase in expected.get("must_include", []))
+    junk = sum(phrase in text for phrase in expected.get("must_exclude", []))
+    return kept, junk
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20, help="timed runs per page and engine")
+    parser.add_argument("--max-chars", type=int, default=2000, help="text budget (SCRAPE_TEXT_MAX_CHARS)")
+    parser.add_argument("--show", action="store_true", help="print each engine's extracted text")
+    args = parser.parse_args()
+
+    totals = {engine: {"ms": 0.0, "kept": 0, "junk": 0} for engine in ENGINES}
+    possible = {"kept": 0, "junk": 0}
+    for name, html, expected in load_corpus():
+        possible["kept"] += len(expected.get("must_include", []))
+        possible["junk"] += len(expected.get("must_exclude", []))
+        print(f"\n{name}  ({len(html) // 1024} KB)")
+        for engine, extract in ENGINES.items():
+            result = measure(extract, html, args.max_chars, args.runs)
+            kept, junk = score(result["text"], expected)
+            totals[engine]["ms"] += result["ms"]
+            totals[engine]["kept"] += kept
+            totals[engine]["junk"] += junk
+            print(f"  {engine:<5} {result['ms']:8.1f} ms | peak {result['peak_kb']:8.0f} KB | "
+                  f"{len(result['text']):5} chars | kept {kept}/{len(expected.get('must_include', []))} | "
+                  f"junk {junk}/{len(expected.get('must_exclude', []))}")
+            if args.show:
+                print(f"        {result['text']}")
+
+    print("\nTotal")
+    for engine, total in totals.items():
+        print(f"  {engine:<5} {total['ms']:8.1f} ms | kept {total['kept']}/{possible['kept']} | junk {total['junk']}/{possible['junk']}")
+
+
+if __name__ == "__main__":
+    main()
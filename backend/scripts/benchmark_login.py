@@ -0,0 +1,139 @@
+"""
+Login storm benchmark: measures login throughput and the latency of an ordinary authenticated
+request (GET /analytics/summary) while many logins run at once, with bcrypt on threads in the
+API process (PASSWORD_HASH_WORKERS=0) versus in the hashing process pool.
+
+Each mode starts its own uvicorn server on a throwaway SQLite database.
+Run from the backend folder:
+    python -m scripts.benchmark_login
+    python -m scripts.benchmark_login --logins 200 --concurrency 32 --workers 4 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EMAIL, PASSWORD = "bench@example.com", "correct horse battery staple"
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def summarize(samples: list[float]) -> str:
+    return (f"p50 {statistics.median(samples):7.1f} ms | p95 {percentile(samples, 0.95):7.1f} ms | "
+            f"max {max(samples):7.1f} ms  (n={len(samples)})")
+
+
+async def wait_until_up(client: httpx.AsyncClient, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("Server did not come up")
+
+
+async def probe(client: httpx.AsyncClient, headers: dict, samples: list, stop: asyncio.Event, interval: float):
+    """Times GET /analytics/summary back to back until `stop` is set."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/api/v1/analytics/summary", headers=headers)
+        response.raise_for_status()
+        samples.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(interval)
+
+
+async def storm(client: httpx.AsyncClient, logins: int, concurrency: int) -> float:
+    """Fires `logins` logins, `concurrency` at a time, and returns logins per second."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_login():
+        async with semaphore:
+            response = await client.post("/api/v1/auth/login", data={"username": EMAIL, "password": PASSWORD})
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_login() for _ in range(logins)))
+    return logins / (time.perf_counter() - started)
+
+
+async def measure(base_url: str, args) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        await wait_until_up(client)
+        await client.post("/api/v1/auth/signup", json={"email": EMAIL, "password": PASSWORD})
+        token = (await client.post("/api/v1/auth/login", data={"username": EMAIL, "password": PASSWORD})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        # 1. Baseline: the probe on its own
+        idle, stop = [], asyncio.Event()
+        task = asyncio.create_task(probe(client, headers, idle, stop, args.probe_interval))
+        await asyncio.sleep(args.idle_seconds)
+        stop.set()
+        await task
+
+        # 2. The same probe during a login storm
+        busy, stop = [], asyncio.Event()
+        task = asyncio.create_task(probe(client, headers, busy, stop, args.probe_interval))
+        throughput = await storm(client, args.logins, args.concurrency)
+        stop.set()
+        await task
+
+    return {"idle": idle, "busy": busy, "throughput": throughput}
+
+
+def run_mode(workers: int, args) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'bench.db')}",
+            "VECTOR_BACKEND": "local",
+            "LOCAL_VECTOR_INDEX_DIR": os.path.join(directory, "vector_index"),
+            "EMBEDDING_CACHE_PATH": os.path.join(directory, "embedding_cache.db"),
+            "LLM_CACHE_PATH": os.path.join(directory, "llm_cache.db"),
+            "PASSWORD_HASH_WORKERS": str(workers),
+            "BCRYPT_ROUNDS": str(args.rounds),
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            return asyncio.run(measure(f"http://127.0.0.1:{args.port}", args))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="hashing processes in pool mode")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    parser.add_argument("--probe-interval", type=float, default=0.02)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    for label, workers in (("threads in the API process", 0), (f"process pool ({args.workers} workers)", args.workers)):
+        print(f"\n=== bcrypt on {label}, cost {args.rounds} ===")
+        result = run_mode(workers, args)
+        print(f"logins/s             {result['throughput']:.1f}")
+        print(f"summary, idle        {summarize(result['idle'])}")
+        print(f"summary, login storm {summarize(result['busy'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Cost of the latency instrumentation (app/core/metrics.py): one span, and one request through
+the metrics middleware, with metrics off, on, and on with per-request tracing (X-Trace: 1).
+
+Requests go through the ASGI app in-process (no network), to a route that does no work, so the
+difference between the rows is the middleware + Server-Timing cost and nothing else.
+Run from the backend folder:
+    python -m scripts.benchmark_metrics_overhead
+    python -m scripts.benchmark_metrics_overhead --spans 1000000 --requests 5000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.core import metrics
+from app.core.config import settings
+
+MODES = {
+    "off": {"METRICS_ENABLED": False, "TRACE_ALL_REQUESTS": False},
+    "on": {"METRICS_ENABLED": True, "TRACE_ALL_REQUESTS": False},
+    "on + trace": {"METRICS_ENABLED": True, "TRACE_ALL_REQUESTS": True},
+}
+
+
+def configure(mode: str):
+    for name, value in MODES[mode].items():
+        setattr(settings, name, value)
+
+
+def time_spans(count: int) -> float:
+    """Nanoseconds per empty `with span(...)` block."""
+    started = time.perf_counter()
+    for _ in range(count):
+        with metrics.span("bench", "empty"):
+            pass
+    return (time.perf_counter() - started) / count * 1e9
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        # A few spans, like a real endpoint's SQL statements
+        for _ in range(5):
+            with metrics.span("bench", "request"):
+                pass
+        return {"id": item_id}
+
+    return app
+
+
+async def time_requests(app: FastAPI, count: int) -> list[float]:
+    samples = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for number in range(count):
+            started = time.perf_counter()
+            response = await client.get(f"/items/{number}")
+            samples.append((time.perf_counter() - started) * 1e6)
+            response.raise_for_status()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spans", type=int, default=200000, help="spans timed per mode")
+    parser.add_argument("--requests", type=int, default=2000, help="requests timed per mode")
+    args = parser.parse_args()
+
+    app = build_app()
+    # The waterfall print would dominate the traced numbers
+    metrics.RequestTrace.print_waterfall = lambda self, title: None
+
+    print(f"{'mode':<11} {'per span':>10} | {'request p50':>12} {'p95':>9}")
+    baseline = None
+    for mode in MODES:
+        configure(mode)
+        span_ns = time_spans(args.spans)
+        asyncio.run(time_requests(app, 200)) # Warm-up
+        samples = sorted(asyncio.run(time_requests(app, args.requests)))
+        p50 = statistics.median(samples)
+        p95 = samples[int(len(samples) * 0.95)]
+        baseline = p50 if baseline is None else baseline
+        print(f"{mode:<11} {span_ns:7.0f} ns | {p50:9.1f} µs {p95:7.1f} µs  ({p50 - baseline:+.1f} µs vs off)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Applies pending schema migrations (the app also does this on startup).
+
+Run from the backend folder:
+    python -m scripts.migrate           # apply pending migrations
+    python -m scripts.migrate --status  # list migrations and whether each one is applied
+"""
+import argparse
+
+from app.core.database import engine
+from app.core.migrations import MIGRATIONS, applied_versions, upgrade
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="only show which migrations are applied")
+    args = parser.parse_args()
+
+    if args.status:
+        applied = applied_versions(engine)
+        for version, name, _ in MIGRATIONS:
+            print(f"{'✅' if version in applied else '⏳'} {version:>3}  {name}")
+        return
+
+    ran = upgrade(engine)
+    print(f"Applied {len(ran)} migration(s)." if ran else "✅ Schema is up to date.")
+
+
+if __name__ == "__main__":
+    main()
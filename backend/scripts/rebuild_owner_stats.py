@@ -0,0 +1,43 @@
+"""
+Recounts every user's analytics counters (owner_stats) from the prospects and email_logs tables
+and reports any drift from the stored values.
+
+Run from the backend folder:
+    python -m scripts.rebuild_owner_stats          # report drift and fix it
+    python -m scripts.rebuild_owner_stats --check  # report only, exit code 1 if anything drifted
+"""
+import argparse
+import sys
+
+from app.core.database import SessionLocal, engine
+from app.core.migrations import upgrade
+from app.services.owner_stats import owner_stats
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only report drift, don't write anything")
+    args = parser.parse_args()
+
+    upgrade(engine)
+
+    with SessionLocal() as db:
+        drift = owner_stats.rebuild(db, fix=not args.check)
+        if not args.check:
+            db.commit()
+
+    for entry in drift:
+        print(f"owner {entry['owner_id']}: stored {entry['stored']} -> expected {entry['expected']}")
+
+    if not drift:
+        print("✅ All owner counters match the underlying tables.")
+        return 0
+    if args.check:
+        print(f"⚠️ {len(drift)} owner(s) drifted. Run without --check to fix.")
+        return 1
+    print(f"🔧 Rebuilt counters for {len(drift)} owner(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
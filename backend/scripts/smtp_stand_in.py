@@ -0,0 +1,111 @@
+"""
+A tiny local SMTP server to point the outbound email queue at instead of Gmail.
+It accepts any login (or only --password), swallows every message, and logs each
+connection, login and message, so you can see connections being reused.
+
+Run from the backend folder:
+    python -m scripts.smtp_stand_in --port 2525
+    python -m scripts.smtp_stand_in --port 2525 --fail-every 5   # every 5th message gets a 451 (retried)
+
+And start the API with:
+    SMTP_HOST=127.0.0.1 SMTP_PORT=2525 SMTP_USE_SSL=false SMTP_ALLOW_PLAINTEXT=true uvicorn app.main:app
+
+(It doesn't speak STARTTLS, so the API refuses to log in to it unless SMTP_ALLOW_PLAINTEXT is on.)
+"""
+import argparse
+import asyncio
+import base64
+
+counters = {"connections": 0, "logins": 0, "messages": 0, "deferred": 0}
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, args):
+    counters["connections"] += 1
+    connection = counters["connections"]
+    user = None
+    print(f"🔌 connection #{connection} opened")
+
+    async def reply(line: str):
+        writer.write((line + "\r\n").encode())
+        await writer.drain()
+
+    await reply("220 stand-in ESMTP ready")
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+
+            if verb == "EHLO":
+                await reply("250-stand-in")
+                await reply("250-AUTH PLAIN")
+                await reply("250 8BITMIME")
+            elif verb == "HELO":
+                await reply("250 stand-in")
+            elif verb == "AUTH":
+                parts = command.split()
+                token = parts[2] if len(parts) > 2 else None
+                if token is None:
+                    await reply("334 ")
+                    token = (await reader.readline()).decode().strip()
+                _, login, password = base64.b64decode(token).decode(errors="replace").split("\0", 2)
+                if args.password is not None and password != args.password:
+                    await reply("535 5.7.8 Authentication credentials invalid")
+                    continue
+                user = login
+                counters["logins"] += 1
+                print(f"🔑 connection #{connection}: logged in as {login}")
+                await reply("235 2.7.0 Authentication successful")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                if verb == "MAIL" and user is None:
+                    await reply("530 5.7.0 Authentication required")
+                else:
+                    await reply("250 OK")
+            elif verb == "DATA":
+                await reply("354 End data with <CR><LF>.<CR><LF>")
+                while (await reader.readline()) not in (b".\r\n", b".\n", b""):
+                    pass
+                number = counters["messages"] + counters["deferred"] + 1
+                if args.fail_every and number % args.fail_every == 0:
+                    counters["deferred"] += 1
+                    print(f"⏳ connection #{connection}: deferred message #{number} (451)")
+                    await reply("451 4.3.0 Temporary failure, try again later")
+                    continue
+                counters["messages"] += 1
+                print(f"✉️ connection #{connection}: accepted message #{number} from {user} "
+                      f"(totals: {counters['connections']} connections, {counters['logins']} logins, {counters['messages']} messages)")
+                await reply("250 2.0.0 OK queued")
+            elif verb == "QUIT":
+                await reply("221 Bye")
+                break
+            else:
+                await reply("502 5.5.2 Command not recognized")
+    finally:
+        writer.close()
+        print(f"👋 connection #{connection} closed")
+
+
+async def serve(args):
+    server = await asyncio.start_server(lambda r, w: handle(r, w, args), args.host, args.port)
+    print(f"📮 SMTP stand-in listening on {args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--password", help="only accept this password (default: accept any login)")
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every Nth message with a temporary 451")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,8 @@ axios.interceptors.request.use((config) => {
 function App() {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [prospects, setProspects] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [refreshTrigger, setRefreshTrigger] = useState(0);
   const [currentView, setCurrentView] = useState('dashboard');
   const [prospectToDelete, setProspectToDelete] = useState(null); 
@@ -36,20 +38,29 @@ function App() {
     }
   }, []);
 
-  // Fetch prospects if authenticated
+  // Fetch prospects if authenticated (one page at a time, the API is cursor-paginated)
   useEffect(() => {
     if (isAuthenticated) {
-      axios.get('/api/v1/prospects/')
-        .then(response => setProspects(response.data))
-        .catch(error => {
-          console.error("Error fetching prospects:", error);
-          if (error.response && error.response.status === 401) {
-            handleLogout();
-          }
-        });
+      fetchProspects(null);
     }
   }, [refreshTrigger, isAuthenticated]);
 
+  const fetchProspects = (cursor) => {
+    setLoadingMore(true);
+    axios.get('/api/v1/prospects/', { params: cursor ? { cursor } : {} })
+      .then(response => {
+        setProspects(prev => cursor ? [...prev, ...response.data.items] : response.data.items);
+        setNextCursor(response.data.next_cursor);
+      })
+      .catch(error => {
+        console.error("Error fetching prospects:", error);
+        if (error.response && error.response.status === 401) {
+          handleLogout();
+        }
+      })
+      .finally(() => setLoadingMore(false));
+  };
+
   const handleLeadAdded = () => {
     setRefreshTrigger(prev => prev + 1);
     setCurrentView('dashboard');
@@ -121,6 +132,12 @@ function App() {
               <button className="delete-btn" onClick={(e) => initiateDelete(e, prospect.id)} title="Delete Prospect"><Trash2 size={18} color="#ef4444" /></button>
             </div>
           ))}
+
+          {nextCursor && (
+            <button className="btn" style={{ width: '100%', marginTop: '8px', backgroundColor: '#f1f5f9', color: 'var(--primary)' }} onClick={() => fetchProspects(nextCursor)} disabled={loadingMore}>
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          )}
         </div>
 
         {/* LOGOUT BUTTON */}
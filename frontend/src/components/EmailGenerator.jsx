@@ -16,7 +16,7 @@ export default function EmailGenerator({ refreshTrigger }) {
   const fetchProspects = async () => { /* ... existing fetch code ... */ 
     try {
       const response = await axios.get('/api/v1/prospects/');
-      setProspects(response.data);
+      setProspects(response.data.items);
     } catch (error) {
       console.error(error);
     }
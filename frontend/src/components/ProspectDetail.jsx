@@ -3,6 +3,7 @@ import axios from 'axios';
 import { Sparkles, Send, Hourglass, CheckCheck, FileEdit, Pencil, Save} from 'lucide-react';
 export default function ProspectDetail({ prospect, onProspectUpdated }) {
   const [loading, setLoading] = useState(false);
+  const [generateStage, setGenerateStage] = useState("");
   const [sending, setSending] = useState(false);
   const [sendError, setSendError] = useState("");
   
@@ -50,14 +51,55 @@ export default function ProspectDetail({ prospect, onProspectUpdated }) {
   const handleGenerate = async () => {
     setLoading(true);
     setSendError("");
+    setComposeText("");
+    setGenerateStage("started");
+
+    // Streams Server-Sent Events: pipeline stages first, then the opening line token by token
     try {
-      const response = await axios.post(`/api/v1/research/${prospect.id}/generate`);
-      setActiveDraftId(response.data.email_log_id);
-      const newDraft = `${response.data.generated_line}\n\nI'd love to connect and share some ideas.\n\nBest,\nSanjay`;
-      setComposeText(newDraft);
+      const token = localStorage.getItem('token');
+      const response = await fetch(`${axios.defaults.baseURL}/api/v1/research/${prospect.id}/generate/stream`, {
+        method: 'POST',
+        headers: token ? { Authorization: `Bearer ${token}` } : {},
+      });
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let line = "";
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Each SSE message ends with a blank line
+        const messages = buffer.split("\n\n");
+        buffer = messages.pop();
+        for (const message of messages) {
+          const event = message.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(message.match(/^data: (.*)$/m)?.[1] || "{}");
+
+          if (event === "stage") {
+            setGenerateStage(data.stage);
+          } else if (event === "token") {
+            line += data.text;
+            setComposeText(line);
+          } else if (event === "done") {
+            setActiveDraftId(data.email_log_id);
+            setComposeText(`${data.generated_line}\n\nI'd love to connect and share some ideas.\n\nBest,\nSanjay`);
+          } else if (event === "error") {
+            throw new Error(data.detail);
+          }
+        }
+      }
     } catch (error) {
+      console.error("Generation Error:", error);
+      // Don't leave a line that was cut off mid-stream in the box
+      setComposeText("");
       alert("Failed to generate AI email.");
     }
+    setGenerateStage("");
     setLoading(false);
   };
 
@@ -186,7 +228,7 @@ export default function ProspectDetail({ prospect, onProspectUpdated }) {
           {/* TEXT AREA */}
           <textarea 
             style={{ flex: 1, minHeight: '48px', maxHeight: '120px', padding: '12px', borderRadius: '24px', border: '1px solid var(--border)', fontFamily: 'inherit', resize: 'none', outline: 'none' }}
-            placeholder="Type a message or click the sparkles to use AI..."
+            placeholder={generateStage ? `Researching... (${generateStage})` : "Type a message or click the sparkles to use AI..."}
             value={composeText}
             onChange={(e) => setComposeText(e.target.value)}
           />